@@ -9,47 +9,87 @@ For examples of the output of the api, look at openmotics_api.md
 # pylint: disable=import-outside-toplevel
 from __future__ import annotations
 
+import functools
 import logging
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, Any
 
-from homeassistant.const import CONF_CLIENT_ID, CONF_CLIENT_SECRET, CONF_IP_ADDRESS
+from homeassistant.const import CONF_IP_ADDRESS, EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import callback
 from homeassistant.helpers import device_registry as dr
-from homeassistant.helpers.config_entry_oauth2_flow import OAuth2Session
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.start import async_at_started
 
-from .const import CONF_INSTALLATION_ID, DOMAIN, PLATFORMS, STARTUP_MESSAGE
+from .const import (
+    BACKGROUND_PLATFORMS,
+    CONF_COMMAND_JOURNAL,
+    CONF_INSTALLATION_ID,
+    CONF_LOCAL_IP_ADDRESS,
+    CONF_OFFLOAD_AUTOMATIONS,
+    DOMAIN,
+    INSTALLATION_PLATFORMS,
+    PLATFORM_COLLECTIONS,
+    PLATFORMS,
+    STARTUP_MESSAGE,
+)
 from .coordinator import (
     OpenMoticsCloudDataUpdateCoordinator,
+    OpenMoticsHybridDataUpdateCoordinator,
     OpenMoticsLocalDataUpdateCoordinator,
 )
-from .oauth_impl import OpenMoticsOauth2Implementation
+from .hub import async_get_cloud_hub
+from .profiler import PHASE_SETUP, async_get_profiler
+from .services import async_setup_services
 
 if TYPE_CHECKING:
     from homeassistant import config_entries, core
     from homeassistant.config_entries import ConfigEntry
-    from homeassistant.core import HomeAssistant
+    from homeassistant.const import Platform
+    from homeassistant.core import Event, HomeAssistant
+
+    from .coordinator import OpenMoticsDataUpdateCoordinator
 
 CONF_AUTH_IMPLEMENTATION = "auth_implementation"
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def async_setup_openmotics_installation(
+@callback
+def async_setup_openmotics_installation(
     hass: core.HomeAssistant,
     entry: config_entries.ConfigEntry,
-    openmotics_installation,
-) -> bool:
-    """Set up the OpenMotics Installation."""
-    device_registry = await dr.async_get_registry(hass)
+    coordinator: OpenMoticsDataUpdateCoordinator,
+) -> None:
+    """Set up the OpenMotics Installation, the device all others are linked to."""
+    device_registry = dr.async_get(hass)
     device_registry.async_get_or_create(
         config_entry_id=entry.entry_id,
-        identifiers={(DOMAIN, openmotics_installation["id"])},
+        identifiers={(DOMAIN, str(coordinator.install_id))},
         manufacturer="OpenMotics",
-        name=openmotics_installation["name"],
-        model=openmotics_installation["gateway_model"],
-        sw_version=openmotics_installation["version"],
+        name=entry.title,
+        model="Installation",
     )
 
-    return True
+
+@callback
+def _async_remove_stale_devices(
+    hass: core.HomeAssistant,
+    entry: config_entries.ConfigEntry,
+    coordinator: OpenMoticsDataUpdateCoordinator,
+) -> None:
+    """Remove the devices without entities, e.g. after a topology change."""
+    device_registry = dr.async_get(hass)
+    entity_registry = er.async_get(hass)
+    installation = (DOMAIN, str(coordinator.install_id))
+    for device in dr.async_entries_for_config_entry(device_registry, entry.entry_id):
+        if installation in device.identifiers:
+            continue
+        if not er.async_entries_for_device(
+            entity_registry,
+            device.id,
+            include_disabled_entities=True,
+        ):
+            device_registry.async_remove_device(device.id)
 
 
 async def async_setup_entry(
@@ -57,6 +97,7 @@ async def async_setup_entry(
     entry: config_entries.ConfigEntry,
 ) -> bool:
     """Set up this integration using UI."""
+    started = time.monotonic()
     if hass.data.get(DOMAIN) is None:
         hass.data.setdefault(DOMAIN, {})
         _LOGGER.info(STARTUP_MESSAGE)
@@ -69,49 +110,187 @@ async def async_setup_entry(
         )
 
     else:
-        # Cloud
-        implementation = OpenMoticsOauth2Implementation(
-            hass,
-            domain=entry.data.get(CONF_AUTH_IMPLEMENTATION),
-            client_id=entry.data.get(CONF_CLIENT_ID),
-            client_secret=entry.data.get(CONF_CLIENT_SECRET),
-            name=entry.data.get(CONF_AUTH_IMPLEMENTATION),
-        )
-        oauth2_session = OAuth2Session(hass, entry, implementation)
+        # Cloud, the installations of an account share its hub
+        hub = async_get_cloud_hub(hass, entry)
 
-        coordinator = OpenMoticsCloudDataUpdateCoordinator(
+        coordinator_class = (
+            # Commands and status over the LAN, the rest over the cloud
+            OpenMoticsHybridDataUpdateCoordinator
+            if entry.options.get(CONF_LOCAL_IP_ADDRESS)
+            else OpenMoticsCloudDataUpdateCoordinator
+        )
+        coordinator = coordinator_class(
             hass,
-            session=oauth2_session,
+            hub=hub,
             name=entry.data.get(CONF_AUTH_IMPLEMENTATION),
         )
 
         coordinator.omclient.installation_id = entry.data.get(CONF_INSTALLATION_ID)
 
+    # The cloud account is released with its last entry
+    entry.async_on_unload(coordinator.async_close)
+
+    async def _async_close(_event: Event) -> None:
+        await coordinator.async_close()
+
+    entry.async_on_unload(
+        hass.bus.async_listen(EVENT_HOMEASSISTANT_CLOSE, _async_close),
+    )
+
+    if entry.options.get(CONF_COMMAND_JOURNAL):
+        # Commands queued before a restart are sent after the first refresh
+        await coordinator.async_start_journal()
+
     await coordinator.async_config_entry_first_refresh()
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
-    # Spin up the platforms
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    async_setup_openmotics_installation(hass, entry, coordinator)
+    async_setup_services(hass)
+    entry.async_on_unload(
+        entry.add_update_listener(
+            functools.partial(_async_update_listener, dict(entry.options)),
+        ),
+    )
+
+    # Inputs (push buttons) are pushed by the gateway, not polled, also the
+    # ones discovered after the setup
+    @callback
+    def _async_start_events() -> None:
+        if coordinator.data.get("inputs"):
+            coordinator.async_start_events()
+
+    _async_start_events()
+    entry.async_on_unload(coordinator.async_add_listener(_async_start_events))
+    entry.async_on_unload(coordinator.async_stop_events)
+
+    # Spin up the platforms that have devices, the non-critical ones once
+    # Home Assistant has started.
+    platforms = _platforms_with_devices(coordinator)
+    background = [
+        platform for platform in platforms if platform in BACKGROUND_PLATFORMS
+    ]
+    await _async_forward_platforms(
+        hass,
+        entry,
+        coordinator,
+        [platform for platform in platforms if platform not in background],
+    )
+    coordinator.setup_times["entry"] = round(time.monotonic() - started, 3)
+
+    async def _async_setup_background() -> None:
+        await _async_forward_platforms(
+            hass,
+            entry,
+            coordinator,
+            background,
+            timing="background",
+        )
+        # All entities are added now, devices without any are left over
+        _async_remove_stale_devices(hass, entry, coordinator)
+
+    @callback
+    def _async_forward_background(_hass: HomeAssistant) -> None:
+        hass.async_create_background_task(
+            _async_setup_background(),
+            f"{DOMAIN} background platform setup",
+        )
+
+    entry.async_on_unload(async_at_started(hass, _async_forward_background))
+
+    @callback
+    def _async_forward_discovered() -> None:
+        """Set up the platforms whose first devices were discovered."""
+        if new_platforms := [
+            platform
+            for platform in _platforms_with_devices(coordinator)
+            if platform not in platforms
+        ]:
+            platforms.extend(new_platforms)
+            hass.async_create_task(
+                _async_forward_platforms(hass, entry, coordinator, new_platforms),
+            )
+
+    entry.async_on_unload(coordinator.async_add_listener(_async_forward_discovered))
+
+    if entry.options.get(CONF_OFFLOAD_AUTOMATIONS):
+        from .offload import AutomationOffloader
+
+        await AutomationOffloader(hass, entry, coordinator).async_start()
 
     return True
 
 
-async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Handle options update."""
-    await hass.config_entries.async_reload(entry.entry_id)
+def _platforms_with_devices(
+    coordinator: OpenMoticsDataUpdateCoordinator,
+) -> list[Platform]:
+    """Return the platforms of the installation and of its devices."""
+    return [
+        platform
+        for platform in PLATFORMS
+        if platform in INSTALLATION_PLATFORMS
+        or any(
+            coordinator.data.get(collection)
+            for collection in PLATFORM_COLLECTIONS[platform]
+        )
+    ]
+
+
+async def _async_forward_platforms(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    coordinator: OpenMoticsDataUpdateCoordinator,
+    platforms: list[Platform],
+    *,
+    timing: str | None = None,
+) -> None:
+    """Set up platforms and keep track of them for the unload."""
+    if not platforms:
+        return
+    started = time.monotonic()
+    profiler = async_get_profiler(hass)
+    if profiler.phase == PHASE_SETUP:
+        profiler.async_start(PHASE_SETUP, coordinator)
+    try:
+        await hass.config_entries.async_forward_entry_setups(entry, platforms)
+    finally:
+        if profiler.phase == PHASE_SETUP:
+            profiler.async_stop(PHASE_SETUP, coordinator)
+    coordinator.platforms.update(platforms)
+    if timing is not None:
+        coordinator.setup_times[timing] = round(time.monotonic() - started, 3)
+    _LOGGER.debug("Set up %s in %.3fs", platforms, time.monotonic() - started)
+
+
+async def _async_update_listener(
+    options: dict[str, Any],
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+) -> bool:
+    """Handle options update.
+
+    The data of the entry also changes when its renewed token is stored,
+    which does not need a reload.
+    """
+    if entry.options != options:
+        await hass.config_entries.async_reload(entry.entry_id)
 
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    # Unload entities for this entry/device.
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    # Unload entities for this entry/device, only the platforms that were set up.
+    unload_ok = await hass.config_entries.async_unload_platforms(
+        entry,
+        coordinator.platforms,
+    )
 
     # Cleanup
     if unload_ok:
-        del hass.data[DOMAIN][entry.entry_id]
+        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator.batcher.async_cancel()
 
     return unload_ok
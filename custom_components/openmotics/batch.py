@@ -0,0 +1,85 @@
+"""Dispatch commands to many OpenMotics devices at once."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+# Commands issued within this window are sent together, e.g. when a cover
+# group calls the service on all its members.
+BATCH_WINDOW = 0.02
+# Maximum number of requests in flight for one batch.
+BATCH_CONCURRENCY = 8
+
+
+class CommandBatcher:
+    """Collect commands issued in the same instant and send them together."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        *,
+        window: float = BATCH_WINDOW,
+        limit: int = BATCH_CONCURRENCY,
+    ) -> None:
+        """Initialize the batcher."""
+        self.hass = hass
+        self._window = window
+        self._limit = limit
+        self._pending: list[tuple[Callable[..., Awaitable], tuple, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def async_call(self, method: Callable[..., Awaitable], *args: Any) -> Any:
+        """Queue a command and return its result once the batch is sent."""
+        future: asyncio.Future = self.hass.loop.create_future()
+        self._pending.append((method, args, future))
+        if self._timer is None:
+            self._timer = self.hass.loop.call_later(self._window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Send the queued commands."""
+        pending, self._pending = self._pending, []
+        self._timer = None
+        _LOGGER.debug("Sending %s commands at once", len(pending))
+        self.hass.async_create_task(self._async_send_all(pending))
+
+    async def _async_send_all(
+        self,
+        pending: list[tuple[Callable[..., Awaitable], tuple, asyncio.Future]],
+    ) -> None:
+        """Fan out the commands with a bounded number of requests in flight."""
+        semaphore = asyncio.Semaphore(self._limit)
+
+        async def _send(
+            method: Callable[..., Awaitable],
+            args: tuple,
+            future: asyncio.Future,
+        ) -> None:
+            async with semaphore:
+                try:
+                    result = await method(*args)
+                except Exception as err:  # pylint: disable=broad-except
+                    if not future.done():
+                        future.set_exception(err)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+
+        await asyncio.gather(*(_send(*command) for command in pending))
+
+    def async_cancel(self) -> None:
+        """Cancel the commands that were not sent yet."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _method, _args, future in self._pending:
+            future.cancel()
+        self._pending = []
@@ -0,0 +1,83 @@
+"""Support for HomeAssistant binary sensors (aka inputs)."""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .const import DOMAIN
+from .entity import OpenMoticsDevice, async_setup_discovery
+from .events import signal_input
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+    from .coordinator import OpenMoticsDataUpdateCoordinator
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up Inputs for OpenMotics Controller."""
+    coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    def create_inputs(index: int, om_input: Any) -> list[BinarySensorEntity]:
+        return [OpenMoticsInput(coordinator, index, om_input)]
+
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "inputs",
+        create_inputs,
+    )
+
+
+class OpenMoticsInput(OpenMoticsDevice, BinarySensorEntity):
+    """Representation of a OpenMotics input."""
+
+    coordinator: OpenMoticsDataUpdateCoordinator
+
+    _collection = "inputs"
+
+    def __init__(
+        self,
+        coordinator: OpenMoticsDataUpdateCoordinator,
+        index: int,
+        om_input: dict[str, Any],
+    ) -> None:
+        """Initialize the input."""
+        super().__init__(coordinator, index, om_input, "binary_sensor")
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the changes pushed by the event stream."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                signal_input(self.coordinator.config_entry.entry_id, self.device_id),
+                self._async_input_changed,
+            ),
+        )
+
+    @callback
+    def _async_input_changed(self, pressed: bool) -> None:
+        """Update the state as soon as the input changes."""
+        self.status.on = pressed
+        self.async_write_ha_state()
+
+    @property
+    def is_on(self) -> bool | None:
+        """Return true if the input is pressed."""
+        return self.status.on
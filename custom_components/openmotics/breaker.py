@@ -0,0 +1,120 @@
+"""Circuit breaker for the connection to a gateway or the cloud.
+
+After a few failed requests in a row the breaker opens: nothing is sent for
+a while, which doubles (with some jitter) on every failed retry. Once the
+wait is over the breaker is half-open and a single cheap request tells if
+the other side is back, before the regular polling resumes.
+"""
+from __future__ import annotations
+
+import logging
+import random
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+STATES = [STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN]
+
+# Failures in a row before the breaker opens
+FAILURE_THRESHOLD = 2
+# Seconds before the first retry, and at most between retries
+BACKOFF_BASE = 30.0
+BACKOFF_MAX = 600.0
+# The backoff varies this fraction either way, so gateways that went down
+# together don't come back on the same tick.
+BACKOFF_JITTER = 0.2
+
+
+class CircuitBreaker:
+    """Stop sending requests to a transport that keeps failing."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        threshold: int = FAILURE_THRESHOLD,
+        base: float = BACKOFF_BASE,
+        maximum: float = BACKOFF_MAX,
+        jitter: float = BACKOFF_JITTER,
+    ) -> None:
+        """Initialize a closed breaker."""
+        self.name = name
+        self._threshold = threshold
+        self._base = base
+        self._maximum = maximum
+        self._jitter = jitter
+        self._open = False
+        self._failures = 0
+        # Times the breaker opened since it was last closed
+        self._retries = 0
+        self._retry_at = 0.0
+        self.trips = 0
+        self.last_error: str | None = None
+
+    @property
+    def state(self) -> str:
+        """Return the state, half-open once the backoff is over."""
+        if not self._open:
+            return STATE_CLOSED
+        if time.monotonic() >= self._retry_at:
+            return STATE_HALF_OPEN
+        return STATE_OPEN
+
+    @property
+    def allows_request(self) -> bool:
+        """Return True unless the breaker is open."""
+        return self.state != STATE_OPEN
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until the next retry."""
+        return max(0.0, self._retry_at - time.monotonic()) if self._open else 0.0
+
+    def record_success(self) -> None:
+        """Close the breaker."""
+        if self._open:
+            _LOGGER.info("%s is reachable again", self.name)
+        self._open = False
+        self._failures = 0
+        self._retries = 0
+
+    def record_failure(self, err: Exception) -> None:
+        """Count a failure, open the breaker after too many or a failed retry."""
+        self._failures += 1
+        self.last_error = repr(err)
+        if self.state == STATE_HALF_OPEN or (
+            not self._open and self._failures >= self._threshold
+        ):
+            self._trip(err)
+
+    def _trip(self, err: Exception) -> None:
+        """Open the breaker until the next retry."""
+        backoff = min(self._maximum, self._base * 2**self._retries)
+        backoff *= random.uniform(1 - self._jitter, 1 + self._jitter)
+        self._retry_at = time.monotonic() + backoff
+        self._retries += 1
+        if not self._open:
+            self.trips += 1
+            _LOGGER.warning(
+                "%s is unreachable, retrying in %.0fs: %s",
+                self.name,
+                backoff,
+                err,
+            )
+        else:
+            _LOGGER.debug("%s still unreachable, retrying in %.0fs", self.name, backoff)
+        self._open = True
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the breaker for the diagnostics."""
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "trips": self.trips,
+            "retry_in": round(self.retry_in),
+            "last_error": self.last_error,
+        }
@@ -1,6 +1,7 @@
 """Support for OpenMotics thermostat(hroup)s."""
 from __future__ import annotations
 
+import asyncio
 import logging
 from typing import TYPE_CHECKING, Any
 
@@ -8,12 +9,16 @@ from homeassistant.components.climate import (ATTR_HVAC_MODE, PRESET_AWAY,
                                               ClimateEntity,
                                               ClimateEntityFeature, HVACAction,
                                               HVACMode)
-from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import ATTR_TEMPERATURE, UnitOfTemperature
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util
+from pyhaopenmotics import OpenMoticsError
 
-from .const import (DOMAIN, NOT_IN_USE, PRESET_AUTO, PRESET_MANUAL,
-                    PRESET_PARTY, PRESET_VACATION)
-from .entity import OpenMoticsDevice
+from .const import (ATTR_NEXT_SETPOINT, ATTR_NEXT_TRANSITION,
+                    ATTR_SCHEDULED_SETPOINT, DOMAIN, PRESET_AUTO,
+                    PRESET_MANUAL, PRESET_PARTY, PRESET_VACATION,
+                    SCHEDULE_REFRESH_INTERVAL)
+from .entity import OpenMoticsDevice, async_setup_discovery, is_in_use
 
 if TYPE_CHECKING:
     from homeassistant.config_entries import ConfigEntry
@@ -49,6 +54,12 @@ PRESET_MODES_TO_OM: dict[str, str] = {
 }
 OM_TO_PRESET_MODES = {v: k for k, v in PRESET_MODES_TO_OM.items()}
 
+
+def _is_success(result: Any) -> bool:
+    """Return True if the API accepted a command."""
+    return isinstance(result, dict) and result.get("_error") is None
+
+
 # MAP_STATE_ICONS = {
 #     HVACMode.COOL: "mdi:snowflake",
 #     HVACMode.DRY: "mdi:water-off",
@@ -64,53 +75,103 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up Lights for OpenMotics Controller."""
-    tg_entities = []
-    tu_entities = []
-
     coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    for tg_index, om_thermostatgroup in enumerate(coordinator.data["thermostatgroups"]):
-        tu_entities = []
-        for tg_id in om_thermostatgroup.thermostat_ids:
-            for tu_index, om_thermostatunit in enumerate(
-                coordinator.data["thermostatunits"],
-            ):
-                # Even if the id is in the list, if the name is not set, don't add it.
-                if (
-                    om_thermostatunit.name is None
-                    or not om_thermostatunit.name
-                    or om_thermostatunit.name == NOT_IN_USE
-                ):
-                    continue
-
-                if tg_id == om_thermostatunit.idx:
-                    tu_entities.append(
-                        OpenMoticsThermostatUnit(
-                            coordinator,
-                            tu_index,
-                            om_thermostatunit,
-                            om_thermostatgroup,
-                        ),
-                    )
-        if tu_entities:
-            if om_thermostatgroup.name is None or not om_thermostatgroup.name:
-                # If name is empty but there thermostatunits, generate a name
-                om_thermostatgroup.name = f"Thermostatgroup-{tg_index}"
-
-            tg_entities.append(
-                OpenMoticsThermostatGroup(
-                    coordinator,
-                    tg_index,
-                    om_thermostatgroup,
-                ),
-            )
+    def has_units(om_thermostatgroup: Any) -> bool:
+        # Even if the id is in the list, if the name is not set, don't add it.
+        return any(
+            is_in_use(om_thermostatunit)
+            and om_thermostatunit.idx in om_thermostatgroup.thermostat_ids
+            for om_thermostatunit in coordinator.data["thermostatunits"]
+        )
 
-    if not tg_entities and not tu_entities:
-        _LOGGER.info("No OpenMotics Thermostats added")
-        return
+    def create_groups(tg_index: int, om_thermostatgroup: Any) -> list[ClimateEntity]:
+        if om_thermostatgroup.name is None or not om_thermostatgroup.name:
+            # If name is empty but there thermostatunits, generate a name
+            om_thermostatgroup.name = f"Thermostatgroup-{tg_index}"
+        return [OpenMoticsThermostatGroup(coordinator, tg_index, om_thermostatgroup)]
+
+    def create_units(tu_index: int, om_thermostatunit: Any) -> list[ClimateEntity]:
+        for om_thermostatgroup in coordinator.data["thermostatgroups"]:
+            if om_thermostatunit.idx in om_thermostatgroup.thermostat_ids:
+                return [
+                    OpenMoticsThermostatUnit(
+                        coordinator,
+                        tu_index,
+                        om_thermostatunit,
+                        om_thermostatgroup,
+                    ),
+                ]
+        return []
+
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "thermostatgroups",
+        create_groups,
+        in_use=has_units,
+    )
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "thermostatunits",
+        create_units,
+    )
 
-    async_add_entities(tg_entities)
-    async_add_entities(tu_entities)
+    async def async_refresh_schedules(*_: Any) -> None:
+        """Fetch the schedules that are not part of the polled data."""
+        if await _async_fetch_schedules(coordinator):
+            coordinator.async_update_listeners()
+
+    await async_refresh_schedules()
+    entry.async_on_unload(
+        async_track_time_interval(
+            hass,
+            async_refresh_schedules,
+            SCHEDULE_REFRESH_INTERVAL,
+        ),
+    )
+
+
+async def _async_fetch_schedules(
+    coordinator: OpenMoticsDataUpdateCoordinator,
+) -> bool:
+    """Fetch the schedule of every thermostat unit, return True on changes."""
+    units = coordinator.omclient.thermostats.units
+    if not hasattr(units, "get_schedule"):
+        return False
+
+    unit_ids = [
+        om_thermostatunit.idx
+        for om_thermostatunit in coordinator.data["thermostatunits"]
+        # Schedules that come with the polled data are kept up to date already
+        if getattr(om_thermostatunit, "schedule", None) is None
+    ]
+    results = await asyncio.gather(
+        *(units.get_schedule(unit_id) for unit_id in unit_ids),
+        return_exceptions=True,
+    )
+    changed = False
+    for unit_id, schedule in zip(unit_ids, results):
+        if isinstance(schedule, OpenMoticsError):
+            _LOGGER.debug("Could not fetch schedule of thermostat %s", unit_id)
+            continue
+        if isinstance(schedule, Exception):
+            # The thermostats are set up without the schedule
+            _LOGGER.warning(
+                "Unexpected error fetching the schedule of thermostat %s: %r",
+                unit_id,
+                schedule,
+            )
+            continue
+        if isinstance(schedule, BaseException):
+            raise schedule
+        changed |= coordinator.schedules.update(unit_id, schedule)
+    return changed
 
 
 class OpenMoticsThermostatGroup(OpenMoticsDevice, ClimateEntity):
@@ -118,8 +179,17 @@ class OpenMoticsThermostatGroup(OpenMoticsDevice, ClimateEntity):
 
     coordinator: OpenMoticsDataUpdateCoordinator
 
+    _collection = "thermostatgroups"
+
     _attr_temperature_unit = UnitOfTemperature.CELSIUS
     # _attr_supported_features = ClimateEntityFeature.HVAC_MODE
+    _attr_supported_features = (
+        ClimateEntityFeature.PRESET_MODE | ClimateEntityFeature.TARGET_TEMPERATURE
+    )
+
+    # OpenMotics thermostats go from 6 to 32 degress
+    _attr_min_temp = 6.0
+    _attr_max_temp = 32.0
 
     def __init__(
         self,
@@ -130,18 +200,172 @@ class OpenMoticsThermostatGroup(OpenMoticsDevice, ClimateEntity):
         """Initialize the switch."""
         super().__init__(coordinator, index, om_thermostatgroup, "climate")
 
-        self._device = self.coordinator.data["thermostatgroups"][self.index]
-
         self._attr_hvac_modes = [HVACMode.OFF]
         if "HEATING" in om_thermostatgroup.capabilities:
             self._attr_hvac_modes.append(HVACMode.HEAT)
         if "COOLING" in om_thermostatgroup.capabilities:
             self._attr_hvac_modes.append(HVACMode.COOL)
 
+        self._attr_preset_modes = list(PRESET_MODES_TO_OM.keys())
+
     @property
-    def hvac_mode(self) -> HVACMode:
+    def polled_collections(self) -> tuple[str, ...]:
+        """Return the collections the entity needs on every refresh."""
+        return ("thermostatgroups", "thermostatunits")
+
+    @property
+    def unit_ids(self) -> list[Any]:
+        """Return the ids of the known thermostat units in this group."""
+        known = self.coordinator.store.collections["thermostatunits"].slots
+        return [
+            unit_id for unit_id in self.device.thermostat_ids if unit_id in known
+        ]
+
+    @property
+    def units(self) -> list[Any]:
+        """Return the status of the thermostat units in this group."""
+        return [
+            self.coordinator.store.view("thermostatunits", unit_id)
+            for unit_id in self.unit_ids
+        ]
+
+    @property
+    def hvac_mode(self) -> HVACMode | None:
         """Return hvac operation ie. heat, cool mode."""
-        return OM_TO_HVAC_MODES[self.device.status.mode]
+        if (units := self.units) and all(unit.state == "OFF" for unit in units):
+            return HVACMode.OFF
+        # Unknown until the group is polled
+        return OM_TO_HVAC_MODES.get(self.status.mode)
+
+    @property
+    def current_temperature(self) -> float | None:
+        """Return the average temperature of the thermostat units."""
+        temperatures = [
+            unit.current_temperature
+            for unit in self.units
+            if unit.current_temperature is not None
+        ]
+        if not temperatures:
+            return None
+        return round(sum(temperatures) / len(temperatures), 1)
+
+    @property
+    def target_temperature(self) -> float | None:
+        """Return the setpoint when all thermostat units share it."""
+        setpoints = {unit.current_setpoint for unit in self.units}
+        return setpoints.pop() if len(setpoints) == 1 else None
+
+    @property
+    def preset_mode(self) -> str | None:
+        """Return the preset when all thermostat units share it."""
+        presets = {unit.active_preset for unit in self.units}
+        if len(presets) != 1:
+            return None
+        return OM_TO_PRESET_MODES.get(presets.pop())
+
+    async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
+        """Set the hvac mode of the group and all its thermostat units."""
+        _LOGGER.debug(
+            "Setting thermostat group: %s to mode %s",
+            self.device_id,
+            hvac_mode,
+        )
+        thermostats = self.coordinator.omclient.thermostats
+        om_mode = HVAC_MODES_TO_OM[hvac_mode]
+        if hvac_mode != HVACMode.OFF and hasattr(thermostats.groups, "set_mode"):
+            # Heating/cooling is set on thermostat group level
+            result = await thermostats.groups.set_mode(self.device_id, om_mode)
+            if not _is_success(result):
+                await self.coordinator.async_refresh_collections("thermostatgroups")
+                return
+            self.status.mode = om_mode
+
+        success = await self._async_fan_out(
+            thermostats.units.set_state,
+            "OFF" if hvac_mode == HVACMode.OFF else "ON",
+        )
+        await self._update_units_from_result(success, hvac_mode=hvac_mode)
+
+    async def async_set_temperature(self, **kwargs: Any) -> None:
+        """Set the setpoint of all thermostat units in the group."""
+        if hvac_mode := kwargs.get(ATTR_HVAC_MODE):
+            await self.async_set_hvac_mode(hvac_mode)
+
+        if (temperature := kwargs.get(ATTR_TEMPERATURE)) is None:
+            return
+
+        _LOGGER.debug(
+            "Setting thermostat group: %s to temperature %s",
+            self.device_id,
+            temperature,
+        )
+        success = await self._async_fan_out(
+            self.coordinator.omclient.thermostats.units.set_temperature,
+            temperature,
+        )
+        await self._update_units_from_result(success, setpoint=temperature)
+
+    async def async_set_preset_mode(self, preset_mode: str) -> None:
+        """Set the preset of all thermostat units in the group."""
+        om_preset_mode = PRESET_MODES_TO_OM[preset_mode]
+        _LOGGER.debug(
+            "Setting thermostat group: %s to preset %s",
+            self.device_id,
+            om_preset_mode,
+        )
+        success = await self._async_fan_out(
+            self.coordinator.omclient.thermostats.units.set_preset,
+            om_preset_mode,
+        )
+        await self._update_units_from_result(success, om_preset_mode=om_preset_mode)
+
+    async def _async_fan_out(self, method: Any, *args: Any) -> bool:
+        """Send a command to all thermostat units at once.
+
+        Returns True if every unit accepted it, the units that failed are
+        logged.
+        """
+        unit_ids = self.unit_ids
+        results = await asyncio.gather(
+            *(
+                self.coordinator.batcher.async_call(method, unit_id, *args)
+                for unit_id in unit_ids
+            ),
+            return_exceptions=True,
+        )
+        for unit_id, result in zip(unit_ids, results):
+            if isinstance(result, Exception):
+                _LOGGER.warning(
+                    "Could not send %s to thermostat %s: %s",
+                    getattr(method, "__name__", method),
+                    unit_id,
+                    result,
+                )
+            elif isinstance(result, BaseException):
+                raise result
+        return all(_is_success(result) for result in results)
+
+    async def _update_units_from_result(
+        self,
+        success: bool,
+        *,
+        setpoint: float | None = None,
+        om_preset_mode: str | None = None,
+        hvac_mode: str | None = None,
+    ) -> None:
+        if success:
+            for unit in self.units:
+                if setpoint is not None:
+                    unit.current_setpoint = setpoint
+                if om_preset_mode is not None:
+                    unit.active_preset = om_preset_mode
+                if hvac_mode is not None:
+                    unit.state = "OFF" if hvac_mode == HVACMode.OFF else "ON"
+            # The thermostat units read the same store, let them all update
+            self.coordinator.async_update_listeners()
+        else:
+            _LOGGER.debug("Invalid result, refreshing thermostat units")
+        await self.coordinator.async_refresh_collections("thermostatunits")
 
 
 class OpenMoticsThermostatUnit(OpenMoticsDevice, ClimateEntity):
@@ -149,6 +373,8 @@ class OpenMoticsThermostatUnit(OpenMoticsDevice, ClimateEntity):
 
     coordinator: OpenMoticsDataUpdateCoordinator
 
+    _collection = "thermostatunits"
+
     _attr_temperature_unit = UnitOfTemperature.CELSIUS
     _attr_supported_features = (
         ClimateEntityFeature.PRESET_MODE
@@ -170,8 +396,6 @@ class OpenMoticsThermostatUnit(OpenMoticsDevice, ClimateEntity):
         """Initialize the switch."""
         super().__init__(coordinator, index, om_thermostat, "climate")
 
-        self._device = self.coordinator.data["thermostatunits"][self.index]
-
         self._attr_hvac_modes = [HVACMode.OFF]
         if "HEATING" in om_thermostatgroup.capabilities:
             self._attr_hvac_modes.append(HVACMode.HEAT)
@@ -184,15 +408,14 @@ class OpenMoticsThermostatUnit(OpenMoticsDevice, ClimateEntity):
     @property
     def hvac_mode(self) -> HVACMode:
         """Return hvac operation ie. heat, cool mode."""
-        self._device = self.coordinator.data["thermostatunits"][self.index]
-        if self._device.status.state == "OFF":
+        if self.status.state == "OFF":
             return HVACMode.OFF
 
         # if self.device.status.mode == "HEATING":
         #     return HVACMode.HEAT
         # if self.device.status.mode == "COOLING":
         #     return HVACMode.COOL
-        if state := self._device.status.mode:
+        if state := self.status.mode:
             return OM_TO_HVAC_MODES[state]
 
         return HVACMode.OFF
@@ -218,19 +441,31 @@ class OpenMoticsThermostatUnit(OpenMoticsDevice, ClimateEntity):
             )
         await self._update_state_from_result(result, hvac_mode=hvac_mode)
 
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the scheduled setpoints, computed from the cached schedule."""
+        if (schedule := self.coordinator.schedules.get(self.device_id)) is None:
+            return None
+        now = dt_util.now()
+        next_transition, next_setpoint = schedule.next_transition(now)
+        return {
+            ATTR_SCHEDULED_SETPOINT: schedule.setpoint(now),
+            ATTR_NEXT_SETPOINT: next_setpoint,
+            ATTR_NEXT_TRANSITION: next_transition.isoformat(),
+        }
+
     @property
     def hvac_action(self) -> HVACAction | None:
         """Return the current running hvac operation if supported."""
         try:
-            self._device = self.coordinator.data["thermostatunits"][self.index]
-            return OM_TO_HVAC_ACTIONS[self._device.status.mode]
+            return OM_TO_HVAC_ACTIONS[self.status.mode]
         except (AttributeError, KeyError):
             return None
 
     @property
     def current_temperature(self) -> float:
         """Return current temperature."""
-        return self._device.status.current_temperature
+        return self.status.current_temperature
 
     async def async_set_temperature(self, **kwargs: Any) -> None:
         """Set new target temperature."""
@@ -255,8 +490,7 @@ class OpenMoticsThermostatUnit(OpenMoticsDevice, ClimateEntity):
     def target_temperature(self) -> float | None:
         """Return the temperature we try to reach."""
         try:
-            self._device = self.coordinator.data["thermostatunits"][self.index]
-            return self._device.status.current_setpoint
+            return self.status.current_setpoint
         except (AttributeError, KeyError):
             return None
 
@@ -279,8 +513,7 @@ class OpenMoticsThermostatUnit(OpenMoticsDevice, ClimateEntity):
     def preset_mode(self) -> str | None:
         """Return the current preset mode, e.g., home, away, temp."""
         try:
-            self._device = self.coordinator.data["thermostatunits"][self.index]
-            return OM_TO_PRESET_MODES[self.device.status.active_preset]
+            return OM_TO_PRESET_MODES[self.status.active_preset]
         except (AttributeError, KeyError):
             return None
 
@@ -293,16 +526,18 @@ class OpenMoticsThermostatUnit(OpenMoticsDevice, ClimateEntity):
         hvac_mode: str | None = None,
     ) -> None:
         if isinstance(result, dict) and result.get("_error") is None:
+            self._async_trace_sent()
             if setpoint is not None:
-                self._device.status.current_setpoint = setpoint
+                self.status.current_setpoint = setpoint
             if om_preset_mode is not None:
-                self._device.status.active_preset = om_preset_mode
+                self.status.active_preset = om_preset_mode
             if hvac_mode is not None:
                 if hvac_mode == HVACMode.OFF:
-                    self._device.status.state = "OFF"
+                    self.status.state = "OFF"
                 else:
-                    self._device.status.state = "ON"
+                    self.status.state = "ON"
                     # self._device.status.mode = PRESET_MODES_INVERTED[preset_mode]
+            self._async_trace_acknowledged(result)
             self.async_write_ha_state()
         else:
             _LOGGER.debug("Invalid result, refreshing all")
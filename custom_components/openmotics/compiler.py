@@ -0,0 +1,164 @@
+"""Compile simple automations into group actions of the OpenMotics gateway.
+
+An automation that is triggered by the press of an OpenMotics input and only
+switches OpenMotics outputs or moves shutters can run on the gateway itself,
+without the round trip through Home Assistant (and the cloud), e.g.
+
+    trigger:
+      - platform: event
+        event_type: openmotics_input
+        event_data: {input_id: 12, type: press}
+    action:
+      - service: light.toggle
+        target: {entity_id: [light.hall, light.stairs]}
+      - service: cover.close_cover
+        target: {entity_id: cover.kitchen}
+
+Everything else (conditions, templates, delays, service data, other
+entities) keeps running in Home Assistant.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from .const import EVENT_INPUT
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Basic action types of the gateway
+ACTION_EXECUTE_GROUP_ACTION = 2
+ACTION_SHUTTER_UP = 100
+ACTION_SHUTTER_DOWN = 101
+ACTION_SHUTTER_STOP = 102
+ACTION_OUTPUT_OFF = 160
+ACTION_OUTPUT_ON = 161
+ACTION_OUTPUT_TOGGLE = 162
+
+# A group action holds at most this many basic actions.
+MAX_BASIC_ACTIONS = 16
+
+SERVICE_ACTIONS: dict[str, dict[str, int]] = {
+    "output": {
+        "turn_on": ACTION_OUTPUT_ON,
+        "turn_off": ACTION_OUTPUT_OFF,
+        "toggle": ACTION_OUTPUT_TOGGLE,
+    },
+    "shutter": {
+        "open_cover": ACTION_SHUTTER_UP,
+        "close_cover": ACTION_SHUTTER_DOWN,
+        "stop_cover": ACTION_SHUTTER_STOP,
+    },
+}
+# Domains of the services that can be compiled
+SERVICE_DOMAINS = {"light", "switch", "homeassistant", "cover"}
+
+
+class BasicAction(NamedTuple):
+    """A basic action of the gateway, a type and the device it acts on."""
+
+    action_type: int
+    number: int
+
+
+class CompiledAutomation(NamedTuple):
+    """An automation that runs as a group action on the gateway."""
+
+    automation_id: str
+    name: str
+    input_id: int
+    actions: tuple[BasicAction, ...]
+
+
+class NotCompilable(Exception):
+    """The automation can't run on the gateway."""
+
+
+def _as_list(value: Any) -> list[Any]:
+    """Return a value as a list."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _input_id(triggers: Any) -> int:
+    """Return the input triggering the automation."""
+    triggers = _as_list(triggers)
+    if len(triggers) != 1:
+        raise NotCompilable("needs exactly one trigger")
+    trigger = triggers[0]
+    platform = trigger.get("platform", trigger.get("trigger"))
+    if platform != "event" or trigger.get("event_type") != EVENT_INPUT:
+        raise NotCompilable(f"the trigger is not an {EVENT_INPUT} event")
+    event_data = trigger.get("event_data") or {}
+    if event_data.get("type") != "press" or set(event_data) - {
+        "input_id",
+        "installation_id",
+        "type",
+    }:
+        raise NotCompilable("only the press of an input can be compiled")
+    try:
+        return int(event_data["input_id"])
+    except (KeyError, TypeError, ValueError) as err:
+        raise NotCompilable("the trigger has no input_id") from err
+
+
+def _entity_ids(action: dict[str, Any]) -> list[str]:
+    """Return the entities targeted by a service call."""
+    data = dict(action.get("data") or {})
+    target = dict(action.get("target") or {})
+    entity_ids = [
+        *_as_list(action.get("entity_id")),
+        *_as_list(target.pop("entity_id", None)),
+        *_as_list(data.pop("entity_id", None)),
+    ]
+    if data or target:
+        raise NotCompilable("service data and other targets can't be compiled")
+    if not entity_ids or any("{{" in str(entity_id) for entity_id in entity_ids):
+        raise NotCompilable("the entities of an action must be listed")
+    return entity_ids
+
+
+def compile_automation(
+    config: dict[str, Any],
+    resolve: Callable[[str], tuple[str, int] | None],
+    *,
+    automation_id: str,
+) -> CompiledAutomation:
+    """Compile an automation, raise NotCompilable if it can't run on the gateway.
+
+    `resolve` returns the kind ("output" or "shutter") and the number of the
+    gateway device behind an entity, None if the entity is not one of ours.
+    """
+    if _as_list(config.get("condition", config.get("conditions"))):
+        raise NotCompilable("conditions can't be compiled")
+    input_id = _input_id(config.get("trigger", config.get("triggers")))
+
+    actions: list[BasicAction] = []
+    for action in _as_list(config.get("action", config.get("actions"))):
+        service = action.get("service", action.get("action"))
+        if not isinstance(service, str) or service.count(".") != 1:
+            raise NotCompilable("only service calls can be compiled")
+        domain, service_name = service.split(".")
+        if domain not in SERVICE_DOMAINS:
+            raise NotCompilable(f"{service} can't be compiled")
+        for entity_id in _entity_ids(action):
+            if domain != "homeassistant" and not entity_id.startswith(f"{domain}."):
+                raise NotCompilable(f"{service} can't act on {entity_id}")
+            if (device := resolve(entity_id)) is None:
+                raise NotCompilable(f"{entity_id} is not on this gateway")
+            kind, number = device
+            if (action_type := SERVICE_ACTIONS[kind].get(service_name)) is None:
+                raise NotCompilable(f"{service} can't be compiled for {entity_id}")
+            actions.append(BasicAction(action_type, number))
+
+    if not actions:
+        raise NotCompilable("the automation has no actions")
+    if len(actions) > MAX_BASIC_ACTIONS:
+        raise NotCompilable(f"a group action holds at most {MAX_BASIC_ACTIONS} actions")
+    return CompiledAutomation(
+        automation_id,
+        str(config.get("alias") or automation_id),
+        input_id,
+        tuple(actions),
+    )
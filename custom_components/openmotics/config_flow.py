@@ -17,6 +17,7 @@ from homeassistant.const import (
     CONF_PORT,
     CONF_VERIFY_SSL,
 )
+from homeassistant.core import callback
 from homeassistant.helpers import config_entry_oauth2_flow
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
@@ -30,7 +31,22 @@ from pyhaopenmotics import (
     OpenMoticsError,
 )
 
-from .const import CONF_INSTALLATION_ID, DOMAIN, ENV_CLOUD, ENV_LOCAL
+from .const import (
+    CONF_COMMAND_JOURNAL,
+    CONF_DEVICE_TOPOLOGY,
+    CONF_INSTALLATION_ID,
+    CONF_LOCAL_IP_ADDRESS,
+    CONF_LOCAL_PASSWORD,
+    CONF_LOCAL_PORT,
+    CONF_LOCAL_USERNAME,
+    CONF_LOCAL_VERIFY_SSL,
+    CONF_OFFLOAD_AUTOMATIONS,
+    DEFAULT_DEVICE_TOPOLOGY,
+    DEVICE_TOPOLOGIES,
+    DOMAIN,
+    ENV_CLOUD,
+    ENV_LOCAL,
+)
 from .exceptions import CannotConnect
 from .oauth_impl import OpenMoticsOauth2Implementation
 
@@ -77,30 +93,31 @@ class OpenMoticsFlowHandler(
         """Create a new instance of the flow handler."""
         super().__init__()
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OpenMoticsOptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OpenMoticsOptionsFlowHandler(config_entry)
+
     @property
     def logger(self) -> logging.Logger:
         """Return logger."""
         return logging.getLogger(__name__)
 
-    def is_local_device_already_added(self) -> bool:
-        """Check if a Local device has already been added."""
-        for entry in self._async_current_entries():
-            if entry.unique_id is not None and entry.unique_id.startswith(
-                f"{DOMAIN}-Local-",
-            ):
-                return True
-        return False
+    def is_local_device_already_added(self, ip_address: str) -> bool:
+        """Check if the gateway at an address has already been added."""
+        return any(
+            entry.data.get(CONF_IP_ADDRESS) == ip_address
+            for entry in self._async_current_entries()
+        )
 
     async def async_step_user(
         self,
         user_input: dict[str, str] | None = None,
     ) -> FlowResult:
         """Handle a flow initiated by the user."""
-        # If there is a Local entry already, abort a new entry
-        # If you want to manage multiple devices, do it via cloud
-        if self.is_local_device_already_added():
-            return self.async_abort(reason="already_configured_local_device")
-
         return await self.async_step_environment()
 
     async def async_step_environment(
@@ -255,6 +272,10 @@ class OpenMoticsFlowHandler(
         errors = {}
 
         if user_input is not None:
+            # Any number of gateways can be added, but each only once
+            if self.is_local_device_already_added(user_input[CONF_IP_ADDRESS]):
+                return self.async_abort(reason="already_configured")
+
             self.data = {
                 CONF_IP_ADDRESS: user_input[CONF_IP_ADDRESS],
                 CONF_NAME: user_input[CONF_NAME],
@@ -313,6 +334,7 @@ class OpenMoticsFlowHandler(
             self.data[CONF_IP_ADDRESS],
         )
         await self.async_set_unique_id(unique_id)
+        self._abort_if_unique_id_configured()
 
         return self.async_create_entry(title=unique_id, data=self.data)
 
@@ -320,3 +342,116 @@ class OpenMoticsFlowHandler(
     def construct_unique_id(om_type: str, install_id: str) -> str:
         """Construct the unique id from the ssdp discovery or user_step."""
         return f"{om_type}-{install_id}"
+
+
+class OpenMoticsOptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of an OpenMotics entry."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+        self.options: dict[str, Any] = {}
+
+    async def async_step_init(
+        self,
+        user_input: dict[str, Any] | None = None,
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            self.options.update(user_input)
+            if CONF_IP_ADDRESS in self.config_entry.data:
+                return self.async_create_entry(title="", data=self.options)
+            return await self.async_step_local()
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_DEVICE_TOPOLOGY,
+                        default=self.config_entry.options.get(
+                            CONF_DEVICE_TOPOLOGY,
+                            DEFAULT_DEVICE_TOPOLOGY,
+                        ),
+                    ): vol.In(DEVICE_TOPOLOGIES),
+                    vol.Required(
+                        CONF_OFFLOAD_AUTOMATIONS,
+                        default=self.config_entry.options.get(
+                            CONF_OFFLOAD_AUTOMATIONS,
+                            False,
+                        ),
+                    ): bool,
+                    vol.Required(
+                        CONF_COMMAND_JOURNAL,
+                        default=self.config_entry.options.get(
+                            CONF_COMMAND_JOURNAL,
+                            False,
+                        ),
+                    ): bool,
+                },
+            ),
+        )
+
+    async def async_step_local(
+        self,
+        user_input: dict[str, Any] | None = None,
+    ) -> FlowResult:
+        """Pair a cloud installation with its gateway on the LAN."""
+        errors = {}
+
+        if user_input is not None:
+            if not user_input.get(CONF_LOCAL_IP_ADDRESS):
+                return self.async_create_entry(title="", data=self.options)
+            if CONF_LOCAL_PASSWORD not in user_input:
+                # The password is not shown, keep the one entered before
+                user_input[CONF_LOCAL_PASSWORD] = self.config_entry.options.get(
+                    CONF_LOCAL_PASSWORD,
+                )
+            try:
+                omclient = LocalGateway(
+                    localgw=user_input[CONF_LOCAL_IP_ADDRESS],
+                    username=user_input.get(CONF_LOCAL_USERNAME),
+                    password=user_input.get(CONF_LOCAL_PASSWORD),
+                    port=user_input[CONF_LOCAL_PORT],
+                    tls=user_input[CONF_LOCAL_VERIFY_SSL],
+                )
+                await omclient.get_token()
+                await omclient.exec_action("get_version")
+                await omclient.close()
+            except (asyncio.TimeoutError, OpenMoticsError) as err:
+                _LOGGER.error("Error: %s", err)
+                errors["base"] = "cannot_connect"
+            else:
+                self.options.update(user_input)
+                return self.async_create_entry(title="", data=self.options)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="local",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_LOCAL_IP_ADDRESS,
+                        description={
+                            "suggested_value": options.get(CONF_LOCAL_IP_ADDRESS),
+                        },
+                    ): cv.string,
+                    vol.Optional(
+                        CONF_LOCAL_USERNAME,
+                        description={
+                            "suggested_value": options.get(CONF_LOCAL_USERNAME),
+                        },
+                    ): cv.string,
+                    vol.Optional(CONF_LOCAL_PASSWORD): cv.string,
+                    vol.Optional(
+                        CONF_LOCAL_PORT,
+                        default=options.get(CONF_LOCAL_PORT, DEFAULT_PORT),
+                    ): int,
+                    vol.Optional(
+                        CONF_LOCAL_VERIFY_SSL,
+                        default=options.get(CONF_LOCAL_VERIFY_SSL, DEFAULT_VERIFY_SSL),
+                    ): bool,
+                },
+            ),
+            errors=errors,
+        )
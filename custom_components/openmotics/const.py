@@ -8,6 +8,9 @@ NAME = "OpenMotics Integration"
 ATTR_MANUFACTURER = "OpenMotics"
 DOMAIN = "openmotics"
 DOMAIN_DATA = f"{DOMAIN}_data"
+DATA_SCHEDULER = f"{DOMAIN}_scheduler"
+DATA_CLOUD_HUBS = f"{DOMAIN}_cloud_hubs"
+DATA_PROFILER = f"{DOMAIN}_profiler"
 VERSION = "0.0.1"
 ATTRIBUTION = "Data provided by http://jsonplaceholder.typicode.com/"
 ISSUE_URL = "https://github.com/openmotics/home-assistant/issues"
@@ -23,8 +26,15 @@ ENV_LOCAL = "local"
 # to late. 28 seconds is better.
 DEFAULT_SCAN_INTERVAL = timedelta(seconds=30)
 
+# Collections without enabled entities are fetched now and then to discover
+# new devices.
+CATALOGUE_REFRESH_INTERVAL = timedelta(minutes=15)
+
+# Schedules rarely change, they are only fetched again every few hours.
+SCHEDULE_REFRESH_INTERVAL = timedelta(hours=6)
+
 PLATFORMS = [
-    # Platform.BINARY_SENSORa
+    Platform.BINARY_SENSOR,
     Platform.CLIMATE,
     Platform.SWITCH,
     Platform.COVER,
@@ -33,6 +43,25 @@ PLATFORMS = [
     Platform.SCENE,
 ]
 
+# Collections backing the entities of each platform, a platform is only set
+# up once one of them has devices.
+PLATFORM_COLLECTIONS = {
+    Platform.BINARY_SENSOR: ("inputs",),
+    Platform.CLIMATE: ("thermostatgroups", "thermostatunits"),
+    Platform.SWITCH: ("outputs",),
+    Platform.COVER: ("shutters",),
+    Platform.LIGHT: ("outputs", "lights"),
+    Platform.SENSOR: ("sensors", "energysensors"),
+    Platform.SCENE: ("groupactions",),
+}
+
+# Platforms with entities of the installation itself, set up even when the
+# installation has no devices for them.
+INSTALLATION_PLATFORMS = (Platform.SENSOR,)
+
+# Platforms set up in the background once Home Assistant has started.
+BACKGROUND_PLATFORMS = (Platform.CLIMATE, Platform.SCENE)
+
 PRESET_AUTO = "auto"
 PRESET_PARTY = "party"
 PRESET_MANUAL = "manual"
@@ -41,6 +70,71 @@ PRESET_VACATION = "vacantion"
 # Configuration and options
 CONF_ENABLED = "enabled"
 CONF_INSTALLATION_ID = "installation_id"
+CONF_DEVICE_TOPOLOGY = "device_topology"
+CONF_OFFLOAD_AUTOMATIONS = "offload_automations"
+CONF_COMMAND_JOURNAL = "command_journal"
+# The local gateway of a cloud installation
+CONF_LOCAL_IP_ADDRESS = "local_ip_address"
+CONF_LOCAL_USERNAME = "local_username"
+CONF_LOCAL_PASSWORD = "local_password"
+CONF_LOCAL_PORT = "local_port"
+CONF_LOCAL_VERIFY_SSL = "local_verify_ssl"
+
+# How entities are grouped into devices
+TOPOLOGY_INSTALLATION = "installation"
+TOPOLOGY_MODULE = "module"
+TOPOLOGY_ROOM = "room"
+DEVICE_TOPOLOGIES = [TOPOLOGY_INSTALLATION, TOPOLOGY_MODULE, TOPOLOGY_ROOM]
+DEFAULT_DEVICE_TOPOLOGY = TOPOLOGY_INSTALLATION
+
+# Channels of the usual hardware modules behind a collection, the other
+# collections are virtual and belong to the installation. The API does not
+# return the module of a device, so the module topology estimates it from
+# the device number; modules with other channel counts (or devices moved
+# between modules) end up in the wrong device, hence the installation is
+# the default topology.
+MODULE_CHANNELS = {
+    "outputs": 8,
+    "lights": 8,
+    "inputs": 8,
+    "shutters": 4,
+    "sensors": 8,
+    "energysensors": 12,
+}
+
+# Events
+EVENT_INPUT = f"{DOMAIN}_input"
+
+# Group actions compiled from automations, the name shows where they come from
+GROUP_ACTION_PREFIX = "HA: "
+MAX_GROUP_ACTIONS = 160
+
+# Services and their attributes
+SERVICE_SET_TRAVEL_TIME = "set_travel_time"
+ATTR_TRAVEL_TIME_UP = "travel_time_up"
+ATTR_TRAVEL_TIME_DOWN = "travel_time_down"
+SERVICE_MOVE_SHUTTERS = "move_shutters"
+ATTR_ACTION = "action"
+SHUTTER_ACTIONS = ["open", "close", "stop"]
+SERVICE_ROOM_OFF = "room_off"
+SERVICE_FLOOR_SET_SHUTTERS = "floor_set_shutters"
+ATTR_ROOM = "room"
+ATTR_FLOOR = "floor"
+SERVICE_TURN_ON_FOR = "turn_on_for"
+ATTR_DURATION = "duration"
+ATTR_TIMER_ENDS = "timer_ends"
+ATTR_REMAINING_TIME = "remaining_time"
+SERVICE_PROFILE = "profile"
+ATTR_PHASE = "phase"
+ATTR_COUNT = "count"
+PROFILE_PHASES = ["refresh", "setup"]
+# Longest timer the gateway accepts, in seconds
+MAX_OUTPUT_TIMER = 65535
+
+# Thermostat schedule attributes
+ATTR_SCHEDULED_SETPOINT = "scheduled_setpoint"
+ATTR_NEXT_SETPOINT = "next_setpoint"
+ATTR_NEXT_TRANSITION = "next_transition"
 
 # Defaults
 DEFAULT_NAME = DOMAIN
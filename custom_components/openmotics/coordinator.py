@@ -1,9 +1,17 @@
 """DataUpdateCoordinator for the OpenMotics integration."""
 from __future__ import annotations
 
+import asyncio
+import base64
+import functools
+import inspect
+import json
 import logging
-from typing import TYPE_CHECKING, Any
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Any, NoReturn
 
+import async_timeout
 from homeassistant.const import (
     CONF_IP_ADDRESS,
     CONF_NAME,
@@ -11,23 +19,91 @@ from homeassistant.const import (
     CONF_PORT,
     CONF_VERIFY_SSL,
 )
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import (
+    async_create_clientsession,
+    async_get_clientsession,
+)
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
 from pyhaopenmotics import (
     LocalGateway,
     OpenMoticsCloud,
     OpenMoticsError,
     get_ssl_context,
 )
+from pyhaopenmotics.const import CLOUD_API_VERSION, CLOUD_BASE_URL
 
-from .const import CONF_INSTALLATION_ID, DEFAULT_SCAN_INTERVAL, DOMAIN
+from .batch import CommandBatcher
+from .breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker
+from .compiler import ACTION_EXECUTE_GROUP_ACTION
+from .const import (
+    CATALOGUE_REFRESH_INTERVAL,
+    CONF_DEVICE_TOPOLOGY,
+    CONF_INSTALLATION_ID,
+    CONF_LOCAL_IP_ADDRESS,
+    CONF_LOCAL_PASSWORD,
+    CONF_LOCAL_PORT,
+    CONF_LOCAL_USERNAME,
+    CONF_LOCAL_VERIFY_SSL,
+    DEFAULT_DEVICE_TOPOLOGY,
+    DEFAULT_SCAN_INTERVAL,
+    DOMAIN,
+)
+from .deadline import CollectionDeadlines
+from .events import EVENT_TYPE_INPUT_CHANGE, InputEventHandler, OpenMoticsEventStream
+from .exceptions import OffloadNotSupported, TimerNotSupported
+from .journal import CommandJournal, JournalClient
+from .location import LocationIndex, signal_locations
+from .metrics import InstrumentedClient, RequestMetrics, payload_trace_config
+from .profiler import PHASE_REFRESH, async_get_profiler
+from .recorder import CALLER, CALLER_POLL, CALLER_REFRESH, FlightRecorder
+from .schedule import ThermostatScheduleCache
+from .scheduler import GatewayHealth, async_get_scheduler
+from .slicer import LoopSlicer
+from .store import OpenMoticsStatusStore
+from .tracing import CommandTracer
+from .transport import FAILOVER_ERRORS, HybridClient, HybridTransport
 
 if TYPE_CHECKING:
-    from homeassistant.core import HomeAssistant
-    from homeassistant.helpers.config_entry_oauth2_flow import OAuth2Session
+    from collections.abc import Iterable
+    from datetime import timedelta
+
+    import aiohttp
+
+    from .compiler import BasicAction
+
+    from homeassistant.const import Platform
+    from homeassistant.core import CALLBACK_TYPE, HomeAssistant
+
+    from .hub import OpenMoticsCloudHub
 
 _LOGGER = logging.getLogger(__name__)
 
+# Devices processed between two checks whether the loop should be given back
+PROCESS_CHUNK = 100
+
+# Input configuration of the gateway: run the basic actions, or do nothing
+INPUT_BASIC_ACTIONS = 240
+INPUT_NO_ACTION = 255
+
+# Collections in the coordinator data and the API controller serving them
+COLLECTIONS: dict[str, str] = {
+    "outputs": "outputs",
+    "lights": "lights",
+    "inputs": "inputs",
+    "groupactions": "groupactions",
+    "shutters": "shutters",
+    "sensors": "sensors",
+    "energysensors": "energysensors",
+    "thermostatgroups": "thermostats.groups",
+    "thermostatunits": "thermostats.units",
+    "rooms": "rooms",
+}
+
 
 class OpenMoticsDataUpdateCoordinator(DataUpdateCoordinator):
     """Query OpenMotics devices and keep track of seen conditions."""
@@ -41,58 +117,505 @@ class OpenMoticsDataUpdateCoordinator(DataUpdateCoordinator):
             update_interval=DEFAULT_SCAN_INTERVAL,
         )
         self.session = None
-        self._omclient: OpenMoticsCloud | LocalGateway
+        # Every request of the client is measured, the last ones remembered
+        self.metrics = RequestMetrics()
+        self.recorder = FlightRecorder()
+        self._omclient: InstrumentedClient
         self._install_id = None
+        self.store = OpenMoticsStatusStore()
+        self.tracer = CommandTracer(self.store)
+        self.batcher = CommandBatcher(hass)
+        self.schedules = ThermostatScheduleCache()
+        self.locations = LocationIndex()
+        self.events: OpenMoticsEventStream | None = None
+        self.inputs: InputEventHandler | None = None
+        self._ssl_context: Any = None
+        # Number of enabled entities backed by each collection
+        self._collection_users: Counter[str] = Counter()
+        self._catalogue_fetched = 0.0
+        # How the entities are grouped into devices
+        self.device_topology = (
+            self.config_entry.options.get(CONF_DEVICE_TOPOLOGY, DEFAULT_DEVICE_TOPOLOGY)
+            if self.config_entry is not None
+            else DEFAULT_DEVICE_TOPOLOGY
+        )
+        # Platforms set up for the entry and how long the setup took
+        self.platforms: set[Platform] = set()
+        self.setup_times: dict[str, float] = {}
+        # Refreshes of all entries are spread by the shared scheduler
+        self.scheduler = async_get_scheduler(hass)
+        self.health = GatewayHealth()
+        self.deadlines = CollectionDeadlines()
+        self.breaker = CircuitBreaker(f"OpenMotics {self.name}")
+        # Commands sent while unreachable, when enabled
+        self.journal: CommandJournal | None = None
+        # Hash of the devices of each collection, and whether the entities
+        # need to hear about the last refresh
+        self._fingerprints: dict[str, int] = {}
+        # Devices of each collection by id, for the list they were taken from
+        self._devices: dict[str, tuple[list[Any], dict[Any, Any]]] = {}
+        self._notify = True
+        self.unchanged_refreshes = 0
+        # Entities about the refreshes themselves, updated after every one
+        self._diagnostic_listeners: set[CALLBACK_TYPE] = set()
+        self.slicer = LoopSlicer()
+        self.profiler = async_get_profiler(hass)
 
     async def _async_update_data(self) -> dict[Any, Any]:
+        """Refresh when it is the turn of this entry.
+
+        While the installation is unreachable no request is sent, the refresh
+        fails right away and the entities become unavailable.
+        """
+        self._notify = True
+        self.slicer.reset()
+        if self.profiler.phase == PHASE_REFRESH:
+            # Until the entities are updated
+            self.profiler.async_start(PHASE_REFRESH, self)
+        caller = CALLER.set(CALLER_POLL)
+        failed = True
+        try:
+            if not await self._async_reachable():
+                raise UpdateFailed(
+                    f"{self.name} is unreachable, "
+                    f"retrying in {self.breaker.retry_in:.0f}s",
+                )
+            async with self.scheduler.async_slot():
+                started = time.monotonic()
+                try:
+                    data = await self._async_poll()
+                finally:
+                    self.metrics.record_refresh(time.monotonic() - started)
+            failed = False
+            return data
+        finally:
+            CALLER.reset(caller)
+            if failed and self.profiler.phase == PHASE_REFRESH:
+                # The entities are not always updated after a failed refresh
+                self.profiler.async_stop(PHASE_REFRESH, self)
+
+    async def _async_reachable(self) -> bool:
+        """Return False while the breaker is open or the other side is not back."""
+        state = self.breaker.state
+        if state == STATE_OPEN:
+            return False
+        if state == STATE_HALF_OPEN:
+            try:
+                await self._async_probe()
+            except (OpenMoticsError, asyncio.TimeoutError) as err:
+                self._record_failure(err)
+                return False
+        return True
+
+    async def _async_probe(self) -> None:
+        """Send a cheap request, raise if it fails.
+
+        Without one the next refresh is the probe.
+        """
+
+    def _record_success(self) -> None:
+        """Record a successful refresh, send the commands queued meanwhile."""
+        self.health.record_success()
+        self.breaker.record_success()
+        if self.journal is not None:
+            self.journal.async_schedule_replay(
+                self._command_client,
+                self.async_request_refresh,
+            )
+
+    async def async_start_journal(self) -> None:
+        """Queue the commands sent while the installation is unreachable."""
+        self.journal = CommandJournal(
+            self.hass,
+            self.config_entry.entry_id,
+            self.batcher,
+            lambda: not self.breaker.allows_request,
+            replayed=self._async_command_replayed,
+        )
+        await self.journal.async_load()
+
+    @callback
+    def _async_command_replayed(
+        self,
+        path: tuple[str, ...],
+        idx: Any,
+        sent: bool,
+    ) -> None:
+        """Acknowledge the trace of a queued command once it is sent."""
+        controller = ".".join(path)
+        for collection, collection_controller in COLLECTIONS.items():
+            if collection_controller == controller:
+                self.tracer.replayed(collection, idx, sent)
+                return
+
+    def _record_failure(self, err: Exception) -> None:
+        """Record a failed refresh."""
+        self.health.record_failure(err)
+        self.breaker.record_failure(err)
+
+    async def _async_poll(self) -> dict[Any, Any]:
         """Fetch data from API endpoint.
 
         This is the place to pre-process the data to lookup tables
         so entities can quickly look up their data.
         """
+        # Collections without enabled entities keep their previous data
+        data = dict(self.data or {})
+        collections = self.active_collections
+        quiet = self._quiet
+        fetched = []
         try:
-            my_outputs = await self._omclient.outputs.get_all()
-            my_lights = await self._omclient.lights.get_all()
-            my_groupactions = await self._omclient.groupactions.get_all()
-            my_shutters = await self._omclient.shutters.get_all()
-            my_sensors = await self._omclient.sensors.get_all()
-            my_thermostatgroups = await self._omclient.thermostats.groups.get_all()
-            my_thermostatunits = await self._omclient.thermostats.units.get_all()
-            if hasattr(self._omclient, "energysensors"):
-                my_energysensors = await self._omclient.energysensors.get_all()
-            else:
-                my_energysensors = []
-
+            for collection in collections:
+                if (devices := await self._async_fetch_in_time(collection)) is None:
+                    if self.data is None:
+                        # Without its devices the platforms can't be set up
+                        raise UpdateFailed(f"Fetching {collection} took too long")
+                    # Only the entities of this collection become unavailable
+                    data.setdefault(collection, [])
+                    continue
+                data[collection] = devices
+                fetched.append(collection)
         except OpenMoticsError as err:
-            _LOGGER.error("Could not retrieve the data from the OpenMotics API")
-            _LOGGER.error("Too many errors: %s", err)
-            return {
-                "lights": [],
-                "outputs": [],
-                "groupactions": [],
-                "shutters": [],
-                "sensors": [],
-                "energysensors": [],
-                "thermostatgroups": [],
-                "thermostatunits": [],
+            self._record_failure(err)
+            # The known devices are kept, discovery does not remove them
+            raise UpdateFailed(
+                f"Could not retrieve the OpenMotics data: {err}",
+            ) from err
+        if collections and not fetched:
+            self._fail_all_overran(collections)
+
+        self._record_success()
+        if len(fetched) == len(COLLECTIONS):
+            self._catalogue_fetched = time.monotonic()
+        changed = False
+        for collection in fetched:
+            changed |= await self._async_update_caches(collection, data[collection])
+        self._skip_unchanged(
+            quiet and not changed and len(fetched) == len(collections),
+        )
+        return data
+
+    def _fail_all_overran(self, collections: Iterable[str]) -> NoReturn:
+        """Fail a refresh in which no collection answered in time.
+
+        A gateway that hangs is as good as down: it counts towards the
+        breaker like any other failed refresh, the health doesn't recover and
+        the queued commands stay queued.
+        """
+        err = asyncio.TimeoutError(
+            f"Fetching {', '.join(collections)} took too long",
+        )
+        self._record_failure(err)
+        raise UpdateFailed(f"Could not retrieve the OpenMotics data: {err}")
+
+    @property
+    def _quiet(self) -> bool:
+        """Return True if nothing but new data can change the entities."""
+        return self.breaker.state == STATE_CLOSED and not self.deadlines.failing
+
+    def _skip_unchanged(self, unchanged: bool) -> None:
+        """Only notify the diagnostic entities of a refresh that found nothing new."""
+        if unchanged:
+            self._notify = False
+            self.unchanged_refreshes += 1
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update the entities, unless the last refresh found nothing new."""
+        if not self._notify:
+            self._notify = True
+            for update_callback in list(self._diagnostic_listeners):
+                update_callback()
+        else:
+            super().async_update_listeners()
+        if self.profiler.phase == PHASE_REFRESH:
+            self.profiler.async_stop(PHASE_REFRESH, self)
+
+    @callback
+    def async_add_diagnostic_listener(
+        self,
+        update_callback: CALLBACK_TYPE,
+    ) -> CALLBACK_TYPE:
+        """Update a diagnostic entity also after a refresh that found nothing new.
+
+        The other listeners still update it after the other refreshes.
+        """
+        self._diagnostic_listeners.add(update_callback)
+
+        @callback
+        def _async_remove() -> None:
+            self._diagnostic_listeners.discard(update_callback)
+
+        return _async_remove
+
+    @property
+    def active_collections(self) -> list[str]:
+        """Return the collections that are fetched on a refresh.
+
+        The first refresh fetches everything to set up the platforms, after
+        that only the collections backing at least one enabled entity. Now
+        and then everything is fetched again to discover new devices.
+        """
+        if self.data is None or self.catalogue_due:
+            return list(COLLECTIONS)
+        return [
+            collection
+            for collection in COLLECTIONS
+            if self._collection_users[collection] > 0
+        ]
+
+    @property
+    def catalogue_due(self) -> bool:
+        """Return True if all collections should be fetched again."""
+        return (
+            time.monotonic() - self._catalogue_fetched
+            > CATALOGUE_REFRESH_INTERVAL.total_seconds()
+        )
+
+    @callback
+    def async_use_collections(self, collections: Iterable[str]) -> CALLBACK_TYPE:
+        """Fetch collections for an entity, until the returned callback is called.
+
+        Disabled entities are never added to Home Assistant, so they don't
+        keep their collection alive.
+        """
+        collections = list(collections)
+        self._collection_users.update(collections)
+
+        @callback
+        def _async_release() -> None:
+            self._collection_users.subtract(collections)
+
+        return _async_release
+
+    async def _async_update_status(self, collection: str, devices: list[Any]) -> bool:
+        """Update the status store in slices, return True if anything changed."""
+        # The entities read their status from the store, which is updated
+        # in place so a refresh does not allocate new objects per device.
+        # The models of the client are left as they are.
+        changed = False
+        self.slicer.begin()
+        for start in range(0, len(devices), PROCESS_CHUNK):
+            chunk = devices[start : start + PROCESS_CHUNK]
+            changed |= self.store.update(collection, chunk)
+            if collection == "thermostatunits":
+                for device in chunk:
+                    if (schedule := getattr(device, "schedule", None)) is not None:
+                        changed |= self.schedules.update(device.idx, schedule)
+            await self.slicer.async_checkpoint()
+        self.slicer.end()
+        # Commands whose state the gateway now reports are confirmed
+        self.tracer.confirm(collection)
+        return changed
+
+    async def _async_update_caches(self, collection: str, devices: list[Any]) -> bool:
+        """Update the status store, schedules and locations with fetched devices.
+
+        Returns True if anything the entities show changed.
+        """
+        changed = await self._async_update_status(collection, devices)
+        self.slicer.begin()
+        # Devices that were added, removed or renamed
+        fingerprint = hash(
+            tuple((device.idx, getattr(device, "name", None)) for device in devices),
+        )
+        if self._fingerprints.get(collection) != fingerprint:
+            self._fingerprints[collection] = fingerprint
+            changed = True
+
+        if collection == "rooms":
+            moved = self.locations.update_rooms(devices)
+        else:
+            moved = self.locations.update(collection, devices)
+        if moved and self.data is not None:
+            # The entities move to the areas of their new rooms
+            async_dispatcher_send(
+                self.hass,
+                signal_locations(self.config_entry.entry_id),
+            )
+        self.slicer.end()
+        return changed or moved
+
+    async def _async_fetch(self, collection: str) -> list[Any]:
+        """Fetch all devices of a collection, empty if the API lacks it."""
+        controller = self._omclient
+        for attribute in COLLECTIONS[collection].split("."):
+            if (controller := getattr(controller, attribute, None)) is None:
+                return []
+        return await controller.get_all()
+
+    async def _async_fetch_in_time(self, collection: str) -> list[Any] | None:
+        """Fetch a collection within its deadline, None if it overran."""
+        deadline = self.deadlines.deadline(collection)
+        started = time.monotonic()
+        try:
+            async with async_timeout.timeout(deadline):
+                devices = await self._async_fetch(collection)
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Fetching %s took longer than %.1fs", collection, deadline)
+            self.deadlines.record_timeout(collection)
+            return None
+        self.deadlines.record(collection, time.monotonic() - started)
+        return devices
+
+    def device(self, collection: str, idx: Any) -> Any:
+        """Return a device of the last refresh, None if it is gone."""
+        devices = (self.data or {}).get(collection, [])
+        cached = self._devices.get(collection)
+        if cached is None or cached[0] is not devices:
+            cached = (devices, {device.idx: device for device in devices})
+            self._devices[collection] = cached
+        return cached[1].get(idx)
+
+    def _gateway_session(self) -> aiohttp.ClientSession:
+        """Return a session of its own for a gateway.
+
+        It shares the connection pool of Home Assistant, which closes it with
+        the entry. The gateway client passes its own SSL context.
+        """
+        return async_create_clientsession(
+            self.hass,
+            trace_configs=[payload_trace_config()],
+        )
+
+    async def async_close(self) -> None:
+        """Stop replaying the command journal, what is left stays queued."""
+        if self.journal is not None:
+            await self.journal.async_close()
+
+    async def async_refresh_collections(self, *collections: str) -> None:
+        """Refresh only some collections and notify the entities.
+
+        Used after commands that only affect a few collections, the regular
+        refresh interval is not reset.
+        """
+        if not self.breaker.allows_request:
+            return
+        caller = CALLER.set(CALLER_REFRESH)
+        try:
+            fetched = {
+                collection: devices
+                for collection in collections
+                if (devices := await self._async_fetch_in_time(collection)) is not None
             }
-        # Store data in a way Home Assistant can easily consume it
-        return {
-            "outputs": my_outputs,
-            "lights": my_lights,
-            "groupactions": my_groupactions,
-            "shutters": my_shutters,
-            "sensors": my_sensors,
-            "energysensors": my_energysensors,
-            "thermostatgroups": my_thermostatgroups,
-            "thermostatunits": my_thermostatunits,
-        }
+        except OpenMoticsError as err:
+            _LOGGER.warning("Could not refresh %s: %s", ", ".join(collections), err)
+            return
+        finally:
+            CALLER.reset(caller)
+
+        for collection, devices in fetched.items():
+            await self._async_update_caches(collection, devices)
+        self.data = {**self.data, **fetched}
+        self.async_update_listeners()
+
+    async def async_turn_on_for(
+        self,
+        collection: str,
+        idx: Any,
+        duration: timedelta,
+        value: int | None = None,
+    ) -> Any:
+        """Turn on an output, the gateway turns it off again after a duration.
+
+        Sent like the other commands, over the gateway of hybrid entries and
+        through the command journal.
+        """
+        if not self._timer_supported(collection):
+            raise TimerNotSupported(
+                "The OpenMotics client does not support output timers",
+            )
+        turn_on = functools.partial(
+            getattr(self.omclient, collection).turn_on,
+            timer=round(duration.total_seconds()),
+        )
+        if value is None:
+            return await self.batcher.async_call(turn_on, idx)
+        return await self.batcher.async_call(turn_on, idx, value)
+
+    def _timer_supported(self, collection: str) -> bool:
+        """Return True if all clients a command can go to accept a timer."""
+        for client in self._clients:
+            turn_on = getattr(getattr(client, collection, None), "turn_on", None)
+            if turn_on is None or "timer" not in inspect.signature(turn_on).parameters:
+                return False
+        return True
+
+    async def async_save_group_action(
+        self,
+        group_action_id: int,
+        name: str,
+        actions: Iterable[BasicAction],
+    ) -> None:
+        """Configure a group action on the gateway."""
+        raise OffloadNotSupported("Group actions can only be configured locally")
+
+    async def async_link_input(
+        self,
+        input_id: int,
+        group_action_id: int | None,
+    ) -> None:
+        """Let an input execute a group action, or nothing if it is None."""
+        raise OffloadNotSupported("Inputs can only be configured locally")
+
+    def async_start_events(self) -> None:
+        """Listen to the input events pushed by the gateway, if it has them."""
+        if self.events is not None or (url := self._event_url()) is None:
+            return
+        self.inputs = InputEventHandler(
+            self.hass,
+            self.config_entry.entry_id,
+            self._install_id,
+        )
+        self.events = OpenMoticsEventStream(
+            self.hass,
+            async_get_clientsession(self.hass),
+            url,
+            self.inputs,
+            headers=self._async_event_headers,
+            subscription=self._event_subscription(),
+            ssl_context=self._ssl_context,
+        )
+        self.events.async_start()
+
+    async def async_stop_events(self) -> None:
+        """Stop listening to the events."""
+        if self.events is not None:
+            await self.events.async_stop()
+            self.events = None
+        if self.inputs is not None:
+            self.inputs.async_cancel()
+            self.inputs = None
+
+    def _event_url(self) -> str | None:
+        """Return the url of the event stream, None without events."""
+        return None
+
+    async def _async_event_headers(self) -> dict[str, str]:
+        """Return the headers to authenticate on the event stream."""
+        return {}
+
+    def _event_subscription(self) -> dict[str, Any] | None:
+        """Return the message that subscribes to the input events."""
+        return None
 
     @property
     def omclient(self) -> Any:
         """Return the backendclient."""
+        if self.journal is not None:
+            return JournalClient(self.journal, self._command_client)
+        return self._command_client
+
+    @property
+    def _command_client(self) -> Any:
+        """Return the client the commands are sent with."""
         return self._omclient
 
+    @property
+    def _clients(self) -> tuple[Any, ...]:
+        """Return the clients the commands can end up at."""
+        return (self._omclient,)
+
     @property
     def install_id(self) -> Any:
         """Return the backendclient."""
@@ -102,24 +625,151 @@ class OpenMoticsDataUpdateCoordinator(DataUpdateCoordinator):
 class OpenMoticsCloudDataUpdateCoordinator(OpenMoticsDataUpdateCoordinator):
     """Query OpenMotics devices and keep track of seen conditions."""
 
-    def __init__(self, hass: HomeAssistant, session: OAuth2Session, name: str) -> None:
+    def __init__(self, hass: HomeAssistant, hub: OpenMoticsCloudHub, name: str) -> None:
         """Initialize the OpenMotics gateway."""
         super().__init__(
             hass=hass,
             name=name,
         )
-        self.session = session
+        # The installations of an account share its token, connections,
+        # request budget and refresh turns.
+        self.hub = hub
+        self.scheduler = hub.scheduler
         self._install_id = self.config_entry.data.get(CONF_INSTALLATION_ID)
 
-        async def async_token_refresh() -> Any:
-            await session.async_ensure_token_valid()
-            return session.token["access_token"]
+        self._omclient = InstrumentedClient(
+            self.metrics,
+            OpenMoticsCloud(
+                token=hub.token.get("access_token"),
+                session=hub.http_session,
+                token_refresh_method=hub.async_access_token,
+            ),
+            recorder=self.recorder,
+        )
+
+    async def async_close(self) -> None:
+        """Close the hub after its last installation."""
+        await super().async_close()
+        await self.hub.async_remove_entry(self.config_entry.entry_id)
+
+    async def _async_probe(self) -> None:
+        """Send a cheap request, raise if it fails."""
+        await self._omclient.installations.get_all()
+
+    def _event_url(self) -> str | None:
+        """Return the url of the event stream."""
+        return f"wss://{CLOUD_BASE_URL}{CLOUD_API_VERSION}/ws/events"
+
+    async def _async_event_headers(self) -> dict[str, str]:
+        """Return the headers to authenticate on the event stream."""
+        return {"Authorization": f"Bearer {await self.hub.async_access_token()}"}
+
+    def _event_subscription(self) -> dict[str, Any] | None:
+        """Return the message that subscribes to the input events."""
+        return {
+            "type": "ACTION",
+            "data": {
+                "action": "set_subscription",
+                "types": [EVENT_TYPE_INPUT_CHANGE],
+                "installation_ids": [self._install_id],
+            },
+        }
 
-        self._omclient = OpenMoticsCloud(
-            token=session.token["access_token"],
-            session=async_get_clientsession(hass),
-            token_refresh_method=async_token_refresh,
+
+class OpenMoticsHybridDataUpdateCoordinator(OpenMoticsCloudDataUpdateCoordinator):
+    """Cloud installation whose gateway is also reached over the LAN."""
+
+    def __init__(self, hass: HomeAssistant, hub: OpenMoticsCloudHub, name: str) -> None:
+        """Initialize the OpenMotics installation and its gateway."""
+        super().__init__(hass, hub=hub, name=name)
+        options = self.config_entry.options
+        self._local_client = InstrumentedClient(
+            self.metrics,
+            LocalGateway(
+                localgw=options[CONF_LOCAL_IP_ADDRESS],
+                username=options.get(CONF_LOCAL_USERNAME),
+                password=options.get(CONF_LOCAL_PASSWORD),
+                port=options.get(CONF_LOCAL_PORT),
+                ssl_context=get_ssl_context(options.get(CONF_LOCAL_VERIFY_SSL)),
+                session=self._gateway_session(),
+            ),
+            ("local",),
+            recorder=self.recorder,
         )
+        self._local_ids: dict[str, tuple[list[Any], dict[Any, Any]]] = {}
+        self.transport = HybridTransport(
+            self._omclient,
+            self._local_client,
+            self._gateway_ids,
+            COLLECTIONS,
+        )
+
+    @property
+    def _command_client(self) -> Any:
+        """Return the client routing the requests over the gateway or the cloud."""
+        return HybridClient(self.transport)
+
+    @property
+    def _clients(self) -> tuple[Any, ...]:
+        """Return the cloud client and the client of the gateway."""
+        return (self._omclient, self._local_client)
+
+    def _gateway_ids(self, collection: str) -> dict[Any, Any]:
+        """Return the gateway ids of the devices of a collection by cloud id."""
+        devices = (self.data or {}).get(collection, [])
+        cached = self._local_ids.get(collection)
+        if cached is None or cached[0] is not devices:
+            cached = (devices, {device.idx: device.local_id for device in devices})
+            self._local_ids[collection] = cached
+        return cached[1]
+
+    async def _async_poll(self) -> dict[Any, Any]:
+        """Poll the status from the gateway, the rest from the cloud.
+
+        The configuration (and the status, when the gateway can't be
+        reached) is fetched from the cloud.
+        """
+        if (
+            self.data is None
+            or self.catalogue_due
+            or not await self.transport.async_probe_local()
+        ):
+            return await super()._async_poll()
+
+        data = dict(self.data)
+        collections = self.active_collections
+        quiet = self._quiet
+        changed = False
+        answered = False
+        try:
+            for collection in collections:
+                devices = await self.transport.async_local_status(collection)
+                if devices is not None:
+                    # Only the status comes from the gateway
+                    changed |= await self._async_update_status(collection, devices)
+                    answered = True
+                    continue
+                if (fetched := await self._async_fetch_in_time(collection)) is None:
+                    changed = True
+                    continue
+                answered = True
+                data[collection] = fetched
+                changed |= await self._async_update_caches(
+                    collection,
+                    data[collection],
+                )
+        except FAILOVER_ERRORS:
+            return await super()._async_poll()
+        except OpenMoticsError as err:
+            self._record_failure(err)
+            raise UpdateFailed(
+                f"Could not retrieve the OpenMotics data: {err}",
+            ) from err
+        if collections and not answered:
+            self._fail_all_overran(collections)
+        self._record_success()
+        self._skip_unchanged(quiet and not changed)
+        return data
 
 
 class OpenMoticsLocalDataUpdateCoordinator(OpenMoticsDataUpdateCoordinator):
@@ -133,12 +783,83 @@ class OpenMoticsLocalDataUpdateCoordinator(OpenMoticsDataUpdateCoordinator):
         )
         self._install_id = self.config_entry.data.get(CONF_IP_ADDRESS)
         ssl_context = get_ssl_context(self.config_entry.data.get(CONF_VERIFY_SSL))
+        self._ssl_context = ssl_context
 
         """Set up a OpenMotics controller"""
-        self._omclient = LocalGateway(
-            localgw=self.config_entry.data.get(CONF_IP_ADDRESS),
-            username=self.config_entry.data.get(CONF_NAME),
-            password=self.config_entry.data.get(CONF_PASSWORD),
-            port=self.config_entry.data.get(CONF_PORT),
-            ssl_context=ssl_context,
+        self._omclient = InstrumentedClient(
+            self.metrics,
+            LocalGateway(
+                localgw=self.config_entry.data.get(CONF_IP_ADDRESS),
+                username=self.config_entry.data.get(CONF_NAME),
+                password=self.config_entry.data.get(CONF_PASSWORD),
+                port=self.config_entry.data.get(CONF_PORT),
+                ssl_context=ssl_context,
+                session=self._gateway_session(),
+            ),
+            recorder=self.recorder,
         )
+
+    async def _async_probe(self) -> None:
+        """Send a cheap request, raise if it fails."""
+        await self._omclient.exec_action("get_version")
+
+    def _event_url(self) -> str | None:
+        """Return the url of the event stream."""
+        data = self.config_entry.data
+        host = data.get(CONF_IP_ADDRESS)
+        if (port := data.get(CONF_PORT)) is not None:
+            host = f"{host}:{port}"
+        return f"wss://{host}/ws_events"
+
+    async def _async_event_headers(self) -> dict[str, str]:
+        """Return the headers to authenticate on the event stream."""
+        token = getattr(self._omclient, "token", None)
+        if not isinstance(token, str):
+            token = await self._omclient.get_token()
+        # The gateway expects the token in the websocket protocol header
+        encoded = base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+        return {"Sec-WebSocket-Protocol": f"authorization.bearer.{encoded}"}
+
+    async def _async_configure(self, action: str, config: dict[str, Any]) -> None:
+        """Save a configuration through the gateway API."""
+        try:
+            await self._omclient.exec_action(action, {"config": json.dumps(config)})
+        except TypeError as err:
+            raise OffloadNotSupported(
+                "The OpenMotics client can't configure the gateway",
+            ) from err
+
+    async def async_save_group_action(
+        self,
+        group_action_id: int,
+        name: str,
+        actions: Iterable[BasicAction],
+    ) -> None:
+        """Configure a group action on the gateway."""
+        await self._async_configure(
+            "set_group_action_configuration",
+            {
+                "id": group_action_id,
+                "name": name,
+                # Pairs of the action type and the device it acts on
+                "actions": ",".join(
+                    f"{action.action_type},{action.number}" for action in actions
+                ),
+            },
+        )
+
+    async def async_link_input(
+        self,
+        input_id: int,
+        group_action_id: int | None,
+    ) -> None:
+        """Let an input execute a group action, or nothing if it is None."""
+        if group_action_id is None:
+            config = {"id": input_id, "action": INPUT_NO_ACTION, "basic_actions": ""}
+        else:
+            config = {
+                "id": input_id,
+                "action": INPUT_BASIC_ACTIONS,
+                "basic_actions": f"{ACTION_EXECUTE_GROUP_ACTION},{group_action_id}",
+            }
+        await self._async_configure("set_input_configuration", config)
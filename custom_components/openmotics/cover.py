@@ -2,8 +2,11 @@
 from __future__ import annotations
 
 import logging
+import time
+from datetime import timedelta
 from typing import TYPE_CHECKING, Any
 
+import voluptuous as vol
 from homeassistant.components.cover import (
     ATTR_POSITION,
     CoverEntity,
@@ -17,13 +20,35 @@ from homeassistant.const import (
     STATE_PAUSED,
     STATE_UNKNOWN,
 )
-
-from .const import DOMAIN, NOT_IN_USE
-from .entity import OpenMoticsDevice
+from homeassistant.core import callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_platform
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.restore_state import RestoredExtraData, RestoreEntity
+
+from .const import (
+    ATTR_ACTION,
+    ATTR_TRAVEL_TIME_DOWN,
+    ATTR_TRAVEL_TIME_UP,
+    DOMAIN,
+    SERVICE_MOVE_SHUTTERS,
+    SERVICE_SET_TRAVEL_TIME,
+    SHUTTER_ACTIONS,
+)
+from .entity import OpenMoticsDevice, async_setup_discovery
+from .travel import (
+    CLOSING,
+    MAX_TRAVEL_TIME,
+    MIN_TRAVEL_TIME,
+    OPENING,
+    ShutterTravelModel,
+)
 
 if TYPE_CHECKING:
+    from datetime import datetime
+
     from homeassistant.config_entries import ConfigEntry
-    from homeassistant.core import HomeAssistant
+    from homeassistant.core import CALLBACK_TYPE, HomeAssistant
     from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
     from .coordinator import OpenMoticsDataUpdateCoordinator
@@ -39,6 +64,19 @@ VALUE_TO_STATE = {
 }
 STATE_TO_VALUE = {v: k for k, v in VALUE_TO_STATE.items()}
 
+# How often the estimated position is written while a shutter moves
+POSITION_UPDATE_INTERVAL = timedelta(seconds=1)
+# A poll shortly after a command may still report the previous state
+COMMAND_GRACE_PERIOD = 5.0
+
+TRAVEL_TIME = vol.All(
+    vol.Coerce(float),
+    vol.Range(min=MIN_TRAVEL_TIME, max=MAX_TRAVEL_TIME),
+)
+
+# Commands are batched by the coordinator, don't limit them per entity
+PARALLEL_UPDATES = 0
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -48,27 +86,54 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up covers for OpenMotics Controller."""
-    entities = []
-
     coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    for index, om_cover in enumerate(coordinator.data["shutters"]):
-        if om_cover.name is None or not om_cover.name or om_cover.name == NOT_IN_USE:
-            continue
-        entities.append(OpenMoticsShutter(coordinator, index, om_cover))
-
-    if not entities:
-        _LOGGER.info("No OpenMotics shutters added")
-        return
-
-    async_add_entities(entities)
-
-
-class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
+    def create_shutters(index: int, om_cover: Any) -> list[CoverEntity]:
+        return [OpenMoticsShutter(coordinator, index, om_cover)]
+
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "shutters",
+        create_shutters,
+    )
+
+    platform = entity_platform.async_get_current_platform()
+    platform.async_register_entity_service(
+        SERVICE_SET_TRAVEL_TIME,
+        {
+            vol.Optional(ATTR_TRAVEL_TIME_UP): TRAVEL_TIME,
+            vol.Optional(ATTR_TRAVEL_TIME_DOWN): TRAVEL_TIME,
+        },
+        "async_set_travel_time",
+    )
+    platform.async_register_entity_service(
+        SERVICE_MOVE_SHUTTERS,
+        vol.All(
+            cv.make_entity_service_schema(
+                {
+                    vol.Optional(ATTR_ACTION): vol.In(SHUTTER_ACTIONS),
+                    vol.Optional(ATTR_POSITION): vol.All(
+                        vol.Coerce(int),
+                        vol.Range(min=0, max=100),
+                    ),
+                },
+            ),
+            cv.has_at_least_one_key(ATTR_ACTION, ATTR_POSITION),
+        ),
+        "async_move",
+    )
+
+
+class OpenMoticsShutter(OpenMoticsDevice, CoverEntity, RestoreEntity):
     """Representation of a OpenMotics shutter."""
 
     coordinator: OpenMoticsDataUpdateCoordinator
 
+    _collection = "shutters"
+
     def __init__(
         self,
         coordinator: OpenMoticsDataUpdateCoordinator,
@@ -78,9 +143,13 @@ class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
         """Initialize the shutter."""
         super().__init__(coordinator, index, device, "cover")
 
-        self._device = self.coordinator.data["shutters"][self.index]
         self._state = None
 
+        self._travel = ShutterTravelModel()
+        self._last_position: int | None = None
+        self._commanded = 0.0
+        self._unsub_travel: CALLBACK_TYPE | None = None
+
         self._supported_features = CoverEntityFeature.OPEN
         self._supported_features |= CoverEntityFeature.CLOSE
         self._supported_features |= CoverEntityFeature.STOP
@@ -88,6 +157,27 @@ class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
         if "POSITION" in device.capabilities:
             self._supported_features |= CoverEntityFeature.SET_POSITION
 
+    async def async_added_to_hass(self) -> None:
+        """Restore the travel times when added to hass."""
+        await super().async_added_to_hass()
+        if (extra_data := await self.async_get_last_extra_data()) is not None:
+            self._travel = ShutterTravelModel.from_dict(extra_data.as_dict())
+        self._last_position = self._resting_position()
+        self.async_on_remove(self._async_stop_travel_updates)
+
+    @property
+    def extra_restore_state_data(self) -> RestoredExtraData:
+        """Return the travel times to be restored after a restart."""
+        return RestoredExtraData(self._travel.as_dict())
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the (learned) travel times."""
+        return {
+            ATTR_TRAVEL_TIME_UP: self._travel.travel_up,
+            ATTR_TRAVEL_TIME_DOWN: self._travel.travel_down,
+        }
+
     @property
     def supported_features(self) -> CoverEntityFeature:
         """Flag supported features."""
@@ -97,8 +187,7 @@ class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
     def is_opening(self) -> bool:
         """Return if the cover is opening or not."""
         try:
-            self._device = self.coordinator.data["shutters"][self.index]
-            self._state = self._device.status.state.upper()
+            self._state = self.status.state.upper()
             return VALUE_TO_STATE.get(self._state) == STATE_OPENING
         except (AttributeError, KeyError):
             return STATE_UNKNOWN
@@ -107,8 +196,7 @@ class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
     def is_closing(self) -> bool:
         """Return if the cover is closing or not."""
         try:
-            self._device = self.coordinator.data["shutters"][self.index]
-            self._state = self._device.status.state.upper()
+            self._state = self.status.state.upper()
             return VALUE_TO_STATE.get(self._state) == STATE_CLOSING
         except (AttributeError, KeyError):
             return STATE_UNKNOWN
@@ -125,12 +213,13 @@ class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
         """Return the current position of cover."""
         # for HA None is unknown, 0 is closed, 100 is fully open.
         # for OM 0 is open and 100 is closed
+        if (estimate := self._travel.position(time.monotonic())) is not None:
+            return estimate
         try:
-            self._device = self.coordinator.data["shutters"][self.index]
             if self._supported_features & CoverEntityFeature.SET_POSITION:
-                if self._device.status.position is None:
+                if self.status.position is None:
                     return None
-                return 100 - self._device.status.position
+                return 100 - self.status.position
 
             if VALUE_TO_STATE.get(self._state) == STATE_CLOSED:
                 return 0
@@ -138,31 +227,143 @@ class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
                 return 100
             if VALUE_TO_STATE.get(self._state) == STATE_PAUSED:
                 # status":{"state":"STOPPED","position":100,"locked":false,"last_change":1682703027.962422}
-                if self._device.status.position is None:
+                if self.status.position is None:
                     return None
-                return 100 - self._device.status.position
+                return 100 - self.status.position
 
             return STATE_UNKNOWN
         except (AttributeError, KeyError):
             return STATE_UNKNOWN
 
+    async def async_set_travel_time(
+        self,
+        travel_time_up: float | None = None,
+        travel_time_down: float | None = None,
+    ) -> None:
+        """Configure the travel times, without times they are learned again."""
+        self._travel.configure(travel_time_up, travel_time_down)
+        self.async_write_ha_state()
+
+    def _resting_position(self, state: str | None = None) -> int | None:
+        """Return the position reported by the gateway for a resting shutter."""
+        if state is None:
+            state = VALUE_TO_STATE.get((self.status.state or "").upper())
+        if state == STATE_OPEN:
+            return 100
+        if state == STATE_CLOSED:
+            return 0
+        if self.status.position is None:
+            return None
+        return 100 - self.status.position
+
+    @callback
+    def _async_start_travel(
+        self,
+        direction: int,
+        *,
+        started: float | None = None,
+        started_at: float | None = None,
+        target: int | None = None,
+    ) -> None:
+        """Start estimating the position of a moving shutter."""
+        now = time.monotonic()
+        position = self._travel.position(now)
+        if position is None:
+            position = self._last_position
+        self._travel.start(
+            direction,
+            position,
+            now if started is None else started,
+            started_at=time.time() if started_at is None else started_at,
+            target=target,
+        )
+        if self._unsub_travel is None:
+            self._unsub_travel = async_track_time_interval(
+                self.hass,
+                self._async_travel_tick,
+                POSITION_UPDATE_INTERVAL,
+            )
+
+    @callback
+    def _async_travel_tick(self, _now: datetime) -> None:
+        """Write the estimated position, stop once the shutter should be there."""
+        position = self._travel.position(time.monotonic())
+        if position is None or position in (0, 100, self._travel.target):
+            self._async_stop_travel_updates()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_stop_travel_updates(self) -> None:
+        """Stop writing estimated positions."""
+        if self._unsub_travel is not None:
+            self._unsub_travel()
+            self._unsub_travel = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Reconcile the travel model with the state reported by the gateway."""
+        state = VALUE_TO_STATE.get((self.status.state or "").upper())
+        last_change = self.status.last_change
+
+        if state in (STATE_OPENING, STATE_CLOSING):
+            direction = OPENING if state == STATE_OPENING else CLOSING
+            if self._travel.direction != direction:
+                # Started outside Home Assistant (wall switch, group action).
+                started = None
+                if last_change is not None:
+                    elapsed = min(max(time.time() - last_change, 0), MAX_TRAVEL_TIME)
+                    started = time.monotonic() - elapsed
+                self._async_start_travel(
+                    direction,
+                    started=started,
+                    started_at=last_change,
+                )
+            elif last_change is not None:
+                self._travel.anchor(last_change)
+        elif time.monotonic() - self._commanded > COMMAND_GRACE_PERIOD:
+            position = self._resting_position(state)
+            if self._travel.moving:
+                self._travel.stop(position, last_change)
+                self._async_stop_travel_updates()
+            self._last_position = position
+
+        super()._handle_coordinator_update()
+
+    async def async_move(
+        self,
+        action: str | None = None,
+        position: int | None = None,
+    ) -> None:
+        """Move the shutter, the commands of all targeted shutters are batched."""
+        if position is not None:
+            await self.async_set_cover_position(**{ATTR_POSITION: position})
+        elif action == "open":
+            await self.async_open_cover()
+        elif action == "close":
+            await self.async_close_cover()
+        elif action == "stop":
+            await self.async_stop_cover()
+
     async def async_open_cover(self, **kwargs: Any) -> None:
         """Open the window cover."""
-        result = await self.coordinator.omclient.shutters.move_up(
+        result = await self.coordinator.batcher.async_call(
+            self.coordinator.omclient.shutters.move_up,
             self.device_id,
         )
         await self._update_state_from_result(result, state=STATE_OPENING)
 
     async def async_close_cover(self, **kwargs: Any) -> None:
         """Open the window cover."""
-        result = await self.coordinator.omclient.shutters.move_down(
+        result = await self.coordinator.batcher.async_call(
+            self.coordinator.omclient.shutters.move_down,
             self.device_id,
         )
         await self._update_state_from_result(result, state=STATE_CLOSING)
 
     async def async_stop_cover(self, **kwargs: Any) -> None:
         """Stop the window cover."""
-        result = await self.coordinator.omclient.shutters.stop(
+        result = await self.coordinator.batcher.async_call(
+            self.coordinator.omclient.shutters.stop,
             self.device_id,
         )
         await self._update_state_from_result(result, state=STATE_PAUSED)
@@ -172,7 +373,8 @@ class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
         if not self._supported_features & CoverEntityFeature.SET_POSITION:
             return
         position = 100 - kwargs[ATTR_POSITION]
-        result = await self.coordinator.omclient.shutters.change_position(
+        result = await self.coordinator.batcher.async_call(
+            self.coordinator.omclient.shutters.change_position,
             self.device_id,
             position,
         )
@@ -186,12 +388,71 @@ class OpenMoticsShutter(OpenMoticsDevice, CoverEntity):
         position: int | None = None,
     ) -> None:
         if isinstance(result, dict) and result.get("_error") is None:
+            self._async_trace_sent()
+            confirming = self._confirming_states(state=state, position=position)
+            self._commanded = time.monotonic()
+            self._update_travel(state=state, position=position)
             if state is not None:
                 self._state = STATE_TO_VALUE.get(state)
-                self._device.status.state = self._state
+                self.status.state = self._state
             if position is not None:
-                self._device.status.position = position
+                self.status.position = position
+            self._async_trace_acknowledged(result, confirming)
             self.async_write_ha_state()
         else:
             _LOGGER.debug("Invalid result, refreshing all")
             await self.coordinator.async_refresh()
+
+    @callback
+    def _confirming_states(
+        self,
+        *,
+        state: str | None = None,
+        position: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return the states a poll may report to confirm a command.
+
+        Besides the state the command shows, a shutter that moves the
+        right way, or already arrived, executed it.
+        """
+        if state == STATE_OPENING:
+            return [{"state": STATE_TO_VALUE[STATE_OPEN]}]
+        if state == STATE_CLOSING:
+            return [{"state": STATE_TO_VALUE[STATE_CLOSED]}]
+        if state == STATE_PAUSED:
+            # Wherever it stopped
+            return [{"state": STATE_TO_VALUE[STATE_PAUSED]}]
+        if position is None:
+            return []
+        opening = {"state": STATE_TO_VALUE[STATE_OPENING]}
+        closing = {"state": STATE_TO_VALUE[STATE_CLOSING]}
+        if not isinstance(current := self.current_cover_position, int):
+            return [opening, closing]
+        if 100 - position == current:
+            return []
+        return [opening if 100 - position > current else closing]
+
+    def _update_travel(
+        self,
+        *,
+        state: str | None = None,
+        position: int | None = None,
+    ) -> None:
+        """Update the travel model after a successful command."""
+        if state in (STATE_OPENING, STATE_CLOSING):
+            self._async_start_travel(OPENING if state == STATE_OPENING else CLOSING)
+        elif state == STATE_PAUSED:
+            if (estimate := self._travel.position(time.monotonic())) is not None:
+                # Show the estimate until the gateway reports the real position
+                self.status.position = 100 - estimate
+                self._last_position = estimate
+            self._travel.stop()
+            self._async_stop_travel_updates()
+        elif position is not None:
+            target = 100 - position
+            current = self.current_cover_position
+            if isinstance(current, int) and current != target:
+                self._async_start_travel(
+                    OPENING if target > current else CLOSING,
+                    target=target,
+                )
@@ -0,0 +1,93 @@
+"""Deadlines of the fetches of the collections, adapted to their latency.
+
+A collection that takes much longer than it usually does is given up on, so
+a single hanging endpoint doesn't hold up the refresh of all the others.
+The deadline of a collection is a multiple of the 99th percentile of its
+recent fetch times, between a floor and a ceiling.
+"""
+from __future__ import annotations
+
+import math
+from collections import Counter, deque
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# Deadline as a multiple of the 99th percentile of the fetch times
+DEADLINE_FACTOR = 3.0
+# Seconds a fetch gets at least, and at most
+DEADLINE_FLOOR = 2.0
+DEADLINE_CEILING = 20.0
+# Fetch times kept per collection, and needed before the deadline adapts
+DEADLINE_SAMPLES = 50
+MIN_SAMPLES = 5
+
+
+def percentile(samples: Iterable[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of samples."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class CollectionDeadlines:
+    """Observed fetch times, deadlines and timeouts per collection."""
+
+    def __init__(
+        self,
+        *,
+        factor: float = DEADLINE_FACTOR,
+        floor: float = DEADLINE_FLOOR,
+        ceiling: float = DEADLINE_CEILING,
+    ) -> None:
+        """Initialize the deadlines."""
+        self._factor = factor
+        self._floor = floor
+        self._ceiling = ceiling
+        self._samples: dict[str, deque[float]] = {}
+        self.timeouts: Counter[str] = Counter()
+        # Collections whose last fetch overran its deadline
+        self.failing: set[str] = set()
+
+    def deadline(self, collection: str) -> float:
+        """Return the seconds the next fetch of a collection may take."""
+        samples = self._samples.get(collection)
+        if samples is None or len(samples) < MIN_SAMPLES:
+            return self._ceiling
+        return min(
+            self._ceiling,
+            max(self._floor, percentile(samples, 0.99) * self._factor),
+        )
+
+    def record(self, collection: str, elapsed: float) -> None:
+        """Record a fetch that completed in time."""
+        if (samples := self._samples.get(collection)) is None:
+            samples = self._samples[collection] = deque(maxlen=DEADLINE_SAMPLES)
+        samples.append(elapsed)
+        self.failing.discard(collection)
+
+    def record_timeout(self, collection: str) -> None:
+        """Record a fetch that overran its deadline."""
+        self.timeouts[collection] += 1
+        self.failing.add(collection)
+
+    def any_failing(self, collections: Iterable[str]) -> bool:
+        """Return True if the last fetch of any of the collections overran."""
+        return not self.failing.isdisjoint(collections)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the deadlines and timeouts for the diagnostics."""
+        return {
+            collection: {
+                "deadline": round(self.deadline(collection), 3),
+                "p99_ms": round(percentile(samples, 0.99) * 1000),
+                "samples": len(samples),
+                "timeouts": self.timeouts[collection],
+                "failing": collection in self.failing,
+            }
+            for collection, samples in self._samples.items()
+        } | {
+            collection: {"timeouts": timeouts, "failing": collection in self.failing}
+            for collection, timeouts in self.timeouts.items()
+            if collection not in self._samples
+        }
@@ -1,27 +0,0 @@
-"""Diagnostics support for OpenMotics."""
-from __future__ import annotations
-
-from typing import TYPE_CHECKING
-
-from .const import DOMAIN
-
-if TYPE_CHECKING:
-    from homeassistant.config_entries import ConfigEntry
-    from homeassistant.core import HomeAssistant
-
-    from .coordinator import OpenMoticsDataUpdateCoordinator
-
-
-async def async_get_config_entry_diagnostics(
-    hass: HomeAssistant,
-    entry: ConfigEntry,
-) -> dict:
-    """Return diagnostics for a config entry."""
-    coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
-
-    diagnostics_data = {
-        "info": dict(entry.data),
-        "data": coordinator.data,
-    }
-
-    return diagnostics_data
@@ -0,0 +1,69 @@
+"""Diagnostics support for OpenMotics."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import (
+    CONF_CLIENT_ID,
+    CONF_CLIENT_SECRET,
+    CONF_NAME,
+    CONF_PASSWORD,
+)
+
+from .const import CONF_LOCAL_PASSWORD, CONF_LOCAL_USERNAME, DOMAIN
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+    from .coordinator import OpenMoticsDataUpdateCoordinator
+
+# Credentials in the data and options of the entries, the name is the
+# username of a local gateway
+TO_REDACT = {
+    CONF_CLIENT_ID,
+    CONF_CLIENT_SECRET,
+    CONF_LOCAL_PASSWORD,
+    CONF_LOCAL_USERNAME,
+    CONF_NAME,
+    CONF_PASSWORD,
+    "token",
+}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+) -> dict:
+    """Return diagnostics for a config entry."""
+    coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    diagnostics_data = {
+        "info": async_redact_data(entry.data, TO_REDACT),
+        "options": async_redact_data(entry.options, TO_REDACT),
+        "data": coordinator.data,
+        # The status of the devices is kept in the store
+        "status": coordinator.store.as_dict(),
+        "setup": {
+            "platforms": sorted(coordinator.platforms),
+            "seconds": coordinator.setup_times,
+        },
+        "unchanged_refreshes": coordinator.unchanged_refreshes,
+        "event_loop": coordinator.slicer.as_dict(),
+        "health": coordinator.health.as_dict(),
+        "scheduler": coordinator.scheduler.as_dict(),
+        "deadlines": coordinator.deadlines.as_dict(),
+        "breaker": coordinator.breaker.as_dict(),
+        "metrics": coordinator.metrics.as_dict(),
+        "requests": coordinator.recorder.as_dict(),
+        "commands": coordinator.tracer.as_dict(),
+    }
+    if coordinator.journal is not None:
+        diagnostics_data["journal"] = coordinator.journal.as_dict()
+    if (hub := getattr(coordinator, "hub", None)) is not None:
+        diagnostics_data["account"] = hub.as_dict()
+    if (transport := getattr(coordinator, "transport", None)) is not None:
+        diagnostics_data["transport"] = transport.as_dict()
+
+    return diagnostics_data
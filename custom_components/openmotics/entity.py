@@ -1,15 +1,129 @@
 """Generic OpenMoticDevice Entity."""
 from __future__ import annotations
 
+import logging
+import time
+from datetime import timedelta
 from typing import TYPE_CHECKING, Any
 
+import voluptuous as vol
+from homeassistant.core import callback
+from homeassistant.helpers import area_registry as ar
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_platform
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN
+from .const import (
+    ATTR_REMAINING_TIME,
+    ATTR_TIMER_ENDS,
+    DOMAIN,
+    MAX_OUTPUT_TIMER,
+    MODULE_CHANNELS,
+    NOT_IN_USE,
+    TOPOLOGY_MODULE,
+    TOPOLOGY_ROOM,
+)
+from .location import signal_locations
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+    from datetime import datetime
+
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import CALLBACK_TYPE, Context, HomeAssistant
+    from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
     from .coordinator import OpenMoticsDataUpdateCoordinator
+    from .tracing import CommandTrace
+
+_LOGGER = logging.getLogger(__name__)
+
+# Duration of the output timer of the gateway
+TIMER_DURATION = vol.All(
+    cv.time_period,
+    cv.positive_timedelta,
+    vol.Range(max=timedelta(seconds=MAX_OUTPUT_TIMER)),
+)
+
+
+def is_in_use(device: Any) -> bool:
+    """Return True if a device is configured on the gateway."""
+    return bool(device.name) and device.name != NOT_IN_USE
+
+
+@callback
+def async_setup_discovery(  # pylint: disable=too-many-arguments
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    coordinator: OpenMoticsDataUpdateCoordinator,
+    async_add_entities: AddEntitiesCallback,
+    collection: str,
+    create_entities: Callable[[int, Any], list[OpenMoticsDevice]],
+    *,
+    in_use: Callable[[Any], bool] = is_in_use,
+) -> None:
+    """Keep the entities of a collection in sync with the gateway.
+
+    After every refresh, entities are added for new devices and removed
+    (with their registry entries) for devices that disappeared or are no
+    longer in use, without reloading the config entry.
+    """
+    platform_domain = entity_platform.async_get_current_platform().domain
+    known: dict[Any, list[OpenMoticsDevice]] = {}
+
+    @callback
+    def _async_discover() -> None:
+        new_entities: list[OpenMoticsDevice] = []
+        seen = set()
+        for index, device in enumerate(coordinator.data.get(collection, [])):
+            if not in_use(device):
+                continue
+            seen.add(device.idx)
+            if device.idx not in known and (entities := create_entities(index, device)):
+                known[device.idx] = entities
+                new_entities.extend(entities)
+
+        for idx in set(known) - seen:
+            _LOGGER.debug("Removing %s %s, it is no longer in use", collection, idx)
+            _async_remove_entities(hass, platform_domain, known.pop(idx))
+
+        if new_entities:
+            async_add_entities(new_entities)
+
+    _async_discover()
+    entry.async_on_unload(coordinator.async_add_listener(_async_discover))
+
+
+@callback
+def _async_remove_entities(
+    hass: HomeAssistant,
+    platform_domain: str,
+    entities: list[OpenMoticsDevice],
+) -> None:
+    """Remove entities and their registry entries."""
+    entity_registry = er.async_get(hass)
+    device_registry = dr.async_get(hass)
+    for entity in entities:
+        # Disabled entities were never added, look them up in the registry
+        if entity_id := entity_registry.async_get_entity_id(
+            platform_domain,
+            DOMAIN,
+            entity.unique_id,
+        ):
+            entity_registry.async_remove(entity_id)
+        elif entity.hass is not None:
+            hass.async_create_task(entity.async_remove())
+
+        if device := device_registry.async_get_device(
+            identifiers={(DOMAIN, entity.unique_id)},
+        ):
+            device_registry.async_remove_device(device.id)
 
 
 class OpenMoticsDevice(CoordinatorEntity):
@@ -17,12 +131,17 @@ class OpenMoticsDevice(CoordinatorEntity):
 
     coordinator: OpenMoticsDataUpdateCoordinator
 
+    # Collection in the coordinator data (and status store) backing the entity
+    _collection: str | None = None
+
     def __init__(
         self,
         coordinator: OpenMoticsDataUpdateCoordinator,
         index: int,
         device: dict[str, Any],
         device_type: str,
+        *,
+        idx: Any = None,
     ) -> None:
         """Initialize the device."""
         super().__init__(coordinator=coordinator)
@@ -33,9 +152,16 @@ class OpenMoticsDevice(CoordinatorEntity):
         self._device = device
 
         self._local_id = device.local_id
-        self._idx = device.idx
+        self._idx = device.idx if idx is None else idx
         self._type = device_type
 
+        self._status = None
+        if self._collection is not None:
+            self._status = coordinator.store.view(self._collection, device.idx)
+        # When a service last called the entity, and the command it sent
+        self._called: float | None = None
+        self._command: CommandTrace | None = None
+
         # inherited properties
         self._attr_name = device.name
         self._attr_available = True
@@ -43,35 +169,160 @@ class OpenMoticsDevice(CoordinatorEntity):
         # that your entity is based on polling.
         self._attr_should_poll = False
 
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, self.unique_id)},
-            name=self.name,
-            model=self._type,
-            manufacturer="OpenMotics",
-        )
+        self._attr_device_info = self._topology_device_info()
+
+    def _topology_device_info(self) -> DeviceInfo:
+        """Return the device of the entity in the configured device topology.
+
+        Entities share a device per module or per room, linked to the
+        installation, or all belong to the installation itself. The module
+        is estimated from the device number, see `MODULE_CHANNELS`.
+        """
+        installation = (DOMAIN, str(self.install_id))
+        topology = self.coordinator.device_topology
+
+        if topology == TOPOLOGY_ROOM and self.room != "N/A":
+            room_name = self.coordinator.locations.room_name(self.room)
+            return DeviceInfo(
+                identifiers={(DOMAIN, f"{self.install_id}-room-{self.room}")},
+                name=room_name,
+                model="Room",
+                manufacturer="OpenMotics",
+                suggested_area=room_name,
+                via_device=installation,
+            )
+
+        channels = MODULE_CHANNELS.get(self._collection or "")
+        if topology == TOPOLOGY_MODULE and channels and self._local_id is not None:
+            module = int(self._local_id) // channels
+            return DeviceInfo(
+                identifiers={
+                    (DOMAIN, f"{self.install_id}-{self._collection}-module-{module}"),
+                },
+                name=f"{self._collection.capitalize()} module {module}",
+                model=f"{self._collection} module",
+                manufacturer="OpenMotics",
+                via_device=installation,
+            )
+
+        return DeviceInfo(identifiers={installation})
 
     @property
     def device(self) -> Any:
-        """Return the device."""
-        return self._device
+        """Return the device in the last data of the coordinator.
+
+        The one the entity was created with until its collection is fetched.
+        """
+        if self._collection is None:
+            return self._device
+        device = self.coordinator.device(self._collection, self._device.idx)
+        return self._device if device is None else device
+
+    async def async_added_to_hass(self) -> None:
+        """Make sure the collections of the entity are fetched."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_use_collections(self.polled_collections),
+        )
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                signal_locations(self.coordinator.config_entry.entry_id),
+                self._async_assign_area,
+            ),
+        )
+        self._async_assign_area()
+
+    @callback
+    def _async_assign_area(self) -> None:
+        """Put the entity in the area of its room, unless it has an area."""
+        if self.registry_entry is None or self.registry_entry.area_id is not None:
+            return
+        if (room := self.room) == "N/A":
+            return
+        if self.registry_entry.device_id is not None and (
+            device := dr.async_get(self.hass).async_get(self.registry_entry.device_id)
+        ):
+            if device.area_id is not None:
+                # The entity follows the area of its device
+                return
+        area = ar.async_get(self.hass).async_get_or_create(
+            self.coordinator.locations.room_name(room),
+        )
+        er.async_get(self.hass).async_update_entity(self.entity_id, area_id=area.id)
+
+    @callback
+    def async_set_context(self, context: Context) -> None:
+        """Remember when the service called the entity, to trace its command."""
+        super().async_set_context(context)
+        self._called = time.monotonic()
+
+    @callback
+    def _async_trace_sent(self) -> None:
+        """Start tracing the command that was sent, before showing its state."""
+        if self._collection is None:
+            return
+        self._command = self.coordinator.tracer.start(
+            self._collection,
+            self._device.idx,
+            self._called,
+        )
+        self._called = None
+
+    @callback
+    def _async_trace_acknowledged(
+        self,
+        result: Any,
+        alternatives: Iterable[dict[str, Any]] = (),
+    ) -> None:
+        """Record that the gateway acknowledged the command, now shown.
+
+        A queued command is acknowledged once the journal sends it.
+        """
+        if (command := self._command) is None:
+            return
+        self._command = None
+        self.coordinator.tracer.acknowledged(
+            command,
+            self.platform.domain,
+            queued=bool(result.get("queued")),
+            alternatives=alternatives,
+        )
+
+    @property
+    def polled_collections(self) -> tuple[str, ...]:
+        """Return the collections the entity needs on every refresh."""
+        return () if self._collection is None else (self._collection,)
+
+    @property
+    def available(self) -> bool:
+        """Return False while the last fetch of a collection of the entity overran."""
+        return super().available and not self.coordinator.deadlines.any_failing(
+            self.polled_collections,
+        )
+
+    @property
+    def status(self) -> Any:
+        """Return a view on the status of the device."""
+        return self._status
 
     @property
     def floor(self) -> Any:
         """Return the floor of the device."""
-        try:
-            location = self._device["location"]
-            return location["floor_id"]
-        except (AttributeError, KeyError):
-            return "N/A"
+        floor_id, _room_id = self.coordinator.locations.location(
+            self._collection,
+            self._device.idx,
+        )
+        return "N/A" if floor_id is None else floor_id
 
     @property
     def room(self) -> Any:
         """Return the room of the device."""
-        try:
-            location = self._device["location"]
-            return location["room_id"]
-        except (AttributeError, KeyError):
-            return "N/A"
+        _floor_id, room_id = self.coordinator.locations.location(
+            self._collection,
+            self._device.idx,
+        )
+        return "N/A" if room_id is None else room_id
 
     @property
     def index(self) -> Any:
@@ -97,3 +348,85 @@ class OpenMoticsDevice(CoordinatorEntity):
     def install_id(self) -> Any:
         """Return the installation ID."""
         return self._install_id
+
+
+class OpenMoticsOutput(OpenMoticsDevice):
+    """Base of the outputs and lights, the gateway can turn them off on a timer."""
+
+    def __init__(
+        self,
+        coordinator: OpenMoticsDataUpdateCoordinator,
+        index: int,
+        device: dict[str, Any],
+        device_type: str,
+    ) -> None:
+        """Initialize the output."""
+        super().__init__(coordinator, index, device, device_type)
+        self._timer_ends: datetime | None = None
+        self._cancel_timer: CALLBACK_TYPE | None = None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return when the gateway turns the output off."""
+        if self._timer_ends is None:
+            return None
+        return {
+            ATTR_TIMER_ENDS: self._timer_ends,
+            ATTR_REMAINING_TIME: max(
+                0,
+                round((self._timer_ends - dt_util.utcnow()).total_seconds()),
+            ),
+        }
+
+    async def _async_turn_on_for(
+        self,
+        duration: timedelta,
+        value: int | None = None,
+    ) -> Any:
+        """Turn on the output, the gateway turns it off after the duration.
+
+        The timer runs on the gateway, the local one only updates the state
+        once it expired.
+        """
+        result = await self.coordinator.async_turn_on_for(
+            self._collection,
+            self.device_id,
+            duration,
+            value,
+        )
+        self._async_cancel_timer()
+        self._timer_ends = dt_util.utcnow() + duration
+        self._cancel_timer = async_call_later(
+            self.hass,
+            duration,
+            self._async_timer_expired,
+        )
+        return result
+
+    @callback
+    def _async_timer_expired(self, _now: datetime) -> None:
+        """Show the output off, the gateway turned it off."""
+        self._cancel_timer = None
+        self._timer_ends = None
+        self.status.on = False
+        self.async_write_ha_state()
+
+    @callback
+    def _async_cancel_timer(self) -> None:
+        """Forget the timer, e.g. when the output is switched by hand."""
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+        self._timer_ends = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Forget the timer when the output was turned off elsewhere."""
+        if self._timer_ends is not None and not self.status.on:
+            self._async_cancel_timer()
+        super()._handle_coordinator_update()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel the timer."""
+        self._async_cancel_timer()
+        await super().async_will_remove_from_hass()
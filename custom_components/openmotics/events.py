@@ -0,0 +1,225 @@
+"""Event stream of the OpenMotics gateway.
+
+The gateway (and the cloud) push events over a websocket. Input changes are
+turned into `openmotics_input` events on the Home Assistant bus and update
+the binary sensors directly, without waiting for the next poll.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+import msgpack
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from pyhaopenmotics import OpenMoticsError
+
+from .const import DOMAIN, EVENT_INPUT
+
+if TYPE_CHECKING:
+    import ssl
+    from collections.abc import Awaitable, Callable
+
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_TYPE_INPUT_CHANGE = "INPUT_CHANGE"
+
+PRESS = "press"
+RELEASE = "release"
+LONG_PRESS = "long_press"
+
+# An input held down this long fires a long press.
+LONG_PRESS_TIME = 1.0
+HEARTBEAT = 30
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+
+
+def signal_input(entry_id: str, input_id: Any) -> str:
+    """Return the dispatcher signal for the changes of an input."""
+    return f"{DOMAIN}_{entry_id}_input_{input_id}"
+
+
+def decode_message(message: aiohttp.WSMessage) -> dict[str, Any] | None:
+    """Decode a websocket message, the gateway uses msgpack, the cloud json."""
+    try:
+        if message.type == aiohttp.WSMsgType.TEXT:
+            event = json.loads(message.data)
+        elif message.type == aiohttp.WSMsgType.BINARY:
+            event = msgpack.unpackb(message.data)
+        else:
+            return None
+    except ValueError:
+        _LOGGER.debug("Ignoring invalid event: %s", message.data)
+        return None
+    if not isinstance(event, dict):
+        _LOGGER.debug("Ignoring event that is not an object: %s", message.data)
+        return None
+    return event
+
+
+class OpenMoticsEventStream:
+    """Websocket connection to the event stream, reconnects when it drops."""
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        hass: HomeAssistant,
+        session: aiohttp.ClientSession,
+        url: str,
+        on_event: Callable[[dict[str, Any]], None],
+        *,
+        headers: Callable[[], Awaitable[dict[str, str]]] | None = None,
+        subscription: dict[str, Any] | None = None,
+        ssl_context: ssl.SSLContext | bool | None = None,
+    ) -> None:
+        """Initialize the event stream."""
+        self.hass = hass
+        self._session = session
+        self._url = url
+        self._on_event = on_event
+        self._headers = headers
+        self._subscription = subscription
+        self._ssl = ssl_context
+        self._task: asyncio.Task | None = None
+        self.connected = False
+        self.reconnects = 0
+
+    def async_start(self) -> None:
+        """Start listening for events in the background."""
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(
+                self._async_run(),
+                f"{DOMAIN} event stream",
+            )
+
+    async def async_stop(self) -> None:
+        """Stop listening for events."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.connected = False
+
+    async def _async_run(self) -> None:
+        """Keep the websocket connected, with a jittered exponential backoff."""
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                await self._async_listen()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                _LOGGER.debug("Event stream disconnected: %s", err)
+            except OpenMoticsError as err:
+                # No token to authenticate with, e.g. while the gateway is down
+                _LOGGER.debug("Event stream not authenticated: %s", err)
+            if self.connected:
+                # The connection worked before, retry quickly
+                delay = RECONNECT_MIN_DELAY
+            self.connected = False
+            self.reconnects += 1
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _async_listen(self) -> None:
+        """Connect, subscribe and dispatch events until the connection drops."""
+        headers = await self._headers() if self._headers is not None else None
+        async with self._session.ws_connect(
+            self._url,
+            headers=headers,
+            heartbeat=HEARTBEAT,
+            ssl=self._ssl,
+        ) as websocket:
+            if self._subscription is not None:
+                await websocket.send_json(self._subscription)
+            self.connected = True
+            _LOGGER.debug("Event stream connected to %s", self._url)
+            async for message in websocket:
+                if message.type == aiohttp.WSMsgType.ERROR:
+                    break
+                if (event := decode_message(message)) is not None:
+                    self._on_event(event)
+
+
+class InputEventHandler:
+    """Turn input changes into press, release and long press events."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        installation_id: Any,
+    ) -> None:
+        """Initialize the handler."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._installation_id = installation_id
+        self._pressed: dict[Any, float] = {}
+        self._long_press: dict[Any, asyncio.TimerHandle] = {}
+
+    def __call__(self, event: dict[str, Any]) -> None:
+        """Handle an event from the event stream."""
+        if event.get("type") != EVENT_TYPE_INPUT_CHANGE:
+            return
+        data = event.get("data")
+        if not isinstance(data, dict) or (input_id := data.get("id")) is None:
+            _LOGGER.debug("Ignoring input change without an input: %s", event)
+            return
+        status = data.get("status")
+        if isinstance(status, dict):
+            status = status.get("on")
+        self.async_input_changed(input_id, bool(status))
+
+    def async_input_changed(self, input_id: Any, pressed: bool) -> None:
+        """Fire the events of an input that was pressed or released."""
+        now = self.hass.loop.time()
+        async_dispatcher_send(
+            self.hass,
+            signal_input(self._entry_id, input_id),
+            pressed,
+        )
+        if pressed:
+            if input_id in self._pressed:
+                return
+            self._pressed[input_id] = now
+            self._long_press[input_id] = self.hass.loop.call_later(
+                LONG_PRESS_TIME,
+                self._fire,
+                input_id,
+                LONG_PRESS,
+            )
+            self._fire(input_id, PRESS)
+            return
+
+        if (timer := self._long_press.pop(input_id, None)) is not None:
+            timer.cancel()
+        if (pressed_at := self._pressed.pop(input_id, None)) is None:
+            return
+        self._fire(input_id, RELEASE, duration=round(now - pressed_at, 3))
+
+    def _fire(self, input_id: Any, event_type: str, **extra: Any) -> None:
+        """Fire an openmotics_input event."""
+        if event_type == LONG_PRESS:
+            self._long_press.pop(input_id, None)
+        self.hass.bus.async_fire(
+            EVENT_INPUT,
+            {
+                "installation_id": self._installation_id,
+                "input_id": input_id,
+                "type": event_type,
+                **extra,
+            },
+        )
+
+    def async_cancel(self) -> None:
+        """Cancel the pending long press timers."""
+        for timer in self._long_press.values():
+            timer.cancel()
+        self._long_press.clear()
+        self._pressed.clear()
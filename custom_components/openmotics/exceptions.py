@@ -28,3 +28,15 @@ class UserLevel(OpenMoticsException):
 
 class InvalidAuth(OpenMoticsException):
     """Authentication failed."""
+
+
+class UnknownLocation(OpenMoticsException):
+    """Room or floor is not known by any installation."""
+
+
+class TimerNotSupported(OpenMoticsException):
+    """The client can't let the gateway turn off an output."""
+
+
+class OffloadNotSupported(OpenMoticsException):
+    """The gateway can't be configured to run automations."""
@@ -0,0 +1,207 @@
+"""The cloud account shared by the entries of its installations.
+
+Every installation of an account has its own config entry, but they all use
+the same client credentials. The hub of the account holds the one token
+they share (stored back on their entries when renewed), one session and
+the request budget of the account, and lets the installations refresh in
+turns.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+from homeassistant.const import CONF_CLIENT_ID, CONF_CLIENT_SECRET
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+from .const import DATA_CLOUD_HUBS, DOMAIN
+from .metrics import payload_trace_config
+from .oauth_impl import OpenMoticsOauth2Implementation
+from .scheduler import RefreshScheduler
+
+if TYPE_CHECKING:
+    from types import SimpleNamespace
+
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+# Requests per second to the cloud for all installations of an account,
+# and how many can be sent at once after a quiet period.
+CLOUD_REQUEST_RATE = 10.0
+CLOUD_REQUEST_BURST = 20
+# Seconds between the start of the refreshes of two installations
+INSTALLATION_SPACING = 1.0
+# Installations of an account refreshing at the same time
+MAX_CONCURRENT_INSTALLATIONS = 2
+# Seconds before it expires that the token is renewed
+TOKEN_MARGIN = 60
+
+
+class RequestBudget:
+    """Token bucket limiting the request rate."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialize a full budget."""
+        self._rate = rate
+        self._burst = burst
+        self._available = float(burst)
+        self._updated = time.monotonic()
+        self.throttled = 0
+
+    def _refill(self) -> None:
+        """Add the requests earned since the last update."""
+        now = time.monotonic()
+        self._available = min(
+            self._burst,
+            self._available + (now - self._updated) * self._rate,
+        )
+        self._updated = now
+
+    async def async_acquire(self) -> None:
+        """Wait until a request fits in the budget and take it."""
+        self._refill()
+        if self._available < 1:
+            self.throttled += 1
+        while self._available < 1:
+            await asyncio.sleep((1 - self._available) / self._rate)
+            self._refill()
+        self._available -= 1
+
+
+class OpenMoticsCloudHub:
+    """Token, connections and budget of a cloud account."""
+
+    def __init__(self, hass: HomeAssistant, client_id: str, client_secret: str) -> None:
+        """Initialize the hub of an account."""
+        self.hass = hass
+        self.implementation = OpenMoticsOauth2Implementation(
+            hass,
+            domain=f"{DOMAIN}-account-{client_id}",
+            client_id=client_id,
+            client_secret=client_secret,
+            name=f"{DOMAIN}-account-{client_id}",
+        )
+        self._token: dict[str, Any] = {}
+        self._token_lock = asyncio.Lock()
+        self.token_refreshes = 0
+        self.budget = RequestBudget(CLOUD_REQUEST_RATE, CLOUD_REQUEST_BURST)
+        self.scheduler = RefreshScheduler(
+            spacing=INSTALLATION_SPACING,
+            limit=MAX_CONCURRENT_INSTALLATIONS,
+        )
+        self.requests = 0
+        self.entry_ids: set[str] = set()
+        self._http_session: aiohttp.ClientSession | None = None
+
+    @property
+    def token(self) -> dict[str, Any]:
+        """Return the token shared by the installations."""
+        return self._token
+
+    @property
+    def token_valid(self) -> bool:
+        """Return True if the token does not expire soon."""
+        return self._token.get("expires_at", 0) > time.time() + TOKEN_MARGIN
+
+    @callback
+    def async_add_entry(self, entry: ConfigEntry) -> None:
+        """Let an entry use the hub, its token is used if it is newer."""
+        self.entry_ids.add(entry.entry_id)
+        token = entry.data.get("token") or {}
+        if token.get("expires_at", 0) > self._token.get("expires_at", 0):
+            self._token = dict(token)
+
+    async def async_remove_entry(self, entry_id: str) -> None:
+        """Stop using the hub for an entry, close it after the last one."""
+        self.entry_ids.discard(entry_id)
+        if self.entry_ids:
+            return
+        self.hass.data[DATA_CLOUD_HUBS].pop(self.implementation.client_id, None)
+        if self._http_session is not None:
+            # The connections belong to the pool of Home Assistant
+            self._http_session.detach()
+            self._http_session = None
+
+    async def async_ensure_token_valid(self) -> None:
+        """Renew the token if it expires soon, once for all installations."""
+        if self.token_valid:
+            return
+        async with self._token_lock:
+            # Another installation may have renewed it while we waited
+            if self.token_valid:
+                return
+            _LOGGER.debug("Renewing the token of %s", self.implementation.name)
+            self._token = await self.implementation.async_refresh_token(self._token)
+            self.token_refreshes += 1
+            self._async_store_token()
+
+    @callback
+    def _async_store_token(self) -> None:
+        """Store the renewed token on the entries, for after a restart."""
+        for entry_id in self.entry_ids:
+            if (entry := self.hass.config_entries.async_get_entry(entry_id)) is None:
+                continue
+            self.hass.config_entries.async_update_entry(
+                entry,
+                data={**entry.data, "token": self._token},
+            )
+
+    async def async_access_token(self) -> str:
+        """Return a valid access token."""
+        await self.async_ensure_token_valid()
+        return self._token["access_token"]
+
+    @property
+    def http_session(self) -> aiohttp.ClientSession:
+        """Return the session of the account, its requests share the budget."""
+        if self._http_session is None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self._async_on_request_start)
+            self._http_session = async_create_clientsession(
+                self.hass,
+                auto_cleanup=False,
+                trace_configs=[trace_config, payload_trace_config()],
+            )
+        return self._http_session
+
+    async def _async_on_request_start(
+        self,
+        _session: aiohttp.ClientSession,
+        _context: SimpleNamespace,
+        _params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        """Hold every request of the account until it fits in the budget."""
+        await self.budget.async_acquire()
+        self.requests += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the hub for the diagnostics."""
+        return {
+            "installations": len(self.entry_ids),
+            "requests": self.requests,
+            "throttled": self.budget.throttled,
+            "token_refreshes": self.token_refreshes,
+            "token_valid": self.token_valid,
+            "scheduler": self.scheduler.as_dict(),
+        }
+
+
+@callback
+def async_get_cloud_hub(hass: HomeAssistant, entry: ConfigEntry) -> OpenMoticsCloudHub:
+    """Return the hub of the account of a cloud entry and add the entry to it."""
+    hubs: dict[str, OpenMoticsCloudHub] = hass.data.setdefault(DATA_CLOUD_HUBS, {})
+    client_id = entry.data[CONF_CLIENT_ID]
+    if (hub := hubs.get(client_id)) is None:
+        hub = hubs[client_id] = OpenMoticsCloudHub(
+            hass,
+            client_id,
+            entry.data[CONF_CLIENT_SECRET],
+        )
+    hub.async_add_entry(entry)
+    return hub
@@ -0,0 +1,284 @@
+"""Queue the commands sent while the installation can't be reached.
+
+Commands that fail because the gateway (or the cloud) is unreachable, or
+that are sent while its circuit breaker is open, are written to a journal
+that survives restarts. Per device only the last command for the same
+target is kept, e.g. a shutter that was told to go up and then down only
+goes down. Commands older than `COMMAND_EXPIRY` are dropped, the others
+are sent together once the connection is back.
+
+Toggles and scenes are never queued, replaying them late (or twice) would
+do something else than what was asked. The timer of a queued `turn_on` is
+shortened by the time it waited, the output still turns off when it was
+asked to.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .recorder import CALLER, CALLER_COMMAND
+from .transport import FAILOVER_ERRORS
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from homeassistant.core import HomeAssistant
+
+    from .batch import CommandBatcher
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+# Seconds after which a queued command is no longer sent
+COMMAND_EXPIRY = 600
+# Commands that are queued, and the target of the device they set. The
+# commands for the same target of a device replace each other.
+JOURNALED_METHODS = {
+    "turn_on": "state",
+    "turn_off": "state",
+    "move_up": "state",
+    "move_down": "state",
+    "stop": "state",
+    "change_position": "state",
+    "set_state": "mode",
+    "set_preset": "preset",
+    "set_temperature": "temperature",
+}
+# What the entities get back for a queued command, they show its target
+QUEUED_RESULT = {"success": True, "queued": True}
+
+
+class CommandJournal:
+    """Persistent queue of commands, the last one per device target."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        batcher: CommandBatcher,
+        offline: Callable[[], bool],
+        *,
+        expiry: float = COMMAND_EXPIRY,
+        replayed: Callable[[tuple[str, ...], Any, bool], None] | None = None,
+    ) -> None:
+        """Initialize the journal.
+
+        `offline` returns True while commands should not even be tried.
+        `replayed` is called with the controller path and device of every
+        queued command that was sent (True) or given up (False).
+        """
+        self.hass = hass
+        self._batcher = batcher
+        self._offline = offline
+        self._replayed = replayed
+        self._expiry = expiry
+        self._store: Store = Store(
+            hass,
+            STORAGE_VERSION,
+            f"{DOMAIN}.{entry_id}.command_journal",
+        )
+        self._commands: dict[str, dict[str, Any]] = {}
+        self._replay_task: asyncio.Task | None = None
+        self.queued = 0
+        self.replayed = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        """Return the number of queued commands."""
+        return len(self._commands)
+
+    async def async_load(self) -> None:
+        """Load the commands queued before a restart."""
+        self._commands = await self._store.async_load() or {}
+
+    @callback
+    def _async_save(self) -> None:
+        """Save the journal soon, a burst of commands is saved once."""
+        self._store.async_delay_save(lambda: self._commands, 1)
+
+    async def async_call(
+        self,
+        method: Callable[..., Awaitable[Any]],
+        path: tuple[str, ...],
+        name: str,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """Send a command, queue it if the installation can't be reached."""
+        if not self._offline():
+            try:
+                return await method(*args, **kwargs)
+            except FAILOVER_ERRORS as err:
+                _LOGGER.debug("Queueing %s.%s: %s", ".".join(path), name, err)
+        self._async_record(path, name, args, kwargs)
+        return QUEUED_RESULT
+
+    @callback
+    def _async_record(
+        self,
+        path: tuple[str, ...],
+        name: str,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> None:
+        """Queue a command, replacing the previous one for the same target."""
+        device = args[0] if args else None
+        key = f"{'.'.join(path)}:{device}:{JOURNALED_METHODS[name]}"
+        # Re-inserted, so the commands are replayed in the order they were given
+        self._commands.pop(key, None)
+        now = time.time()
+        self._commands[key] = {
+            "path": list(path),
+            "method": name,
+            "args": list(args),
+            "kwargs": kwargs,
+            "queued": now,
+            "expires": now + self._expiry,
+        }
+        self.queued += 1
+        self._async_save()
+
+    @callback
+    def async_schedule_replay(self, client: Any, done: Callable[[], Any]) -> None:
+        """Replay the queue in the background, call `done` if anything was sent."""
+        if not self._commands or (
+            self._replay_task is not None and not self._replay_task.done()
+        ):
+            return
+        self._replay_task = self.hass.async_create_background_task(
+            self._async_replay(client, done),
+            f"{DOMAIN} command journal replay",
+        )
+
+    async def async_close(self) -> None:
+        """Stop a replay in progress, what is left stays queued."""
+        if (task := self._replay_task) is None:
+            return
+        self._replay_task = None
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    async def _async_replay(self, client: Any, done: Callable[[], Any]) -> None:
+        """Send the queued commands that did not expire, all in one batch."""
+        # Scheduled by a refresh, but these are commands
+        CALLER.set(CALLER_COMMAND)
+        try:
+            now = time.time()
+            pending = []
+            for key, command in list(self._commands.items()):
+                method = client
+                for attribute in (*command["path"], command["method"]):
+                    method = getattr(method, attribute, None)
+                kwargs = self._remaining_kwargs(command, now)
+                if command["expires"] < now or method is None or kwargs is None:
+                    self._commands.pop(key)
+                    self.expired += 1
+                    self._async_replayed(command, False)
+                    continue
+                method = functools.partial(method, **kwargs)
+                pending.append((key, command, method))
+            if not pending:
+                return
+
+            _LOGGER.info("Sending %s queued commands", len(pending))
+            results = await asyncio.gather(
+                *(
+                    self._batcher.async_call(method, *command["args"])
+                    for _key, command, method in pending
+                ),
+                return_exceptions=True,
+            )
+            for (key, command, _method), result in zip(pending, results):
+                if isinstance(result, FAILOVER_ERRORS):
+                    # Still unreachable, try again on the next refresh
+                    continue
+                if isinstance(result, Exception):
+                    _LOGGER.warning("Queued command failed: %s", result)
+                # Unless a newer command for the target was queued meanwhile
+                if self._commands.get(key) is command:
+                    self._commands.pop(key)
+                    self._async_replayed(command, not isinstance(result, Exception))
+                self.replayed += 1
+            await done()
+        finally:
+            self._async_save()
+
+    def _remaining_kwargs(
+        self,
+        command: dict[str, Any],
+        now: float,
+    ) -> dict[str, Any] | None:
+        """Return the arguments to replay a command with, None if it is too late.
+
+        A timer counts from when the command was given, not from the replay.
+        """
+        kwargs = command["kwargs"]
+        if kwargs.get("timer") is None:
+            return kwargs
+        queued = command.get("queued", command["expires"] - self._expiry)
+        if (timer := round(kwargs["timer"] - (now - queued))) <= 0:
+            return None
+        return {**kwargs, "timer": timer}
+
+    @callback
+    def _async_replayed(self, command: dict[str, Any], sent: bool) -> None:
+        """Report a queued command that was sent or given up."""
+        if self._replayed is not None:
+            device = command["args"][0] if command["args"] else None
+            self._replayed(tuple(command["path"]), device, sent)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the journal for the diagnostics."""
+        return {
+            "pending": len(self._commands),
+            "queued": self.queued,
+            "replayed": self.replayed,
+            "expired": self.expired,
+        }
+
+
+class JournalClient:
+    """Looks like the client, but queues the commands it can't send."""
+
+    def __init__(
+        self,
+        journal: CommandJournal,
+        client: Any,
+        path: tuple[str, ...] = (),
+    ) -> None:
+        """Initialize the client at a controller path."""
+        object.__setattr__(self, "_journal", journal)
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "_path", path)
+
+    def __getattr__(self, name: str) -> Any:
+        """Return a controller, a journaled method or a plain attribute."""
+        attribute = getattr(self._client, name)
+        if asyncio.iscoroutinefunction(attribute):
+            if self._path and name in JOURNALED_METHODS:
+                return functools.partial(
+                    self._journal.async_call,
+                    attribute,
+                    self._path,
+                    name,
+                )
+            return attribute
+        if attribute is None or callable(attribute):
+            return attribute
+        if isinstance(attribute, (str, int, float, bool)):
+            return attribute
+        return JournalClient(self._journal, attribute, (*self._path, name))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Set an attribute of the client, e.g. the installation id."""
+        setattr(self._client, name, value)
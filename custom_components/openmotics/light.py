@@ -6,10 +6,12 @@ from typing import TYPE_CHECKING, Any
 
 from homeassistant.components.light import ATTR_BRIGHTNESS, ColorMode, LightEntity
 
-from .const import DOMAIN, NOT_IN_USE
-from .entity import OpenMoticsDevice
+from .const import DOMAIN
+from .entity import OpenMoticsOutput, async_setup_discovery
 
 if TYPE_CHECKING:
+    from datetime import timedelta
+
     from homeassistant.config_entries import ConfigEntry
     from homeassistant.core import HomeAssistant
     from homeassistant.helpers.entity_platform import AddEntitiesCallback
@@ -25,29 +27,33 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up Lights for OpenMotics Controller."""
-    entities = []
-
     coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    for index, om_light in enumerate(coordinator.data["outputs"]):
-        if om_light.name is None or not om_light.name or om_light.name == NOT_IN_USE:
-            continue
-
+    def create_output_lights(index: int, om_light: Any) -> list[LightEntity]:
         # Outputs can contain outlets and lights, so filter out only the lights
-        if om_light.output_type == "LIGHT":
-            entities.append(OpenMoticsOutputLight(coordinator, index, om_light))
-
-    for index, om_light in enumerate(coordinator.data["lights"]):
-        if om_light.name is None or not om_light.name or om_light.name == NOT_IN_USE:
-            continue
-
-        entities.append(OpenMoticsLight(coordinator, index, om_light))
-
-    if not entities:
-        _LOGGER.info("No OpenMotics Lights added")
-        return
-
-    async_add_entities(entities)
+        if om_light.output_type != "LIGHT":
+            return []
+        return [OpenMoticsOutputLight(coordinator, index, om_light)]
+
+    def create_lights(index: int, om_light: Any) -> list[LightEntity]:
+        return [OpenMoticsLight(coordinator, index, om_light)]
+
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "outputs",
+        create_output_lights,
+    )
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "lights",
+        create_lights,
+    )
 
 
 def brightness_to_percentage(byt: int) -> int:
@@ -60,11 +66,13 @@ def brightness_from_percentage(percent: float) -> int:
     return min(max(int(round(percent * 255 / 100, 0)), 0), 255)
 
 
-class OpenMoticsOutputLight(OpenMoticsDevice, LightEntity):
+class OpenMoticsOutputLight(OpenMoticsOutput, LightEntity):
     """Representation of a OpenMotics Output light."""
 
     coordinator: OpenMoticsDataUpdateCoordinator
 
+    _collection = "outputs"
+
     def __init__(
         self,
         coordinator: OpenMoticsDataUpdateCoordinator,
@@ -87,22 +95,20 @@ class OpenMoticsOutputLight(OpenMoticsDevice, LightEntity):
     def is_on(self) -> Any:
         """Return true if device is on."""
         try:
-            self._device = self.coordinator.data["outputs"][self.index]
-            return self._device.status.on
+            return self.status.on
         except (AttributeError, KeyError):
             return None
 
     @property
     def brightness(self) -> int | None:
         """Return the brightness of this light between 0..255."""
-        try:
-            self._device = self.coordinator.data["outputs"][self.index]
-            return brightness_from_percentage(self._device.status.value)
-        except (AttributeError, KeyError):
+        if (value := self.status.value) is None:
             return None
+        return brightness_from_percentage(value)
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn device on."""
+        self._async_cancel_timer()
         # brightness = kwargs.get(ATTR_BRIGHTNESS)
         # if brightness is not None:
         if (brightness := kwargs.get(ATTR_BRIGHTNESS)) is not None:
@@ -124,8 +130,22 @@ class OpenMoticsOutputLight(OpenMoticsDevice, LightEntity):
 
         await self._update_state_from_result(result, True, brightness)
 
+    async def async_turn_on_for(
+        self,
+        duration: timedelta,
+        brightness: int | None = None,
+    ) -> None:
+        """Turn device on, the gateway turns it off after the duration."""
+        _LOGGER.debug("Turning on light: %s for %s", self.device_id, duration)
+        result = await self._async_turn_on_for(
+            duration,
+            None if brightness is None else brightness_to_percentage(brightness),
+        )
+        await self._update_state_from_result(result, True, brightness)
+
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn device off."""
+        self._async_cancel_timer()
         _LOGGER.debug("Turning off light: %s", self.device_id)
         result = await self.coordinator.omclient.outputs.turn_off(
             self.device_id,
@@ -139,20 +159,24 @@ class OpenMoticsOutputLight(OpenMoticsDevice, LightEntity):
         brightness: int | None,
     ) -> None:
         if isinstance(result, dict) and result.get("_error") is None:
-            self._device.status.on = state
+            self._async_trace_sent()
+            self.status.on = state
             if brightness is not None:
-                self._device.status.value = brightness_to_percentage(brightness)
+                self.status.value = brightness_to_percentage(brightness)
+            self._async_trace_acknowledged(result)
             self.async_write_ha_state()
         else:
             _LOGGER.debug("Invalid result, refreshing all")
             await self.coordinator.async_refresh()
 
 
-class OpenMoticsLight(OpenMoticsDevice, LightEntity):
+class OpenMoticsLight(OpenMoticsOutput, LightEntity):
     """Representation of a OpenMotics light."""
 
     coordinator: OpenMoticsDataUpdateCoordinator
 
+    _collection = "lights"
+
     def __init__(
         self,
         coordinator: OpenMoticsDataUpdateCoordinator,
@@ -180,22 +204,20 @@ class OpenMoticsLight(OpenMoticsDevice, LightEntity):
     def is_on(self) -> Any:
         """Return true if device is on."""
         try:
-            self._device = self.coordinator.data["lights"][self.index]
-            return self._device.status.on
+            return self.status.on
         except (AttributeError, KeyError):
             return None
 
     @property
     def brightness(self) -> int | None:
         """Return the brightness of this light between 0..255."""
-        try:
-            self._device = self.coordinator.data["lights"][self.index]
-            return brightness_from_percentage(self._device.status.value)
-        except (AttributeError, KeyError):
+        if (value := self.status.value) is None:
             return None
+        return brightness_from_percentage(value)
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn device on."""
+        self._async_cancel_timer()
         if (brightness := kwargs.get(ATTR_BRIGHTNESS)) is not None:
             # Openmotics brightness (value) is between 0..100
             _LOGGER.debug(
@@ -215,8 +237,22 @@ class OpenMoticsLight(OpenMoticsDevice, LightEntity):
 
         await self._update_state_from_result(result, True, brightness)
 
+    async def async_turn_on_for(
+        self,
+        duration: timedelta,
+        brightness: int | None = None,
+    ) -> None:
+        """Turn device on, the gateway turns it off after the duration."""
+        _LOGGER.debug("Turning on light: %s for %s", self.device_id, duration)
+        result = await self._async_turn_on_for(
+            duration,
+            None if brightness is None else brightness_to_percentage(brightness),
+        )
+        await self._update_state_from_result(result, True, brightness)
+
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn device off."""
+        self._async_cancel_timer()
         _LOGGER.debug("Turning off light: %s", self.device_id)
         result = await self.coordinator.omclient.lights.turn_off(
             self.device_id,
@@ -230,9 +266,11 @@ class OpenMoticsLight(OpenMoticsDevice, LightEntity):
         brightness: int | None,
     ) -> None:
         if isinstance(result, dict) and result.get("_error") is None:
-            self._device.status.on = state
+            self._async_trace_sent()
+            self.status.on = state
             if brightness is not None:
-                self._device.status.value = brightness_to_percentage(brightness)
+                self.status.value = brightness_to_percentage(brightness)
+            self._async_trace_acknowledged(result)
             self.async_write_ha_state()
         else:
             _LOGGER.debug("Invalid result, refreshing all")
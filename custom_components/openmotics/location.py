@@ -0,0 +1,103 @@
+"""Rooms and floors of the OpenMotics devices.
+
+The devices carry their location (`location.room_id` and `location.floor_id`)
+in every refresh, but it only changes when the installation is configured
+again. The index is only rebuilt when the locations of a collection change.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any
+
+from .const import DOMAIN
+
+NO_LOCATION = (None, None)
+
+
+def signal_locations(entry_id: str) -> str:
+    """Return the dispatcher signal sent when the locations changed."""
+    return f"{DOMAIN}_{entry_id}_locations"
+
+
+def device_location(device: Any) -> tuple[Any, Any]:
+    """Return the floor and the room of a device."""
+    location = getattr(device, "location", None)
+    return (
+        getattr(location, "floor_id", None),
+        getattr(location, "room_id", None),
+    )
+
+
+class LocationIndex:
+    """Index from rooms and floors to the devices in them."""
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._locations: dict[str, dict[Any, tuple[Any, Any]]] = {}
+        self._digests: dict[str, int] = {}
+        self._room_names: dict[Any, str] = {}
+        self.rooms: dict[Any, dict[str, list[Any]]] = {}
+        self.floors: dict[Any, set[Any]] = {}
+
+    def update(self, collection: str, devices: list[Any]) -> bool:
+        """Update the locations of a collection, return True if they changed."""
+        locations = {device.idx: device_location(device) for device in devices}
+        digest = hash(frozenset(locations.items()))
+        if self._digests.get(collection) == digest:
+            return False
+        self._digests[collection] = digest
+        self._locations[collection] = {
+            idx: location
+            for idx, location in locations.items()
+            if location != NO_LOCATION
+        }
+        self._rebuild()
+        return True
+
+    def update_rooms(self, rooms: list[Any]) -> bool:
+        """Update the names of the rooms, return True if they changed."""
+        names = {room.idx: room.name for room in rooms if room.name}
+        if names == self._room_names:
+            return False
+        self._room_names = names
+        return True
+
+    def _rebuild(self) -> None:
+        """Rebuild the rooms and floors from the locations."""
+        rooms: dict[Any, dict[str, list[Any]]] = defaultdict(lambda: defaultdict(list))
+        floors: dict[Any, set[Any]] = defaultdict(set)
+        for collection, locations in self._locations.items():
+            for idx, (floor_id, room_id) in locations.items():
+                if room_id is None:
+                    continue
+                rooms[room_id][collection].append(idx)
+                if floor_id is not None:
+                    floors[floor_id].add(room_id)
+        self.rooms = {room_id: dict(devices) for room_id, devices in rooms.items()}
+        self.floors = dict(floors)
+
+    def location(self, collection: str | None, idx: Any) -> tuple[Any, Any]:
+        """Return the floor and the room of a device."""
+        return self._locations.get(collection or "", {}).get(idx, NO_LOCATION)
+
+    def room_name(self, room_id: Any) -> str:
+        """Return the name of a room."""
+        return self._room_names.get(room_id) or f"Room {room_id}"
+
+    def find_room(self, room: Any) -> Any:
+        """Return the id of a room given its id or name, None if unknown."""
+        for room_id in self.rooms:
+            if str(room) in (str(room_id), self.room_name(room_id)):
+                return room_id
+        return None
+
+    def devices(self, room_id: Any, collection: str) -> list[Any]:
+        """Return the devices of a collection in a room."""
+        return self.rooms.get(room_id, {}).get(collection, [])
+
+    def rooms_on_floor(self, floor: Any) -> list[Any]:
+        """Return the rooms on a floor, given its id."""
+        for floor_id, rooms in self.floors.items():
+            if str(floor) == str(floor_id):
+                return sorted(rooms, key=str)
+        return []
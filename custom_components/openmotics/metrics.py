@@ -0,0 +1,268 @@
+"""Latency, errors and payload sizes of the requests to OpenMotics.
+
+Every call of the pyhaopenmotics client goes through an instrumented proxy,
+which records its latency in an HDR-style histogram per endpoint: the
+buckets are linear within each power of two, so a percentile is off by
+at most 1/`SUB_BUCKETS` whatever the latency, with a fixed small memory
+footprint. The bytes of the responses are counted by a trace on the
+aiohttp sessions the integration owns.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import math
+import time
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+
+if TYPE_CHECKING:
+    from types import SimpleNamespace
+
+    from .recorder import FlightRecorder
+
+# Linear buckets per power of two
+SUB_BITS = 4
+SUB_BUCKETS = 1 << SUB_BITS
+
+# The request being made by the current task, to attribute the bytes read
+CURRENT_REQUEST: ContextVar[RequestSample | None] = ContextVar(
+    "openmotics_request",
+    default=None,
+)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations, in microseconds."""
+
+    __slots__ = ("_counts", "count", "total", "maximum")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self._counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    @staticmethod
+    def _bucket(micros: int) -> int:
+        """Return the bucket of a value, buckets sort like their values."""
+        exponent = max(0, micros.bit_length() - SUB_BITS - 1)
+        return (exponent << (SUB_BITS + 1)) | (micros >> exponent)
+
+    @staticmethod
+    def _value(bucket: int) -> float:
+        """Return the middle of a bucket, in seconds."""
+        exponent = bucket >> (SUB_BITS + 1)
+        mantissa = bucket & ((SUB_BUCKETS << 1) - 1)
+        low = mantissa << exponent
+        return (low + ((1 << exponent) - 1) / 2) / 1_000_000
+
+    def record(self, seconds: float) -> None:
+        """Record a duration."""
+        bucket = self._bucket(int(seconds * 1_000_000))
+        self._counts[bucket] = self._counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, fraction: float) -> float | None:
+        """Return a percentile in seconds, None without samples."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket in sorted(self._counts):
+            seen += self._counts[bucket]
+            if seen >= rank:
+                return min(self._value(bucket), self.maximum)
+        return self.maximum
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the percentiles in milliseconds."""
+
+        def _ms(seconds: float | None) -> float | None:
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        return {
+            "count": self.count,
+            "p50_ms": _ms(self.percentile(0.5)),
+            "p95_ms": _ms(self.percentile(0.95)),
+            "p99_ms": _ms(self.percentile(0.99)),
+            "max_ms": _ms(self.maximum if self.count else None),
+        }
+
+
+class RequestSample:
+    """A request in progress, the bytes of its response are added to it."""
+
+    __slots__ = ("endpoint", "started", "size")
+
+    def __init__(self, endpoint: str) -> None:
+        """Start the sample."""
+        self.endpoint = endpoint
+        self.started = time.monotonic()
+        self.size = 0
+
+
+class EndpointMetrics:
+    """Calls, failures, latency and payload of one endpoint."""
+
+    __slots__ = ("latency", "errors", "timeouts", "bytes")
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for the diagnostics."""
+        return {
+            **self.latency.as_dict(),
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "bytes": self.bytes,
+        }
+
+
+class RequestMetrics:
+    """Metrics of all endpoints of an entry, and of its refreshes."""
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.endpoints: dict[str, EndpointMetrics] = {}
+        # All requests together, and the refreshes
+        self.latency = LatencyHistogram()
+        self.refresh = LatencyHistogram()
+        self.last_refresh: float | None = None
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes = 0
+
+    def record(self, sample: RequestSample, error: BaseException | None) -> float:
+        """Record a finished request, return its duration."""
+        elapsed = time.monotonic() - sample.started
+        if (endpoint := self.endpoints.get(sample.endpoint)) is None:
+            endpoint = self.endpoints[sample.endpoint] = EndpointMetrics()
+        endpoint.latency.record(elapsed)
+        self.latency.record(elapsed)
+        endpoint.bytes += sample.size
+        self.bytes += sample.size
+        if isinstance(error, asyncio.TimeoutError):
+            endpoint.timeouts += 1
+            self.timeouts += 1
+        elif error is not None:
+            endpoint.errors += 1
+            self.errors += 1
+        return elapsed
+
+    def record_refresh(self, seconds: float) -> None:
+        """Record the duration of a refresh."""
+        self.refresh.record(seconds)
+        self.last_refresh = seconds
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics for the diagnostics."""
+        return {
+            "latency": self.latency.as_dict(),
+            "refresh": self.refresh.as_dict(),
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "bytes": self.bytes,
+            "endpoints": {
+                name: metrics.as_dict()
+                for name, metrics in sorted(self.endpoints.items())
+            },
+        }
+
+
+class InstrumentedClient:
+    """Looks like the client, but measures every call."""
+
+    def __init__(
+        self,
+        metrics: RequestMetrics,
+        client: Any,
+        path: tuple[str, ...] = (),
+        *,
+        recorder: FlightRecorder | None = None,
+    ) -> None:
+        """Initialize the client at a controller path.
+
+        The first element of the path names the client, e.g. "local". The
+        requests are also remembered by the recorder, if any.
+        """
+        object.__setattr__(self, "_metrics", metrics)
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "_path", path)
+        object.__setattr__(self, "_recorder", recorder)
+
+    def __getattr__(self, name: str) -> Any:
+        """Return a controller, a measured method or a plain attribute."""
+        attribute = getattr(self._client, name)
+        if asyncio.iscoroutinefunction(attribute):
+            call = functools.partial(
+                self._async_call,
+                attribute,
+                ".".join((*self._path, name)),
+            )
+            # The signature is the one of the method of the client
+            call.__wrapped__ = attribute  # type: ignore[attr-defined]
+            return call
+        if attribute is None or callable(attribute):
+            return attribute
+        if isinstance(attribute, (str, int, float, bool)):
+            return attribute
+        return InstrumentedClient(
+            self._metrics,
+            attribute,
+            (*self._path, name),
+            recorder=self._recorder,
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Set an attribute of the client, e.g. the installation id."""
+        setattr(self._client, name, value)
+
+    async def _async_call(
+        self,
+        method: Any,
+        endpoint: str,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """Call a method of the client and record how it went."""
+        sample = RequestSample(endpoint)
+        token = CURRENT_REQUEST.set(sample)
+        error: BaseException | None = None
+        try:
+            return await method(*args, **kwargs)
+        except (Exception, asyncio.CancelledError) as err:
+            error = err
+            raise
+        finally:
+            CURRENT_REQUEST.reset(token)
+            elapsed = self._metrics.record(sample, error)
+            if self._recorder is not None:
+                self._recorder.record(sample, elapsed, error)
+
+
+async def _async_on_response_chunk(
+    _session: aiohttp.ClientSession,
+    _context: SimpleNamespace,
+    params: aiohttp.TraceResponseChunkReceivedParams,
+) -> None:
+    """Add the bytes of a response to the request of the task."""
+    if (sample := CURRENT_REQUEST.get()) is not None:
+        sample.size += len(params.chunk)
+
+
+def payload_trace_config() -> aiohttp.TraceConfig:
+    """Return a trace counting the response bytes of the measured requests."""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_response_chunk_received.append(_async_on_response_chunk)
+    return trace_config
@@ -0,0 +1,229 @@
+"""Run the automations that can be compiled as group actions on the gateway.
+
+The compiled automations are saved as group actions (which show up as
+scenes) and linked to their input, the automations themselves are turned
+off in Home Assistant. The group actions follow the automations when they
+are reloaded.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.automation import (
+    DOMAIN as AUTOMATION_DOMAIN,
+    EVENT_AUTOMATION_RELOADED,
+)
+from homeassistant.const import ATTR_ENTITY_ID, SERVICE_TURN_OFF, SERVICE_TURN_ON
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.start import async_at_started
+from homeassistant.helpers.storage import Store
+from pyhaopenmotics import OpenMoticsError
+
+from .compiler import CompiledAutomation, NotCompilable, compile_automation
+from .const import DOMAIN, GROUP_ACTION_PREFIX, MAX_GROUP_ACTIONS
+from .entity import is_in_use
+from .exceptions import OffloadNotSupported
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import Event, HomeAssistant
+
+    from .coordinator import OpenMoticsDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+
+# Platforms of the entities that can be compiled and what they are on the gateway
+DEVICE_KINDS = {
+    "light": ("outputs", "output"),
+    "switch": ("outputs", "output"),
+    "cover": ("shutters", "shutter"),
+}
+
+
+class AutomationOffloader:
+    """Keep the group actions of the compiled automations in sync."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        coordinator: OpenMoticsDataUpdateCoordinator,
+    ) -> None:
+        """Initialize the offloader."""
+        self.hass = hass
+        self._entry = entry
+        self._coordinator = coordinator
+        self._store: Store = Store(
+            hass,
+            STORAGE_VERSION,
+            f"{DOMAIN}.{entry.entry_id}.offloaded_automations",
+        )
+        # Automation id to the group action and input it runs on
+        self._offloaded: dict[str, dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+
+    async def async_start(self) -> None:
+        """Sync once Home Assistant has started and after every reload."""
+        self._offloaded = await self._store.async_load() or {}
+        self._entry.async_on_unload(
+            self.hass.bus.async_listen(
+                EVENT_AUTOMATION_RELOADED,
+                self._async_schedule_sync,
+            ),
+        )
+        self._entry.async_on_unload(
+            async_at_started(self.hass, self._async_schedule_sync),
+        )
+
+    @callback
+    def _async_schedule_sync(self, _event: Event | HomeAssistant | None = None) -> None:
+        """Sync in the background."""
+        self.hass.async_create_background_task(
+            self.async_sync(),
+            f"{DOMAIN} automation offload",
+        )
+
+    def _resolve(self, entity_id: str) -> tuple[str, int] | None:
+        """Return the kind and number of the gateway device of an entity."""
+        entry = er.async_get(self.hass).async_get(entity_id)
+        if (
+            entry is None
+            or entry.config_entry_id != self._entry.entry_id
+            or entry.domain not in DEVICE_KINDS
+        ):
+            return None
+        collection, kind = DEVICE_KINDS[entry.domain]
+        idx = entry.unique_id.removeprefix(f"{self._coordinator.install_id}-")
+        for device in self._coordinator.data.get(collection, []):
+            if str(device.idx) == idx:
+                return kind, int(device.local_id)
+        return None
+
+    def _compile_all(self) -> dict[str, tuple[str, CompiledAutomation]]:
+        """Compile the automations, by id with their entity id."""
+        compiled = {}
+        component = self.hass.data.get(AUTOMATION_DOMAIN)
+        for entity in getattr(component, "entities", []):
+            if entity.unique_id is None:
+                continue
+            try:
+                compiled[entity.unique_id] = (
+                    entity.entity_id,
+                    compile_automation(
+                        entity.raw_config or {},
+                        self._resolve,
+                        automation_id=entity.unique_id,
+                    ),
+                )
+            except NotCompilable as err:
+                _LOGGER.debug("%s runs in Home Assistant: %s", entity.entity_id, err)
+        return compiled
+
+    def _free_group_action(self, used: set[int]) -> int | None:
+        """Return a group action that is not configured, the last ones first."""
+        configured = {
+            int(device.local_id)
+            for device in self._coordinator.data.get("groupactions", [])
+            if is_in_use(device)
+        }
+        for group_action_id in reversed(range(MAX_GROUP_ACTIONS)):
+            if group_action_id not in configured | used:
+                return group_action_id
+        return None
+
+    async def async_sync(self) -> None:
+        """Bring the group actions in line with the automations."""
+        async with self._lock:
+            try:
+                changed = await self._async_sync()
+            except OffloadNotSupported as err:
+                _LOGGER.warning("Automations can't run on the gateway: %s", err)
+                return
+            await self._store.async_save(self._offloaded)
+        if changed:
+            await self._coordinator.async_refresh_collections("groupactions")
+
+    async def _async_sync(self) -> bool:
+        """Save, move and remove group actions, return True if any changed."""
+        compiled = self._compile_all()
+        changed = False
+
+        for automation_id in set(self._offloaded) - set(compiled):
+            await self._async_remove(automation_id)
+            changed = True
+
+        used = {offloaded["group_action"] for offloaded in self._offloaded.values()}
+        for automation_id, (entity_id, automation) in compiled.items():
+            digest = repr((automation.name, automation.input_id, automation.actions))
+            current = self._offloaded.get(automation_id)
+            if current is not None and current["digest"] == digest:
+                continue
+            if current is not None:
+                group_action_id = current["group_action"]
+            elif (group_action_id := self._free_group_action(used)) is None:
+                _LOGGER.warning("No free group action left for %s", entity_id)
+                continue
+
+            try:
+                if current is not None and current["input"] != automation.input_id:
+                    await self._coordinator.async_link_input(current["input"], None)
+                await self._coordinator.async_save_group_action(
+                    group_action_id,
+                    f"{GROUP_ACTION_PREFIX}{automation.name}",
+                    automation.actions,
+                )
+                await self._coordinator.async_link_input(
+                    automation.input_id,
+                    group_action_id,
+                )
+            except OpenMoticsError as err:
+                _LOGGER.warning("Could not run %s on the gateway: %s", entity_id, err)
+                continue
+
+            used.add(group_action_id)
+            self._offloaded[automation_id] = {
+                "entity_id": entity_id,
+                "group_action": group_action_id,
+                "input": automation.input_id,
+                "digest": digest,
+            }
+            changed = True
+            _LOGGER.info("%s runs on the gateway now", entity_id)
+            # The gateway runs it, Home Assistant should not run it again
+            await self.hass.services.async_call(
+                AUTOMATION_DOMAIN,
+                SERVICE_TURN_OFF,
+                {ATTR_ENTITY_ID: entity_id},
+                blocking=True,
+            )
+        return changed
+
+    async def _async_remove(self, automation_id: str) -> None:
+        """Run an automation in Home Assistant again."""
+        offloaded = self._offloaded.pop(automation_id)
+        try:
+            await self._coordinator.async_link_input(offloaded["input"], None)
+            await self._coordinator.async_save_group_action(
+                offloaded["group_action"],
+                "",
+                (),
+            )
+        except OpenMoticsError as err:
+            _LOGGER.warning(
+                "Could not remove group action %s: %s",
+                offloaded["group_action"],
+                err,
+            )
+        if self.hass.states.get(offloaded["entity_id"]) is not None:
+            _LOGGER.info("%s runs in Home Assistant again", offloaded["entity_id"])
+            await self.hass.services.async_call(
+                AUTOMATION_DOMAIN,
+                SERVICE_TURN_ON,
+                {ATTR_ENTITY_ID: offloaded["entity_id"]},
+                blocking=True,
+            )
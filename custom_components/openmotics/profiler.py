@@ -0,0 +1,145 @@
+"""Profile the refreshes or the platform setup on demand.
+
+The `openmotics.profile` service arms the profiler for the next refreshes
+(including the updates of the entities they trigger) or the next platform
+setups. The standard library profiler runs while those are in progress,
+so everything the event loop does meanwhile is included. Once done, the
+statistics are written to a pstats file in the config directory, and
+the hot spots are returned by the service and shown in a notification.
+While not armed the coordinator only checks one attribute.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import logging
+import pstats
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components import persistent_notification
+from homeassistant.core import callback
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_PROFILER, DOMAIN
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+PHASE_REFRESH = "refresh"
+PHASE_SETUP = "setup"
+# Functions shown in the notification, by time spent in the function itself
+HOT_SPOTS = 15
+
+
+class OpenMoticsProfiler:
+    """Profiler armed for a number of refreshes or platform setups."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize an idle profiler."""
+        self.hass = hass
+        # The phase being profiled, None while idle
+        self.phase: str | None = None
+        self._remaining = 0
+        self._profile: cProfile.Profile | None = None
+        # What started the profiler, only it can stop it
+        self._owner: Any = None
+        # The report of the profile, once written
+        self._report: asyncio.Future[dict[str, Any]] | None = None
+
+    @callback
+    def async_arm(self, phase: str, count: int) -> asyncio.Future[dict[str, Any]]:
+        """Profile the next runs of a phase, replacing an unfinished profile.
+
+        Returns the report: the path of the statistics and the hot spots.
+        """
+        if self._owner is not None and self._profile is not None:
+            self._profile.disable()
+        if self._report is not None:
+            self._report.cancel()
+        self.phase = phase
+        self._remaining = count
+        self._profile = cProfile.Profile()
+        self._owner = None
+        self._report = self.hass.loop.create_future()
+        _LOGGER.info("Profiling the next %s %s runs", count, phase)
+        return self._report
+
+    @callback
+    def async_start(self, phase: str, owner: Any) -> None:
+        """Start profiling a run, unless another one is being profiled."""
+        if self.phase != phase or self._owner is not None:
+            return
+        self._owner = owner
+        self._profile.enable()
+
+    @callback
+    def async_stop(self, phase: str, owner: Any) -> None:
+        """Stop profiling a run, write the results after the last one."""
+        if self.phase != phase or self._owner is not owner:
+            return
+        self._profile.disable()
+        self._owner = None
+        self._remaining -= 1
+        if self._remaining > 0:
+            return
+        profile = self._profile
+        report = self._report
+        self.phase = None
+        self._profile = None
+        self._report = None
+        self.hass.async_create_background_task(
+            self._async_report(phase, profile, report),
+            f"{DOMAIN} profile report",
+        )
+
+    async def _async_report(
+        self,
+        phase: str,
+        profile: cProfile.Profile,
+        report: asyncio.Future[dict[str, Any]],
+    ) -> None:
+        """Write the statistics, return and notify the hot spots."""
+        timestamp = dt_util.utcnow().strftime("%Y%m%d%H%M%S")
+        path = self.hass.config.path(f"{DOMAIN}_{phase}_{timestamp}.pstats")
+        hot_spots = await self.hass.async_add_executor_job(
+            _write_profile,
+            profile,
+            path,
+        )
+        _LOGGER.info("Profile of the %s written to %s", phase, path)
+        persistent_notification.async_create(
+            self.hass,
+            f"Written to `{path}`, the functions taking the most time:\n\n"
+            + "\n".join(f"- `{hot_spot}`" for hot_spot in hot_spots),
+            title=f"OpenMotics {phase} profile",
+            notification_id=f"{DOMAIN}_profile",
+        )
+        if not report.done():
+            report.set_result({"path": path, "hot_spots": hot_spots})
+
+
+def _write_profile(profile: cProfile.Profile, path: str) -> list[str]:
+    """Dump a profile to a file, return its hot spots."""
+    profile.dump_stats(path)
+    stats = pstats.Stats(profile)
+    rows = sorted(
+        stats.stats.items(),  # type: ignore[attr-defined]
+        key=lambda item: item[1][2],
+        reverse=True,
+    )
+    hot_spots = []
+    for function, (_primitive, calls, own, cumulative, _callers) in rows[:HOT_SPOTS]:
+        hot_spots.append(
+            f"{pstats.func_std_string(function)}: {own * 1000:.1f} ms own, "
+            f"{cumulative * 1000:.1f} ms total, {calls} calls",
+        )
+    return hot_spots
+
+
+def async_get_profiler(hass: HomeAssistant) -> OpenMoticsProfiler:
+    """Return the profiler shared by all entries."""
+    if (profiler := hass.data.get(DATA_PROFILER)) is None:
+        profiler = hass.data[DATA_PROFILER] = OpenMoticsProfiler(hass)
+    return profiler
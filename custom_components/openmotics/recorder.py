@@ -0,0 +1,86 @@
+"""Remember the last requests to OpenMotics, for the diagnostics.
+
+The instrumented client adds every finished request to a bounded ring
+buffer: its endpoint, when it started, how long it took, how it ended,
+the bytes received and what it was sent for. Nothing else is done until
+the diagnostics are downloaded, so it costs nothing while idle.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.util import dt as dt_util
+
+if TYPE_CHECKING:
+    from .metrics import RequestSample
+
+# Requests that are remembered
+RECORDED_REQUESTS = 200
+
+CALLER_POLL = "poll"
+CALLER_REFRESH = "refresh"
+CALLER_COMMAND = "command"
+# What the requests of the current task are sent for, commands unless a
+# refresh says otherwise
+CALLER: ContextVar[str] = ContextVar("openmotics_caller", default=CALLER_COMMAND)
+
+
+class FlightRecorder:
+    """Ring buffer of the last requests."""
+
+    def __init__(self, size: int = RECORDED_REQUESTS) -> None:
+        """Initialize an empty recorder."""
+        self._requests: deque[tuple[str, float, float, str, int, str]] = deque(
+            maxlen=size,
+        )
+        self.recorded = 0
+
+    def __len__(self) -> int:
+        """Return the number of remembered requests."""
+        return len(self._requests)
+
+    def record(
+        self,
+        sample: RequestSample,
+        elapsed: float,
+        error: BaseException | None,
+    ) -> None:
+        """Remember a finished request."""
+        if error is None:
+            status = "ok"
+        elif isinstance(error, asyncio.TimeoutError):
+            status = "timeout"
+        else:
+            status = type(error).__name__
+        self._requests.append(
+            (
+                sample.endpoint,
+                time.time() - elapsed,
+                elapsed,
+                status,
+                sample.size,
+                CALLER.get(),
+            )
+        )
+        self.recorded += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the remembered requests for the diagnostics, oldest first."""
+        return {
+            "recorded": self.recorded,
+            "requests": [
+                {
+                    "endpoint": endpoint,
+                    "started": dt_util.utc_from_timestamp(started).isoformat(),
+                    "duration_ms": round(elapsed * 1000, 1),
+                    "status": status,
+                    "bytes": size,
+                    "caller": caller,
+                }
+                for endpoint, started, elapsed, status, size, caller in self._requests
+            ],
+        }
@@ -6,8 +6,8 @@ from typing import TYPE_CHECKING, Any
 
 from homeassistant.components.scene import Scene
 
-from .const import DOMAIN, NOT_IN_USE
-from .entity import OpenMoticsDevice
+from .const import DOMAIN
+from .entity import OpenMoticsDevice, async_setup_discovery
 
 if TYPE_CHECKING:
     from homeassistant.config_entries import ConfigEntry
@@ -26,20 +26,19 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up Scenes for OpenMotics Controller."""
-    entities = []
-
     coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    for index, om_scene in enumerate(coordinator.data["groupactions"]):
-        if om_scene.name is None or not om_scene.name or om_scene.name == NOT_IN_USE:
-            continue
-        entities.append(OpenMoticsScene(coordinator, index, om_scene))
-
-    if not entities:
-        _LOGGER.info("No OpenMotics Group Actions (Scenes) added")
-        return
+    def create_scenes(index: int, om_scene: Any) -> list[Scene]:
+        return [OpenMoticsScene(coordinator, index, om_scene)]
 
-    async_add_entities(entities)
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "groupactions",
+        create_scenes,
+    )
 
 
 class OpenMoticsScene(OpenMoticsDevice, Scene):
@@ -56,8 +55,6 @@ class OpenMoticsScene(OpenMoticsDevice, Scene):
         """Initialize the scene."""
         super().__init__(coordinator, index, om_scene, "scene")
 
-        self._device = self.coordinator.data["groupactions"][self.index]
-
     async def async_activate(self, **kwargs: Any) -> None:
         """Activate the scene."""
         await self.coordinator.omclient.groupactions.trigger(
@@ -0,0 +1,127 @@
+"""Weekly thermostat schedules of OpenMotics thermostat units.
+
+A schedule is a mapping from weekday (0 is monday) to a mapping from the
+second of the day to the setpoint that starts at that moment, e.g.
+
+    {"0": {"0": 16.0, "25200": 21.0, "79200": 16.0}, "1": {...}, ...}
+
+Schedules are cached per thermostat unit and only parsed again when their
+content changes, so the next transition can be computed locally.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+from typing import Any
+
+SECONDS_PER_DAY = 86400
+
+
+def _as_data(payload: Any) -> Any:
+    """Return the plain data of a (pydantic) model."""
+    if hasattr(payload, "dict"):
+        return payload.dict()
+    return payload
+
+
+class ThermostatSchedule:
+    """A parsed weekly schedule."""
+
+    __slots__ = ("_seconds", "_setpoints")
+
+    def __init__(self, transitions: list[tuple[int, float]]) -> None:
+        """Initialize the schedule from (second of the week, setpoint) pairs."""
+        transitions = sorted(transitions)
+        self._seconds = [second for second, _setpoint in transitions]
+        self._setpoints = [setpoint for _second, setpoint in transitions]
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> ThermostatSchedule | None:
+        """Parse a schedule as returned by the API, None if it is unusable."""
+        payload = _as_data(payload)
+        if isinstance(payload, dict) and "data" in payload:
+            payload = payload["data"]
+        if isinstance(payload, list):
+            payload = dict(enumerate(payload))
+        if not isinstance(payload, dict):
+            return None
+
+        transitions = []
+        try:
+            for weekday, day in payload.items():
+                for second, setpoint in day.items():
+                    transitions.append(
+                        (
+                            int(weekday) * SECONDS_PER_DAY + int(second),
+                            float(setpoint),
+                        ),
+                    )
+        except (AttributeError, TypeError, ValueError):
+            return None
+        if not transitions:
+            return None
+        return cls(transitions)
+
+    def _position(self, moment: datetime) -> int:
+        """Return the index of the first transition after a moment."""
+        second = (
+            moment.weekday() * SECONDS_PER_DAY
+            + moment.hour * 3600
+            + moment.minute * 60
+            + moment.second
+        )
+        return bisect_right(self._seconds, second)
+
+    def setpoint(self, moment: datetime) -> float:
+        """Return the scheduled setpoint at a moment."""
+        # Before the first transition of the week the last one still applies
+        return self._setpoints[self._position(moment) - 1]
+
+    def next_transition(self, moment: datetime) -> tuple[datetime, float]:
+        """Return the moment and the setpoint of the next transition.
+
+        The moment is rebuilt from the local date and time of the transition,
+        so it gets the UTC offset of that day when DST changes in between.
+        """
+        position = self._position(moment)
+        week_start = moment.date() - timedelta(days=moment.weekday())
+        if position == len(self._seconds):
+            position = 0
+            week_start += timedelta(weeks=1)
+        day, second = divmod(self._seconds[position], SECONDS_PER_DAY)
+        transition = datetime.combine(
+            week_start + timedelta(days=day),
+            time(second // 3600, second // 60 % 60, second % 60),
+            tzinfo=moment.tzinfo,
+        )
+        return transition, self._setpoints[position]
+
+
+class ThermostatScheduleCache:
+    """Schedules of all thermostat units, parsed once per change."""
+
+    def __init__(self) -> None:
+        """Initialize an empty cache."""
+        self._hashes: dict[Any, str] = {}
+        self._schedules: dict[Any, ThermostatSchedule | None] = {}
+
+    def __contains__(self, idx: Any) -> bool:
+        """Return True if the schedule of a unit was seen."""
+        return idx in self._hashes
+
+    def update(self, idx: Any, payload: Any) -> bool:
+        """Cache the schedule of a unit, return True if it changed."""
+        digest = hashlib.sha1(
+            json.dumps(_as_data(payload), sort_keys=True, default=str).encode(),
+        ).hexdigest()
+        if self._hashes.get(idx) == digest:
+            return False
+        self._hashes[idx] = digest
+        self._schedules[idx] = ThermostatSchedule.from_payload(payload)
+        return True
+
+    def get(self, idx: Any) -> ThermostatSchedule | None:
+        """Return the schedule of a unit."""
+        return self._schedules.get(idx)
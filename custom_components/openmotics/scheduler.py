@@ -0,0 +1,134 @@
+"""Spread the refreshes of all OpenMotics entries over time.
+
+Every entry polls its gateway (or the cloud) at the same interval. With a
+few gateways set up at once, the refreshes would start on the same tick and
+stay together forever. The scheduler, shared by all entries, lets them
+start at least `REFRESH_SPACING` apart and only a few run at the same time,
+which keeps them staggered after the first round.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import callback
+
+from .const import DATA_SCHEDULER
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from homeassistant.core import HomeAssistant
+
+# Seconds between the start of two refreshes
+REFRESH_SPACING = 0.5
+# Refreshes running at the same time
+MAX_CONCURRENT_REFRESHES = 2
+# Failed refreshes in a row before a gateway is reported unreachable
+UNREACHABLE_AFTER = 3
+
+
+class GatewayHealth:
+    """Outcome of the recent refreshes of one gateway."""
+
+    __slots__ = (
+        "refreshes",
+        "failures",
+        "consecutive_failures",
+        "last_success",
+        "last_error",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the health."""
+        self.refreshes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_success: float | None = None
+        self.last_error: str | None = None
+
+    @property
+    def reachable(self) -> bool:
+        """Return False if the last refreshes all failed."""
+        return self.consecutive_failures < UNREACHABLE_AFTER
+
+    def record_success(self) -> None:
+        """Record a successful refresh."""
+        self.refreshes += 1
+        self.consecutive_failures = 0
+        self.last_success = time.time()
+
+    def record_failure(self, err: Exception) -> None:
+        """Record a failed refresh."""
+        self.refreshes += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = repr(err)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the health for the diagnostics."""
+        return {
+            "reachable": self.reachable,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+        }
+
+
+class RefreshScheduler:
+    """Let the refreshes of all entries start apart and limit how many run."""
+
+    def __init__(
+        self,
+        *,
+        spacing: float = REFRESH_SPACING,
+        limit: int = MAX_CONCURRENT_REFRESHES,
+    ) -> None:
+        """Initialize the scheduler."""
+        self._spacing = spacing
+        self._semaphore = asyncio.Semaphore(limit)
+        self._next_start = 0.0
+        self.waiting = 0
+        self.delayed = 0
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[None]:
+        """Wait for the turn of a refresh, then run it."""
+        now = time.monotonic()
+        # Reserve the first free start time, the next refresh comes after it
+        start = max(now, self._next_start)
+        self._next_start = start + self._spacing
+        self.waiting += 1
+        waiting = True
+        try:
+            if start > now:
+                self.delayed += 1
+                await asyncio.sleep(start - now)
+            async with self._semaphore:
+                self.waiting -= 1
+                waiting = False
+                yield
+        finally:
+            if waiting:
+                # Cancelled before its turn
+                self.waiting -= 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the scheduler for the diagnostics."""
+        return {
+            "spacing": self._spacing,
+            "waiting": self.waiting,
+            "delayed": self.delayed,
+        }
+
+
+@callback
+def async_get_scheduler(hass: HomeAssistant) -> RefreshScheduler:
+    """Return the scheduler shared by all entries."""
+    if (scheduler := hass.data.get(DATA_SCHEDULER)) is None:
+        scheduler = hass.data[DATA_SCHEDULER] = RefreshScheduler()
+    return scheduler
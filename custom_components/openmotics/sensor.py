@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any
 
 from homeassistant.components.sensor import (
@@ -15,12 +14,17 @@ from homeassistant.const import (
     UnitOfElectricCurrent,
     UnitOfElectricPotential,
     UnitOfFrequency,
+    UnitOfInformation,
     UnitOfPower,
     UnitOfTemperature,
+    UnitOfTime,
 )
+from homeassistant.helpers.entity import DeviceInfo, EntityCategory
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN, NOT_IN_USE
-from .entity import OpenMoticsDevice
+from .breaker import STATES
+from .const import DOMAIN
+from .entity import OpenMoticsDevice, async_setup_discovery
 
 if TYPE_CHECKING:
     from homeassistant.config_entries import ConfigEntry
@@ -42,37 +46,51 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up Sensors for OpenMotics Controller."""
-    entities = []
-
     coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    for index, om_sensor in enumerate(coordinator.data["sensors"]):
-        if om_sensor.name is None or not om_sensor.name or om_sensor.name == NOT_IN_USE:
-            continue
-
+    def create_sensors(index: int, om_sensor: Any) -> list[SensorEntity]:
         if om_sensor.physical_quantity == "temperature":
-            entities.append(OpenMoticsTemperature(coordinator, index, om_sensor))
-
+            return [OpenMoticsTemperature(coordinator, index, om_sensor)]
         if om_sensor.physical_quantity == "humidity":
-            entities.append(OpenMoticsHumidity(coordinator, index, om_sensor))
-
+            return [OpenMoticsHumidity(coordinator, index, om_sensor)]
         if om_sensor.physical_quantity == "brightness":
-            entities.append(OpenMoticsBrightness(coordinator, index, om_sensor))
-
-    for index, om_sensor in enumerate(coordinator.data["energysensors"]):
-        if om_sensor.name is None or not om_sensor.name or om_sensor.name == NOT_IN_USE:
-            continue
-
-        entities.append(OpenMoticsVoltage(coordinator, index, om_sensor))
-        entities.append(OpenMoticsFrequency(coordinator, index, om_sensor))
-        entities.append(OpenMoticsCurrent(coordinator, index, om_sensor))
-        entities.append(OpenMoticsPower(coordinator, index, om_sensor))
-
-    if not entities:
-        _LOGGER.info("No OpenMotics sensors added")
-        return
-
-    async_add_entities(entities)
+            return [OpenMoticsBrightness(coordinator, index, om_sensor)]
+        return []
+
+    def create_energy_sensors(index: int, om_sensor: Any) -> list[SensorEntity]:
+        return [
+            OpenMoticsVoltage(coordinator, index, om_sensor),
+            OpenMoticsFrequency(coordinator, index, om_sensor),
+            OpenMoticsCurrent(coordinator, index, om_sensor),
+            OpenMoticsPower(coordinator, index, om_sensor),
+        ]
+
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "sensors",
+        create_sensors,
+    )
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "energysensors",
+        create_energy_sensors,
+    )
+    async_add_entities(
+        [
+            OpenMoticsConnection(coordinator),
+            OpenMoticsRefreshDuration(coordinator),
+            OpenMoticsRequestLatency(coordinator),
+            OpenMoticsRequestFailures(coordinator),
+            OpenMoticsReceived(coordinator),
+            OpenMoticsCommandLatency(coordinator),
+        ]
+    )
 
 
 class OpenMoticsSensor(OpenMoticsDevice, SensorEntity):
@@ -80,14 +98,18 @@ class OpenMoticsSensor(OpenMoticsDevice, SensorEntity):
 
     coordinator: OpenMoticsDataUpdateCoordinator
 
+    _collection = "sensors"
+
     def __init__(
         self,
         coordinator: OpenMoticsDataUpdateCoordinator,
         index: int,
         device: dict[str, Any],
+        *,
+        idx: Any = None,
     ) -> None:
         """Initialize the light."""
-        super().__init__(coordinator, index, device, "sensor")
+        super().__init__(coordinator, index, device, "sensor", idx=idx)
 
         self._state = None
 
@@ -101,11 +123,7 @@ class OpenMoticsTemperature(OpenMoticsSensor):
     @property
     def native_value(self) -> float | None:
         """Return % chance the aurora is visible."""
-        try:
-            self._device = self.coordinator.data["sensors"][self.index]
-            return self._device.status.temperature
-        except (AttributeError, KeyError):
-            return None
+        return self.status.temperature
 
 
 class OpenMoticsHumidity(OpenMoticsSensor):
@@ -117,11 +135,7 @@ class OpenMoticsHumidity(OpenMoticsSensor):
     @property
     def native_value(self) -> float | None:
         """Return % chance the aurora is visible."""
-        try:
-            self._device = self.coordinator.data["sensors"][self.index]
-            return self._device.status.humidity
-        except (AttributeError, KeyError):
-            return None
+        return self.status.humidity
 
 
 class OpenMoticsBrightness(OpenMoticsSensor):
@@ -135,25 +149,13 @@ class OpenMoticsBrightness(OpenMoticsSensor):
     @property
     def native_value(self) -> float | None:
         """Return % chance the aurora is visible."""
-        try:
-            self._device = self.coordinator.data["sensors"][self.index]
-            return self._device.status.brightness
-        except (AttributeError, KeyError):
-            return None
+        return self.status.brightness
 
 
 class OpenMoticsEnergySensor(OpenMoticsSensor):
     """Representation of a OpenMotics energy sensor."""
 
-    @dataclass
-    class WrappedDevice:
-        """Representation of a OpenMotics energy sensor."""
-
-        idx: int
-        local_id: int
-        name: str
-        device: dict[str, Any]
-
+    _collection = "energysensors"
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_device_class: SensorDeviceClass
 
@@ -164,16 +166,12 @@ class OpenMoticsEnergySensor(OpenMoticsSensor):
         device: dict[str, Any],
     ) -> None:
         """Representation of a OpenMotics energy sensor."""
-        self._energy_index = index
+        # Every energy sensor yields four entities, one per device class.
         super().__init__(
             coordinator,
             index,
-            OpenMoticsEnergySensor.WrappedDevice(
-                f"energy-{device.idx}-{self.device_class}",
-                device.idx,
-                device.name,
-                device,
-            ),
+            device,
+            idx=f"energy-{device.idx}-{self.device_class}",
         )
 
 
@@ -187,11 +185,7 @@ class OpenMoticsVoltage(OpenMoticsEnergySensor):
     @property
     def native_value(self) -> float | None:
         """Return % chance the aurora is visible."""
-        try:
-            self._device = self.coordinator.data["energysensors"][self.index]
-            return self._device.status.voltage
-        except (AttributeError, KeyError):
-            return None
+        return self.status.voltage
 
 
 class OpenMoticsFrequency(OpenMoticsEnergySensor):
@@ -204,11 +198,7 @@ class OpenMoticsFrequency(OpenMoticsEnergySensor):
     @property
     def native_value(self) -> float | None:
         """Return % chance the aurora is visible."""
-        try:
-            self._device = self.coordinator.data["energysensors"][self.index]
-            return self._device.status.frequency
-        except (AttributeError, KeyError):
-            return None
+        return self.status.frequency
 
 
 class OpenMoticsCurrent(OpenMoticsEnergySensor):
@@ -221,11 +211,7 @@ class OpenMoticsCurrent(OpenMoticsEnergySensor):
     @property
     def native_value(self) -> float | None:
         """Return % chance the aurora is visible."""
-        try:
-            self._device = self.coordinator.data["energysensors"][self.index]
-            return self._device.status.current
-        except (AttributeError, KeyError):
-            return None
+        return self.status.current
 
 
 class OpenMoticsPower(OpenMoticsEnergySensor):
@@ -238,8 +224,200 @@ class OpenMoticsPower(OpenMoticsEnergySensor):
     @property
     def native_value(self) -> float | None:
         """Return % chance the aurora is visible."""
-        try:
-            self._device = self.coordinator.data["energysensors"][self.index]
-            return self._device.status.power
-        except (AttributeError, KeyError):
+        return self.status.power
+
+
+class OpenMoticsDiagnosticSensor(CoordinatorEntity, SensorEntity):
+    """Sensor about the integration itself, on the installation device."""
+
+    coordinator: OpenMoticsDataUpdateCoordinator
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(
+        self,
+        coordinator: OpenMoticsDataUpdateCoordinator,
+        key: str,
+        name: str,
+    ) -> None:
+        """Initialize the diagnostic sensor."""
+        super().__init__(coordinator=coordinator)
+        self._attr_name = f"OpenMotics {name}"
+        self._attr_unique_id = f"{coordinator.install_id}-{key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, str(coordinator.install_id))},
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Update the sensor after every refresh, also the unchanged ones."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_diagnostic_listener(
+                self._handle_coordinator_update,
+            ),
+        )
+
+
+class OpenMoticsConnection(OpenMoticsDiagnosticSensor):
+    """State of the circuit breaker of the connection to the installation."""
+
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = STATES
+    _attr_icon = "mdi:lan-connect"
+
+    def __init__(self, coordinator: OpenMoticsDataUpdateCoordinator) -> None:
+        """Initialize the connection sensor."""
+        super().__init__(coordinator, "connection", "connection")
+
+    @property
+    def available(self) -> bool:
+        """Return True, the sensor reports the outages itself."""
+        return True
+
+    @property
+    def native_value(self) -> str:
+        """Return closed, half_open or open."""
+        return self.coordinator.breaker.state
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the failures and when the next retry is."""
+        attributes = self.coordinator.breaker.as_dict()
+        del attributes["state"]
+        if (transport := getattr(self.coordinator, "transport", None)) is not None:
+            attributes["gateway"] = transport.local_breaker.state
+        return attributes
+
+
+class OpenMoticsMetricSensor(OpenMoticsDiagnosticSensor):
+    """Measurement of the requests to the installation, disabled by default."""
+
+    _attr_entity_registry_enabled_default = False
+
+    @property
+    def available(self) -> bool:
+        """Return True, the metrics are kept during outages."""
+        return True
+
+
+class OpenMoticsRefreshDuration(OpenMoticsMetricSensor):
+    """Duration of the last refresh."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_icon = "mdi:timer-refresh-outline"
+
+    def __init__(self, coordinator: OpenMoticsDataUpdateCoordinator) -> None:
+        """Initialize the refresh duration sensor."""
+        super().__init__(coordinator, "refresh_duration", "refresh duration")
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the duration of the last refresh."""
+        if (seconds := self.coordinator.metrics.last_refresh) is None:
             return None
+        return round(seconds * 1000, 1)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the percentiles of the refreshes."""
+        return self.coordinator.metrics.refresh.as_dict()
+
+
+class OpenMoticsRequestLatency(OpenMoticsMetricSensor):
+    """95th percentile of the latency of the requests."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(self, coordinator: OpenMoticsDataUpdateCoordinator) -> None:
+        """Initialize the request latency sensor."""
+        super().__init__(coordinator, "request_latency", "request latency")
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the 95th percentile of all requests."""
+        return self.coordinator.metrics.latency.as_dict()["p95_ms"]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the 95th percentile of each endpoint."""
+        return {
+            name: endpoint.as_dict()["p95_ms"]
+            for name, endpoint in sorted(self.coordinator.metrics.endpoints.items())
+        }
+
+
+class OpenMoticsRequestFailures(OpenMoticsMetricSensor):
+    """Requests that failed or timed out."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_icon = "mdi:alert-circle-outline"
+
+    def __init__(self, coordinator: OpenMoticsDataUpdateCoordinator) -> None:
+        """Initialize the request failures sensor."""
+        super().__init__(coordinator, "request_failures", "request failures")
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of failed requests."""
+        metrics = self.coordinator.metrics
+        return metrics.errors + metrics.timeouts
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the errors and timeouts."""
+        metrics = self.coordinator.metrics
+        return {
+            "errors": metrics.errors,
+            "timeouts": metrics.timeouts,
+            "failing_endpoints": sorted(
+                name
+                for name, endpoint in metrics.endpoints.items()
+                if endpoint.errors or endpoint.timeouts
+            ),
+        }
+
+
+class OpenMoticsCommandLatency(OpenMoticsMetricSensor):
+    """95th percentile of the time from a service call to the confirmed state."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_icon = "mdi:timer-check-outline"
+
+    def __init__(self, coordinator: OpenMoticsDataUpdateCoordinator) -> None:
+        """Initialize the command latency sensor."""
+        super().__init__(coordinator, "command_latency", "command latency")
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the 95th percentile of all confirmed commands."""
+        return self.coordinator.tracer.total.as_dict()["p95_ms"]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the percentiles of the phases per platform."""
+        return self.coordinator.tracer.as_dict()["platforms"]
+
+
+class OpenMoticsReceived(OpenMoticsMetricSensor):
+    """Bytes received in the responses."""
+
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_icon = "mdi:download-network-outline"
+
+    def __init__(self, coordinator: OpenMoticsDataUpdateCoordinator) -> None:
+        """Initialize the received bytes sensor."""
+        super().__init__(coordinator, "received", "received")
+
+    @property
+    def native_value(self) -> int:
+        """Return the bytes received since the start."""
+        return self.coordinator.metrics.bytes
@@ -0,0 +1,238 @@
+"""Services acting on the rooms and floors of OpenMotics installations."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+import async_timeout
+import voluptuous as vol
+from homeassistant.components.cover import ATTR_POSITION
+from homeassistant.components.light import ATTR_BRIGHTNESS
+from homeassistant.const import Platform
+from homeassistant.core import SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_platform
+from homeassistant.helpers.service import async_extract_entity_ids
+
+from .const import (
+    ATTR_ACTION,
+    ATTR_COUNT,
+    ATTR_DURATION,
+    ATTR_FLOOR,
+    ATTR_PHASE,
+    ATTR_ROOM,
+    DOMAIN,
+    PROFILE_PHASES,
+    SERVICE_FLOOR_SET_SHUTTERS,
+    SERVICE_PROFILE,
+    SERVICE_ROOM_OFF,
+    SERVICE_TURN_ON_FOR,
+    SHUTTER_ACTIONS,
+)
+from .entity import TIMER_DURATION
+from .exceptions import UnknownLocation
+from .profiler import async_get_profiler
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse
+
+    from .coordinator import OpenMoticsDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+ROOM_OFF_SCHEMA = vol.Schema({vol.Required(ATTR_ROOM): cv.string})
+
+FLOOR_SET_SHUTTERS_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_FLOOR): cv.string,
+            vol.Optional(ATTR_ACTION): vol.In(SHUTTER_ACTIONS),
+            vol.Optional(ATTR_POSITION): vol.All(
+                vol.Coerce(int),
+                vol.Range(min=0, max=100),
+            ),
+        },
+    ),
+    cv.has_at_least_one_key(ATTR_ACTION, ATTR_POSITION),
+)
+
+# The outputs and lights of both platforms share one turn_on_for service
+TIMER_PLATFORMS = (Platform.LIGHT, Platform.SWITCH)
+
+TURN_ON_FOR_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Required(ATTR_DURATION): TIMER_DURATION,
+        vol.Optional(ATTR_BRIGHTNESS): vol.All(
+            vol.Coerce(int),
+            vol.Range(min=0, max=255),
+        ),
+    },
+)
+
+# Seconds the profile service waits for the report when asked for it
+PROFILE_TIMEOUT = 900
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_PHASE, default=PROFILE_PHASES[0]): vol.In(PROFILE_PHASES),
+        vol.Optional(ATTR_COUNT, default=5): vol.All(
+            vol.Coerce(int),
+            vol.Range(min=1, max=100),
+        ),
+    },
+)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services, once for all entries."""
+    if hass.services.has_service(DOMAIN, SERVICE_ROOM_OFF):
+        return
+
+    async def async_room_off(call: ServiceCall) -> None:
+        """Turn off the outputs and lights in a room."""
+        found = False
+        for coordinator in _coordinators(hass):
+            locations = coordinator.locations
+            if (room_id := locations.find_room(call.data[ATTR_ROOM])) is None:
+                continue
+            found = True
+            omclient = coordinator.omclient
+            await _async_send_room(
+                coordinator,
+                [
+                    *(
+                        (omclient.outputs.turn_off, idx)
+                        for idx in locations.devices(room_id, "outputs")
+                    ),
+                    *(
+                        (omclient.lights.turn_off, idx)
+                        for idx in locations.devices(room_id, "lights")
+                    ),
+                ],
+            )
+            await coordinator.async_refresh_collections("outputs", "lights")
+        if not found:
+            raise UnknownLocation(f"Unknown room: {call.data[ATTR_ROOM]}")
+
+    async def async_floor_set_shutters(call: ServiceCall) -> None:
+        """Move the shutters on a floor, room by room."""
+        found = False
+        for coordinator in _coordinators(hass):
+            locations = coordinator.locations
+            if not (rooms := locations.rooms_on_floor(call.data[ATTR_FLOOR])):
+                continue
+            found = True
+            shutters = coordinator.omclient.shutters
+            if (position := call.data.get(ATTR_POSITION)) is not None:
+                method: Callable[..., Awaitable] = shutters.change_position
+                # OpenMotics counts from open (0) to closed (100), like the cover
+                args: tuple[Any, ...] = (100 - position,)
+            else:
+                method = {
+                    "open": shutters.move_up,
+                    "close": shutters.move_down,
+                    "stop": shutters.stop,
+                }[call.data[ATTR_ACTION]]
+                args = ()
+            for room_id in rooms:
+                await _async_send_room(
+                    coordinator,
+                    [
+                        (method, idx, *args)
+                        for idx in locations.devices(room_id, "shutters")
+                    ],
+                )
+            await coordinator.async_refresh_collections("shutters")
+        if not found:
+            raise UnknownLocation(f"Unknown floor: {call.data[ATTR_FLOOR]}")
+
+    async def async_turn_on_for(call: ServiceCall) -> None:
+        """Turn on lights and outputs, the gateway turns them off again."""
+        entity_ids = await async_extract_entity_ids(hass, call)
+        await asyncio.gather(
+            *(
+                entity.async_turn_on_for(
+                    call.data[ATTR_DURATION],
+                    call.data.get(ATTR_BRIGHTNESS),
+                )
+                for platform in entity_platform.async_get_platforms(hass, DOMAIN)
+                if platform.domain in TIMER_PLATFORMS
+                for entity_id, entity in platform.entities.items()
+                if entity_id in entity_ids
+            ),
+        )
+
+    async def async_profile(call: ServiceCall) -> ServiceResponse:
+        """Profile the next refreshes or platform setups.
+
+        When asked for a response, waits for the profile and returns its
+        hot spots.
+        """
+        report = async_get_profiler(hass).async_arm(
+            call.data[ATTR_PHASE],
+            call.data[ATTR_COUNT],
+        )
+        if not call.return_response:
+            return None
+        try:
+            async with async_timeout.timeout(PROFILE_TIMEOUT):
+                return await asyncio.shield(report)
+        except asyncio.TimeoutError as err:
+            raise HomeAssistantError(
+                f"No {call.data[ATTR_PHASE]} was profiled within {PROFILE_TIMEOUT}s",
+            ) from err
+        except asyncio.CancelledError as err:
+            if not report.cancelled():
+                raise
+            raise HomeAssistantError("Profiling was restarted") from err
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_ROOM_OFF,
+        async_room_off,
+        schema=ROOM_OFF_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_FLOOR_SET_SHUTTERS,
+        async_floor_set_shutters,
+        schema=FLOOR_SET_SHUTTERS_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_TURN_ON_FOR,
+        async_turn_on_for,
+        schema=TURN_ON_FOR_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def _coordinators(hass: HomeAssistant) -> list[OpenMoticsDataUpdateCoordinator]:
+    """Return the coordinators of all loaded entries."""
+    return list(hass.data.get(DOMAIN, {}).values())
+
+
+async def _async_send_room(
+    coordinator: OpenMoticsDataUpdateCoordinator,
+    commands: list[tuple[Any, ...]],
+) -> None:
+    """Send the commands for one room as one batch."""
+    if not commands:
+        return
+    results = await asyncio.gather(
+        *(coordinator.batcher.async_call(*command) for command in commands),
+        return_exceptions=True,
+    )
+    for command, result in zip(commands, results):
+        if isinstance(result, Exception):
+            _LOGGER.warning("Command for %s failed: %s", command[1], result)
@@ -0,0 +1,72 @@
+"""Give the event loop back regularly while processing large refreshes.
+
+Copying the status of thousands of devices into the store (and hashing
+their schedules) can hold the event loop for a long time on a large
+installation. The processing checks in with a slicer every few devices,
+which yields to the loop once the current slice took longer than its
+budget, and keeps track of how long the loop was held.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+# Seconds the loop may be held before giving it back
+SLICE_BUDGET = 0.004
+
+
+class LoopSlicer:
+    """Cut long processing into slices and measure them."""
+
+    def __init__(self, budget: float = SLICE_BUDGET) -> None:
+        """Initialize the slicer."""
+        self._budget = budget
+        self._slice_started: float | None = None
+        # Of the last refresh: time the loop was held, the longest slice and
+        # how often the loop was given back
+        self.blocked = 0.0
+        self.longest = 0.0
+        self.yields = 0
+        # Longest slice since the start
+        self.worst = 0.0
+
+    def reset(self) -> None:
+        """Start measuring a new refresh."""
+        self.blocked = 0.0
+        self.longest = 0.0
+        self.yields = 0
+
+    def begin(self) -> None:
+        """Start a slice."""
+        self._slice_started = time.monotonic()
+
+    def end(self) -> None:
+        """End the current slice."""
+        if self._slice_started is None:
+            return
+        elapsed = time.monotonic() - self._slice_started
+        self._slice_started = None
+        self.blocked += elapsed
+        self.longest = max(self.longest, elapsed)
+        self.worst = max(self.worst, elapsed)
+
+    async def async_checkpoint(self) -> None:
+        """Give the loop back if the slice used up its budget."""
+        if self._slice_started is None:
+            return
+        if time.monotonic() - self._slice_started < self._budget:
+            return
+        self.end()
+        self.yields += 1
+        await asyncio.sleep(0)
+        self.begin()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the measurements for the diagnostics."""
+        return {
+            "blocked_ms": round(self.blocked * 1000, 1),
+            "longest_slice_ms": round(self.longest * 1000, 1),
+            "yields": self.yields,
+            "worst_slice_ms": round(self.worst * 1000, 1),
+        }
@@ -0,0 +1,199 @@
+"""Compact status store for the OpenMotics integration.
+
+The pyhaopenmotics models carry a lot of metadata (capabilities, location,
+names, ...) that never changes between two refreshes. Entities only need the
+status fields, so those are copied into typed arrays that are indexed by a
+device slot and updated in place on every refresh. The entities read from
+the store, never from the models, which are left as the client returned them.
+"""
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Any
+
+# Typecodes used for the status columns.
+#   "b" boolean (-1 is unknown)
+#   "h" small integer (-1 is unknown)
+#   "d" float (nan is unknown)
+#   "s" short string, stored as an index in a per column table (-1 is unknown)
+STATUS_FIELDS: dict[str, tuple[tuple[str, str], ...]] = {
+    "outputs": (("on", "b"), ("value", "h")),
+    "lights": (("on", "b"), ("value", "h")),
+    "inputs": (("on", "b"),),
+    "shutters": (("state", "s"), ("position", "h"), ("last_change", "d")),
+    "sensors": (
+        ("temperature", "d"),
+        ("humidity", "d"),
+        ("brightness", "d"),
+    ),
+    "energysensors": (
+        ("voltage", "d"),
+        ("frequency", "d"),
+        ("current", "d"),
+        ("power", "d"),
+    ),
+    "thermostatgroups": (("mode", "s"),),
+    "thermostatunits": (
+        ("state", "s"),
+        ("mode", "s"),
+        ("active_preset", "s"),
+        ("current_temperature", "d"),
+        ("current_setpoint", "d"),
+    ),
+}
+
+_UNKNOWN = {"b": -1, "h": -1, "d": math.nan, "s": -1}
+_ARRAY_TYPE = {"b": "b", "h": "h", "d": "d", "s": "h"}
+
+
+class CollectionStatus:
+    """Status columns of one collection (outputs, shutters, ...)."""
+
+    __slots__ = ("fields", "columns", "slots", "_strings")
+
+    def __init__(self, fields: tuple[tuple[str, str], ...]) -> None:
+        """Initialize the columns."""
+        self.fields = dict(fields)
+        self.columns = {name: array(_ARRAY_TYPE[code]) for name, code in fields}
+        self.slots: dict[Any, int] = {}
+        self._strings: dict[str, list[str]] = {
+            name: [] for name, code in fields if code == "s"
+        }
+
+    def __len__(self) -> int:
+        """Return the number of allocated slots."""
+        return len(self.slots)
+
+    def slot(self, idx: Any) -> int:
+        """Return the slot of a device, allocate one if it is new."""
+        if (slot := self.slots.get(idx)) is None:
+            slot = len(self.slots)
+            self.slots[idx] = slot
+            for name, code in self.fields.items():
+                self.columns[name].append(_UNKNOWN[code])
+        return slot
+
+    def update(self, devices: list[Any]) -> bool:
+        """Copy the status of the devices into the columns.
+
+        Returns True if any value changed, or a device is new.
+        """
+        changed = False
+        for device in devices:
+            known = len(self.slots)
+            slot = self.slot(device.idx)
+            changed |= slot == known
+            status = getattr(device, "status", None)
+            for name in self.fields:
+                changed |= self.set(slot, name, getattr(status, name, None))
+        return changed
+
+    def get(self, slot: int, name: str) -> Any:
+        """Return a status value, None when unknown."""
+        code = self.fields[name]
+        raw = self.columns[name][slot]
+        if code == "d":
+            return None if math.isnan(raw) else raw
+        if raw == -1:
+            return None
+        if code == "b":
+            return bool(raw)
+        if code == "s":
+            return self._strings[name][raw]
+        return raw
+
+    def as_dict(self) -> dict[Any, dict[str, Any]]:
+        """Return the status of every device, for the diagnostics."""
+        return {
+            idx: {name: self.get(slot, name) for name in self.fields}
+            for idx, slot in self.slots.items()
+        }
+
+    def snapshot(self, slot: int) -> tuple[Any, ...]:
+        """Return the raw values of a device, to compare them later on."""
+        return tuple(column[slot] for column in self.columns.values())
+
+    def encode(self, name: str, value: Any) -> Any:
+        """Return the raw value stored for a status value."""
+        code = self.fields[name]
+        if value is None:
+            return _UNKNOWN[code]
+        if code == "s":
+            table = self._strings[name]
+            try:
+                return table.index(value)
+            except ValueError:
+                table.append(value)
+                return len(table) - 1
+        if code == "d":
+            # Timestamps (last_change) are stored as seconds since the epoch
+            return value.timestamp() if hasattr(value, "timestamp") else float(value)
+        return int(value)
+
+    def set(self, slot: int, name: str, value: Any) -> bool:
+        """Store a status value, None marks it unknown, return True if changed."""
+        raw = self.encode(name, value)
+        column = self.columns[name]
+        previous = column[slot]
+        column[slot] = raw
+        # nan (unknown float) never equals itself
+        return previous != raw and not (previous != previous and raw != raw)
+
+
+class StatusView:
+    """Light-weight view on the status of a single device.
+
+    Reading an attribute returns the value from the store, setting one
+    writes it back (used for optimistic updates after a command).
+    """
+
+    __slots__ = ("_collection", "_slot")
+
+    def __init__(self, collection: CollectionStatus, slot: int) -> None:
+        """Initialize the view."""
+        object.__setattr__(self, "_collection", collection)
+        object.__setattr__(self, "_slot", slot)
+
+    def __getattr__(self, name: str) -> Any:
+        """Return a status value from the store."""
+        try:
+            return self._collection.get(self._slot, name)
+        except KeyError as err:
+            raise AttributeError(name) from err
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Write a status value into the store."""
+        try:
+            self._collection.set(self._slot, name, value)
+        except KeyError as err:
+            raise AttributeError(name) from err
+
+
+class OpenMoticsStatusStore:
+    """Columnar store with the status of every OpenMotics device."""
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self.collections: dict[str, CollectionStatus] = {
+            name: CollectionStatus(fields) for name, fields in STATUS_FIELDS.items()
+        }
+
+    def update(self, name: str, devices: list[Any]) -> bool:
+        """Update the status of a collection in place, return True if it changed."""
+        if (collection := self.collections.get(name)) is not None:
+            return collection.update(devices)
+        return False
+
+    def view(self, name: str, idx: Any) -> StatusView:
+        """Return a view on the status of a device."""
+        collection = self.collections[name]
+        return StatusView(collection, collection.slot(idx))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the status of the devices of every collection."""
+        return {
+            name: collection.as_dict()
+            for name, collection in self.collections.items()
+            if len(collection)
+        }
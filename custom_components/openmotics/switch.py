@@ -6,10 +6,12 @@ from typing import TYPE_CHECKING, Any
 
 from homeassistant.components.switch import SwitchEntity
 
-from .const import DOMAIN, NOT_IN_USE
-from .entity import OpenMoticsDevice
+from .const import DOMAIN
+from .entity import OpenMoticsOutput, async_setup_discovery
 
 if TYPE_CHECKING:
+    from datetime import timedelta
+
     from homeassistant.config_entries import ConfigEntry
     from homeassistant.core import HomeAssistant
     from homeassistant.helpers.entity_platform import AddEntitiesCallback
@@ -26,29 +28,30 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up Switches for OpenMotics Controller."""
-    entities = []
-
     coordinator: OpenMoticsDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    for index, om_outlet in enumerate(coordinator.data["outputs"]):
-        if om_outlet.name is None or not om_outlet.name or om_outlet.name == NOT_IN_USE:
-            continue
-
+    def create_switches(index: int, om_outlet: Any) -> list[SwitchEntity]:
         # Outputs can contain outlets and lights, so filter out only the outlets
         # (aka switches)
-        if om_outlet.output_type != "LIGHT":
-            entities.append(OpenMoticsSwitch(coordinator, index, om_outlet))
+        if om_outlet.output_type == "LIGHT":
+            return []
+        return [OpenMoticsSwitch(coordinator, index, om_outlet)]
 
-    if not entities:
-        _LOGGER.info("No OpenMotics Outlets added")
-        return
+    async_setup_discovery(
+        hass,
+        entry,
+        coordinator,
+        async_add_entities,
+        "outputs",
+        create_switches,
+    )
 
-    async_add_entities(entities)
 
-
-class OpenMoticsSwitch(OpenMoticsDevice, SwitchEntity):
+class OpenMoticsSwitch(OpenMoticsOutput, SwitchEntity):
     """Representation of a OpenMotics switch."""
 
+    _collection = "outputs"
+
     def __init__(
         self,
         coordinator: OpenMoticsDataUpdateCoordinator,
@@ -62,21 +65,35 @@ class OpenMoticsSwitch(OpenMoticsDevice, SwitchEntity):
     def is_on(self) -> Any:
         """Return true if device is on."""
         try:
-            self._device = self.coordinator.data["outputs"][self.index]
-            return self._device.status.on
+            return self.status.on
         except (AttributeError, KeyError):
             return None
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn device off."""
+        self._async_cancel_timer()
         result = await self.coordinator.omclient.outputs.turn_on(
             self.device_id,
             100,  # value is required but an outlet goes only on/off so we set it to 100
         )
         await self._update_state_from_result(result, True)
 
+    async def async_turn_on_for(
+        self,
+        duration: timedelta,
+        brightness: int | None = None,
+    ) -> None:
+        """Turn device on, the gateway turns it off after the duration.
+
+        The brightness is ignored, an outlet only goes on or off.
+        """
+        # value is required but an outlet goes only on/off so we set it to 100
+        result = await self._async_turn_on_for(duration, 100)
+        await self._update_state_from_result(result, True)
+
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn device off."""
+        self._async_cancel_timer()
         result = await self.coordinator.omclient.outputs.turn_off(
             self.device_id,
         )
@@ -84,6 +101,7 @@ class OpenMoticsSwitch(OpenMoticsDevice, SwitchEntity):
 
     async def async_toggle(self, **kwargs: Any) -> None:
         """Turn device off."""
+        self._async_cancel_timer()
         await self.coordinator.omclient.outputs.toggle(
             self.device_id,
         )
@@ -93,12 +111,12 @@ class OpenMoticsSwitch(OpenMoticsDevice, SwitchEntity):
     def icon(self) -> str | None:
         """Return the icon to use."""
         # Valve
-        if self._device.output_type == "VALVE":
+        if self.device.output_type == "VALVE":
             if self.is_on:
                 return "mdi:valve-open"
             return "mdi:valve-closed"
         # Fan / Ventilation.
-        if self._device.output_type == "VENTILATION":
+        if self.device.output_type == "VENTILATION":
             if self.is_on:
                 return "mdi:fan"
             return "mdi:fan-off"
@@ -106,7 +124,9 @@ class OpenMoticsSwitch(OpenMoticsDevice, SwitchEntity):
 
     async def _update_state_from_result(self, result: Any, state: bool) -> None:
         if isinstance(result, dict) and result.get("success") is True:
-            self._device.status.on = state
+            self._async_trace_sent()
+            self.status.on = state
+            self._async_trace_acknowledged(result)
             self.async_write_ha_state()
         else:
             _LOGGER.debug("Invalid result, refreshing all")
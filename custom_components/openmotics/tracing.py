@@ -0,0 +1,233 @@
+"""Trace commands from the service call to the state confirmed by a poll.
+
+A command goes through three phases: the service call reaches the entity,
+the gateway (or the cloud) acknowledges the command and the entity shows
+the new state right away, and a later poll reports that state. The status
+of the device is taken from the store when the command was sent and once
+the entity shows its state; the values the command changed are what a
+poll has to report to confirm it, or one of the other states the entity
+accepts (e.g. a shutter that moves). Commands queued by the journal are
+acknowledged when they are sent. The durations of the phases are kept
+per platform.
+"""
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any
+
+from .metrics import LatencyHistogram
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .store import OpenMoticsStatusStore
+
+# Seconds after which a command that no poll confirmed is given up
+CONFIRM_TIMEOUT = 300
+
+
+def _same(previous: Any, value: Any) -> bool:
+    """Return True if two raw values are equal, nan (unknown) equals itself."""
+    return previous == value or (previous != previous and value != value)
+
+
+class CommandTrace:
+    """A command of a device on its way to the gateway and back."""
+
+    __slots__ = (
+        "collection",
+        "slot",
+        "started",
+        "before",
+        "platform",
+        "acknowledged",
+        "expected",
+        "alternatives",
+    )
+
+    def __init__(
+        self,
+        collection: str,
+        slot: int,
+        before: tuple[Any, ...],
+        started: float,
+    ) -> None:
+        """Start tracing a command, from its service call on."""
+        self.collection = collection
+        self.slot = slot
+        self.started = started
+        self.before = before
+        self.platform = ""
+        self.acknowledged = 0.0
+        # Position and raw value of the status fields the command changed
+        self.expected: tuple[tuple[int, Any], ...] = ()
+        # Other status values that confirm the command as well
+        self.alternatives: tuple[tuple[tuple[int, Any], ...], ...] = ()
+
+    def confirmed_by(self, current: tuple[Any, ...]) -> bool:
+        """Return True if the status of the device confirms the command."""
+        return any(
+            all(_same(current[position], value) for position, value in expected)
+            for expected in (self.expected, *self.alternatives)
+        )
+
+
+class CommandPhases:
+    """Durations of the phases of the commands of a platform."""
+
+    __slots__ = ("acknowledged", "confirmed", "total", "unconfirmed")
+
+    def __init__(self) -> None:
+        """Initialize the histograms."""
+        # Service call to acknowledgement, acknowledgement to the poll
+        # confirming the state, and service call to confirmation
+        self.acknowledged = LatencyHistogram()
+        self.confirmed = LatencyHistogram()
+        self.total = LatencyHistogram()
+        self.unconfirmed = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the percentiles for the diagnostics."""
+        return {
+            "acknowledged": self.acknowledged.as_dict(),
+            "confirmed": self.confirmed.as_dict(),
+            "total": self.total.as_dict(),
+            "unconfirmed": self.unconfirmed,
+        }
+
+
+class CommandTracer:
+    """Correlate the phases of the commands of an entry."""
+
+    def __init__(
+        self,
+        store: OpenMoticsStatusStore,
+        timeout: float = CONFIRM_TIMEOUT,
+    ) -> None:
+        """Initialize the tracer."""
+        self._store = store
+        self._timeout = timeout
+        self.platforms: dict[str, CommandPhases] = {}
+        # All platforms together
+        self.total = LatencyHistogram()
+        # Acknowledged commands waiting for a poll, by collection and slot
+        self._pending: dict[str, dict[int, CommandTrace]] = {}
+        # Commands queued by the journal, waiting to be sent
+        self._queued: dict[str, dict[int, CommandTrace]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of commands waiting for a poll."""
+        return sum(len(pending) for pending in self._pending.values())
+
+    def start(
+        self,
+        collection: str,
+        idx: Any,
+        started: float | None = None,
+    ) -> CommandTrace:
+        """Start tracing a command that was sent, before the entity shows it.
+
+        `started` is when the service called the entity, now if unknown.
+        """
+        status = self._store.collections[collection]
+        slot = status.slot(idx)
+        return CommandTrace(
+            collection,
+            slot,
+            status.snapshot(slot),
+            time.monotonic() if started is None else started,
+        )
+
+    def acknowledged(
+        self,
+        trace: CommandTrace,
+        platform: str,
+        *,
+        queued: bool = False,
+        alternatives: Iterable[dict[str, Any]] = (),
+    ) -> None:
+        """Record the acknowledgement, after the entity showed the new state.
+
+        The command of a queued trace is acknowledged once it is sent. A
+        poll reporting one of the alternatives also confirms the command.
+        """
+        trace.platform = platform
+        status = self._store.collections[trace.collection]
+        after = status.snapshot(trace.slot)
+        trace.expected = tuple(
+            (position, value)
+            for position, (previous, value) in enumerate(zip(trace.before, after))
+            if not _same(previous, value)
+        )
+        positions = {name: position for position, name in enumerate(status.fields)}
+        trace.alternatives = tuple(
+            tuple(
+                (positions[name], status.encode(name, value))
+                for name, value in alternative.items()
+            )
+            for alternative in alternatives
+        )
+        # A newer command of the device replaces the one still waiting
+        if queued:
+            self._pending.get(trace.collection, {}).pop(trace.slot, None)
+            self._queued.setdefault(trace.collection, {})[trace.slot] = trace
+            return
+        self._queued.get(trace.collection, {}).pop(trace.slot, None)
+        self._acknowledge(trace)
+
+    def replayed(self, collection: str, idx: Any, sent: bool) -> None:
+        """Acknowledge a queued command once sent, give it up if it wasn't."""
+        if (status := self._store.collections.get(collection)) is None:
+            return
+        if (slot := status.slots.get(idx)) is None:
+            return
+        if (trace := self._queued.get(collection, {}).pop(slot, None)) is None:
+            return
+        if sent:
+            self._acknowledge(trace)
+        else:
+            self._phases(trace.platform).unconfirmed += 1
+
+    def _acknowledge(self, trace: CommandTrace) -> None:
+        """Record the acknowledgement and wait for a poll to confirm it."""
+        trace.acknowledged = time.monotonic()
+        self._phases(trace.platform).acknowledged.record(
+            trace.acknowledged - trace.started,
+        )
+        self._pending.setdefault(trace.collection, {})[trace.slot] = trace
+
+    def confirm(self, collection: str) -> None:
+        """Confirm the commands whose state a poll of the collection reports."""
+        if not (pending := self._pending.get(collection)):
+            return
+        status = self._store.collections[collection]
+        now = time.monotonic()
+        for slot, trace in list(pending.items()):
+            if trace.confirmed_by(status.snapshot(slot)):
+                phases = self._phases(trace.platform)
+                phases.confirmed.record(now - trace.acknowledged)
+                phases.total.record(now - trace.started)
+                self.total.record(now - trace.started)
+            elif now - trace.acknowledged > self._timeout:
+                self._phases(trace.platform).unconfirmed += 1
+            else:
+                continue
+            del pending[slot]
+
+    def _phases(self, platform: str) -> CommandPhases:
+        """Return the phases of a platform."""
+        if (phases := self.platforms.get(platform)) is None:
+            phases = self.platforms[platform] = CommandPhases()
+        return phases
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the phases per platform for the diagnostics."""
+        return {
+            "pending": len(self),
+            "queued": sum(len(queued) for queued in self._queued.values()),
+            "total": self.total.as_dict(),
+            "platforms": {
+                platform: phases.as_dict()
+                for platform, phases in sorted(self.platforms.items())
+            },
+        }
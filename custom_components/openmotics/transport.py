@@ -0,0 +1,293 @@
+"""Route the requests of a cloud installation over the LAN when possible.
+
+A cloud entry can be paired with the local gateway of the installation.
+Commands and the status polls then go to the gateway, which answers in tens
+of milliseconds instead of hundreds. The names, locations and the rest of
+the configuration keep coming from the cloud, which is also used whenever
+the gateway can't be reached, or a status poll overran its adaptive
+deadline.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+
+import async_timeout
+from pyhaopenmotics import OpenMoticsConnectionError, OpenMoticsError
+
+from .breaker import STATE_HALF_OPEN, CircuitBreaker
+from .deadline import CollectionDeadlines
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+_LOGGER = logging.getLogger(__name__)
+
+LOCAL = "local"
+CLOUD = "cloud"
+
+# Errors after which the gateway is considered unreachable for a while
+FAILOVER_ERRORS = (OpenMoticsConnectionError, asyncio.TimeoutError)
+# Seconds before the gateway is tried again after it failed, doubled after
+# every failed retry
+LOCAL_RETRY_DELAY = 60.0
+# Methods that read the configuration, always served by the cloud
+READ_METHODS = {"get_all", "get_by_id", "get_schedule"}
+# Weight of the last request in the average latency
+LATENCY_WEIGHT = 0.2
+
+
+class PathStats:
+    """Latency and failures of the requests over one path."""
+
+    __slots__ = ("requests", "failures", "latency", "last_error")
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self.requests = 0
+        self.failures = 0
+        self.latency: float | None = None
+        self.last_error: str | None = None
+
+    def record(self, started: float, error: Exception | None = None) -> None:
+        """Record a request that started at a monotonic time."""
+        self.requests += 1
+        if error is not None:
+            self.failures += 1
+            self.last_error = repr(error)
+            return
+        elapsed = time.monotonic() - started
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += LATENCY_WEIGHT * (elapsed - self.latency)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics for the diagnostics."""
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000),
+            "last_error": self.last_error,
+        }
+
+
+class LocalStatus:
+    """Status of a device polled from the gateway, with its cloud id."""
+
+    __slots__ = ("idx", "status")
+
+    def __init__(self, idx: Any, status: Any) -> None:
+        """Initialize the status."""
+        self.idx = idx
+        self.status = status
+
+
+def _resolve(client: Any, path: tuple[str, ...]) -> Any:
+    """Return the attribute of a client at a path, None if it lacks it."""
+    for attribute in path:
+        if (client := getattr(client, attribute, None)) is None:
+            return None
+    return client
+
+
+def _accepts(method: Any, *args: Any, **kwargs: Any) -> bool:
+    """Return True if a method can be called with the arguments."""
+    try:
+        inspect.signature(method).bind(*args, **kwargs)
+    except TypeError:
+        return False
+    return True
+
+
+class HybridTransport:
+    """Send requests over the gateway or the cloud and keep track of both."""
+
+    def __init__(
+        self,
+        cloud: Any,
+        local: Any,
+        local_ids: Callable[[str], dict[Any, Any]],
+        collections: dict[str, str],
+    ) -> None:
+        """Initialize the transport.
+
+        `local_ids` returns the gateway ids of the devices of a collection by
+        their cloud id, `collections` the controller of each collection.
+        """
+        self.cloud = cloud
+        self.local = local
+        self._local_ids = local_ids
+        self._collections = {
+            controller: collection for collection, controller in collections.items()
+        }
+        self.stats = {LOCAL: PathStats(), CLOUD: PathStats()}
+        # Status polls of the gateway that take too long fail over as well
+        self.local_deadlines = CollectionDeadlines()
+        # Any failure sends the requests to the cloud for a while
+        self.local_breaker = CircuitBreaker(
+            "OpenMotics gateway",
+            threshold=1,
+            base=LOCAL_RETRY_DELAY,
+        )
+
+    @property
+    def local_available(self) -> bool:
+        """Return True if the gateway should be used."""
+        return self.local_breaker.allows_request
+
+    def _local_failed(self, started: float, err: Exception) -> None:
+        """Fall back to the cloud for a while."""
+        self.stats[LOCAL].record(started, err)
+        self.local_breaker.record_failure(err)
+
+    def _local_succeeded(self, started: float) -> None:
+        """Keep using the gateway."""
+        self.stats[LOCAL].record(started)
+        self.local_breaker.record_success()
+
+    async def async_probe_local(self) -> bool:
+        """Check the gateway is back with a cheap request, if it failed before."""
+        if self.local_breaker.state != STATE_HALF_OPEN:
+            return self.local_available
+        if (exec_action := _resolve(self.local, ("exec_action",))) is None:
+            return True
+        started = time.monotonic()
+        try:
+            await exec_action("get_version")
+        except (*FAILOVER_ERRORS, OpenMoticsError) as err:
+            self._local_failed(started, err)
+            return False
+        self._local_succeeded(started)
+        return True
+
+    async def async_call(
+        self,
+        path: tuple[str, ...],
+        method: str,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """Call a method of a controller, over the gateway when possible."""
+        collection = self._collections.get(".".join(path))
+        if (
+            method not in READ_METHODS
+            and collection is not None
+            and args
+            and self.local_available
+            and (local_id := self._local_ids(collection).get(args[0])) is not None
+            and (local_method := _resolve(self.local, (*path, method))) is not None
+        ):
+            if not _accepts(local_method, local_id, *args[1:], **kwargs):
+                # The gateway client lacks an argument, the cloud may have it
+                _LOGGER.debug(
+                    "Sending %s.%s over the cloud, the gateway client lacks %s",
+                    ".".join(path),
+                    method,
+                    ", ".join(kwargs) or "an argument",
+                )
+            else:
+                started = time.monotonic()
+                try:
+                    result = await local_method(local_id, *args[1:], **kwargs)
+                except FAILOVER_ERRORS as err:
+                    self._local_failed(started, err)
+                else:
+                    self._local_succeeded(started)
+                    return result
+
+        started = time.monotonic()
+        try:
+            result = await _resolve(self.cloud, (*path, method))(*args, **kwargs)
+        except Exception as err:
+            self.stats[CLOUD].record(started, err)
+            raise
+        self.stats[CLOUD].record(started)
+        return result
+
+    async def async_local_status(self, collection: str) -> list[LocalStatus] | None:
+        """Poll the status of a collection from the gateway.
+
+        Returns None if the gateway does not serve the collection, raises
+        one of FAILOVER_ERRORS if it can't be reached, refused the poll (e.g.
+        its credentials are wrong) or the poll overran its deadline.
+        """
+        controller = self._collection_controller(collection)
+        if (get_all := _resolve(self.local, (*controller, "get_all"))) is None:
+            return None
+        deadline = self.local_deadlines.deadline(collection)
+        started = time.monotonic()
+        try:
+            async with async_timeout.timeout(deadline):
+                devices = await get_all()
+        except FAILOVER_ERRORS as err:
+            if isinstance(err, asyncio.TimeoutError):
+                _LOGGER.debug(
+                    "Polling %s from the gateway took longer than %.1fs",
+                    collection,
+                    deadline,
+                )
+                self.local_deadlines.record_timeout(collection)
+            self._local_failed(started, err)
+            raise
+        except OpenMoticsError as err:
+            # The cloud serves the status until the gateway is tried again
+            self._local_failed(started, err)
+            raise OpenMoticsConnectionError(
+                f"The gateway refused to poll {collection}: {err}",
+            ) from err
+        self.local_deadlines.record(collection, time.monotonic() - started)
+        self._local_succeeded(started)
+
+        cloud_ids = {
+            local_id: idx for idx, local_id in self._local_ids(collection).items()
+        }
+        return [
+            LocalStatus(cloud_ids[device.idx], device.status)
+            for device in devices
+            if device.idx in cloud_ids
+        ]
+
+    def _collection_controller(self, collection: str) -> tuple[str, ...]:
+        """Return the path of the controller of a collection."""
+        for controller, name in self._collections.items():
+            if name == collection:
+                return tuple(controller.split("."))
+        return (collection,)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the transport for the diagnostics."""
+        return {
+            "local_available": self.local_available,
+            "local_breaker": self.local_breaker.as_dict(),
+            "local_deadlines": self.local_deadlines.as_dict(),
+            **{path: stats.as_dict() for path, stats in self.stats.items()},
+        }
+
+
+class HybridClient:
+    """Looks like the cloud client, but sends the requests over the transport."""
+
+    def __init__(self, transport: HybridTransport, path: tuple[str, ...] = ()) -> None:
+        """Initialize the client at a controller path."""
+        object.__setattr__(self, "_transport", transport)
+        object.__setattr__(self, "_path", path)
+
+    def __getattr__(self, name: str) -> Any:
+        """Return a controller, a routed method or a plain attribute."""
+        attribute = getattr(_resolve(self._transport.cloud, self._path), name)
+        if asyncio.iscoroutinefunction(attribute):
+            return functools.partial(self._transport.async_call, self._path, name)
+        if attribute is None or callable(attribute):
+            return attribute
+        if isinstance(attribute, (str, int, float, bool)):
+            return attribute
+        return HybridClient(self._transport, (*self._path, name))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Set an attribute of the cloud client, e.g. the installation id."""
+        setattr(_resolve(self._transport.cloud, self._path), name, value)
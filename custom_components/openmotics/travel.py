@@ -0,0 +1,163 @@
+"""Travel time model for OpenMotics shutters.
+
+The gateway only reports the position of a shutter when it is polled, so
+while a shutter moves the position is estimated from the time it takes to
+travel from fully closed to fully open (and back). The travel times are
+learned from the state changes reported by the gateway, or configured.
+
+Positions use the Home Assistant scale: 0 is closed, 100 is fully open.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+OPENING = 1
+CLOSING = -1
+
+# Weight of a new observation when updating a learned travel time.
+LEARN_WEIGHT = 0.3
+# Only learn from movements that cover a decent part of the full travel.
+MIN_LEARN_DISTANCE = 20
+MIN_TRAVEL_TIME = 2.0
+MAX_TRAVEL_TIME = 300.0
+
+
+class ShutterTravelModel:
+    """Estimate the position of a moving shutter."""
+
+    __slots__ = (
+        "travel_up",
+        "travel_down",
+        "configured",
+        "direction",
+        "_start_position",
+        "target",
+        "_started",
+        "_started_at",
+    )
+
+    def __init__(
+        self,
+        travel_up: float | None = None,
+        travel_down: float | None = None,
+        *,
+        configured: bool = False,
+    ) -> None:
+        """Initialize the model."""
+        self.travel_up = travel_up
+        self.travel_down = travel_down
+        self.configured = configured
+        self.direction: int | None = None
+        self._start_position: float | None = None
+        self.target: float | None = None
+        self._started = 0.0
+        self._started_at: float | None = None
+
+    @property
+    def moving(self) -> bool:
+        """Return True while the shutter is travelling."""
+        return self.direction is not None
+
+    def travel_time(self, direction: int) -> float | None:
+        """Return the full travel time in a direction."""
+        return self.travel_up if direction == OPENING else self.travel_down
+
+    def start(
+        self,
+        direction: int,
+        position: float | None,
+        now: float,
+        *,
+        started_at: float | None = None,
+        target: float | None = None,
+    ) -> None:
+        """Start a movement from a (known) position.
+
+        `now` is a monotonic timestamp used for the estimation, `started_at`
+        the epoch timestamp of the state change, used for learning.
+        """
+        self.direction = direction
+        self._start_position = position
+        self.target = target
+        self._started = now
+        self._started_at = started_at
+
+    def anchor(self, started_at: float) -> None:
+        """Use the timestamp of the state change reported by the gateway."""
+        self._started_at = started_at
+
+    def position(self, now: float) -> int | None:
+        """Return the estimated position, None when it cannot be estimated."""
+        if self.direction is None or self._start_position is None:
+            return None
+        if (travel_time := self.travel_time(self.direction)) is None:
+            return None
+
+        moved = (now - self._started) / travel_time * 100
+        position = self._start_position + self.direction * moved
+        if self.target is not None:
+            if self.direction == OPENING:
+                position = min(position, self.target)
+            else:
+                position = max(position, self.target)
+        return int(round(min(max(position, 0), 100)))
+
+    def stop(
+        self,
+        position: float | None = None,
+        stopped_at: float | None = None,
+    ) -> None:
+        """Finish the movement, learn from it when the timing is reliable."""
+        direction, start_position = self.direction, self._start_position
+        started_at = self._started_at
+        self.direction = None
+        self._start_position = self.target = self._started_at = None
+
+        if (
+            self.configured
+            or direction is None
+            or start_position is None
+            or position is None
+            or started_at is None
+            or stopped_at is None
+        ):
+            return
+
+        distance = abs(position - start_position)
+        if distance < MIN_LEARN_DISTANCE:
+            return
+        self.learn(direction, (stopped_at - started_at) * 100 / distance)
+
+    def learn(self, direction: int, travel_time: float) -> None:
+        """Update the travel time of a direction with an observation."""
+        if not MIN_TRAVEL_TIME <= travel_time <= MAX_TRAVEL_TIME:
+            return
+        if (current := self.travel_time(direction)) is not None:
+            travel_time = current + LEARN_WEIGHT * (travel_time - current)
+        if direction == OPENING:
+            self.travel_up = round(travel_time, 2)
+        else:
+            self.travel_down = round(travel_time, 2)
+
+    def configure(self, travel_up: float | None, travel_down: float | None) -> None:
+        """Configure fixed travel times, None goes back to learning."""
+        self.travel_up = travel_up
+        self.travel_down = travel_down
+        self.configured = travel_up is not None or travel_down is not None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the travel times, to be restored after a restart."""
+        return {
+            "travel_up": self.travel_up,
+            "travel_down": self.travel_down,
+            "configured": self.configured,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> ShutterTravelModel:
+        """Create a model from stored travel times."""
+        return cls(
+            data.get("travel_up"),
+            data.get("travel_down"),
+            configured=bool(data.get("configured", False)),
+        )
@@ -0,0 +1,51 @@
+"""Test the circuit breaker of the openmotics connections."""
+from unittest.mock import patch
+
+from custom_components.openmotics.breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+
+
+def test_breaker_opens_and_backs_off():
+    """Test the breaker opens, retries half-open and backs off exponentially."""
+    breaker = CircuitBreaker("gateway", threshold=2, base=10, maximum=25, jitter=0)
+
+    with patch("custom_components.openmotics.breaker.time.monotonic") as now:
+        now.return_value = 0
+        breaker.record_failure(TimeoutError())
+        assert breaker.state == STATE_CLOSED
+        breaker.record_failure(TimeoutError())
+        assert breaker.state == STATE_OPEN
+        assert not breaker.allows_request
+        assert breaker.retry_in == 10
+
+        now.return_value = 10
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allows_request
+        # The retry failed, the wait doubles
+        breaker.record_failure(TimeoutError())
+        assert breaker.state == STATE_OPEN
+        assert breaker.retry_in == 20
+
+        now.return_value = 30
+        breaker.record_failure(TimeoutError())
+        assert breaker.retry_in == 25
+
+        now.return_value = 55
+        breaker.record_success()
+        assert breaker.state == STATE_CLOSED
+        assert breaker.trips == 1
+
+
+def test_breaker_jitter():
+    """Test the backoff varies within the jitter."""
+    retries = set()
+    for _ in range(20):
+        breaker = CircuitBreaker("gateway", threshold=1, base=100, jitter=0.2)
+        breaker.record_failure(TimeoutError())
+        assert 79 <= breaker.retry_in <= 120
+        retries.add(round(breaker.retry_in))
+    assert len(retries) > 1
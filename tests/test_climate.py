@@ -0,0 +1,54 @@
+"""Test the openmotics thermostat groups."""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from custom_components.openmotics.climate import OpenMoticsThermostatGroup
+from custom_components.openmotics.coordinator import OpenMoticsDataUpdateCoordinator
+from pyhaopenmotics import OpenMoticsConnectionError
+
+
+def _unit(idx, state="ON"):
+    """Return a thermostat unit."""
+    return SimpleNamespace(
+        idx=idx,
+        local_id=idx,
+        name=f"Unit {idx}",
+        status=SimpleNamespace(state=state, mode="HEATING"),
+    )
+
+
+async def _group(hass):
+    """Return a thermostat group of units 1 and 2, its mode not yet known."""
+    coordinator = OpenMoticsDataUpdateCoordinator(hass, name="test")
+    coordinator._omclient = SimpleNamespace()
+    group = SimpleNamespace(
+        idx=5,
+        local_id=0,
+        name="Group",
+        capabilities=["HEATING"],
+        thermostat_ids=[1, 2],
+        status=SimpleNamespace(mode=None),
+    )
+    coordinator.data = {"thermostatgroups": [group], "thermostatunits": []}
+    units = [_unit(1), _unit(2)]
+    await coordinator._async_update_status("thermostatunits", units)
+    coordinator.data["thermostatunits"] = units
+    return coordinator, OpenMoticsThermostatGroup(coordinator, 0, group)
+
+
+async def test_unknown_mode(hass):
+    """Test a group without a known mode has no hvac mode."""
+    _coordinator, entity = await _group(hass)
+    assert entity.hvac_mode is None
+
+
+async def test_fan_out_reports_failed_units(hass, caplog):
+    """Test a unit that fails the command fails the fan out, and is logged."""
+    _coordinator, entity = await _group(hass)
+    set_preset = AsyncMock(
+        side_effect=[{"success": True}, OpenMoticsConnectionError("gone")],
+    )
+
+    assert not await entity._async_fan_out(set_preset, "AWAY")
+    assert "Could not send" in caplog.text
+    assert "thermostat 2: gone" in caplog.text
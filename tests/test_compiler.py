@@ -0,0 +1,80 @@
+"""Test compiling automations into openmotics group actions."""
+import pytest
+from custom_components.openmotics.compiler import (
+    ACTION_OUTPUT_TOGGLE,
+    ACTION_SHUTTER_DOWN,
+    BasicAction,
+    NotCompilable,
+    compile_automation,
+)
+
+DEVICES = {
+    "light.hall": ("output", 5),
+    "switch.fan": ("output", 9),
+    "cover.kitchen": ("shutter", 2),
+}
+
+TRIGGER = {
+    "platform": "event",
+    "event_type": "openmotics_input",
+    "event_data": {"input_id": 12, "type": "press"},
+}
+
+
+def _compile(**config):
+    """Compile an automation against the test devices."""
+    return compile_automation(
+        {"alias": "Hall button", "trigger": [TRIGGER], **config},
+        DEVICES.get,
+        automation_id="hall",
+    )
+
+
+def test_compile_outputs_and_shutters():
+    """Test an input press toggling outputs and closing a shutter compiles."""
+    automation = _compile(
+        action=[
+            {
+                "service": "light.toggle",
+                "target": {"entity_id": ["light.hall"]},
+            },
+            {"service": "switch.toggle", "entity_id": "switch.fan"},
+            {"service": "cover.close_cover", "data": {"entity_id": "cover.kitchen"}},
+        ],
+    )
+
+    assert automation.name == "Hall button"
+    assert automation.input_id == 12
+    assert automation.actions == (
+        BasicAction(ACTION_OUTPUT_TOGGLE, 5),
+        BasicAction(ACTION_OUTPUT_TOGGLE, 9),
+        BasicAction(ACTION_SHUTTER_DOWN, 2),
+    )
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {
+            "condition": [{"condition": "state"}],
+            "action": [{"service": "light.toggle", "entity_id": "light.hall"}],
+        },
+        {"action": [{"service": "light.turn_on", "entity_id": "light.other"}]},
+        {
+            "action": [
+                {
+                    "service": "light.turn_on",
+                    "entity_id": "light.hall",
+                    "data": {"brightness": 20},
+                },
+            ],
+        },
+        {"action": [{"delay": 5}]},
+        {"action": [{"service": "cover.toggle", "entity_id": "light.hall"}]},
+        {"action": []},
+    ],
+)
+def test_not_compilable(config):
+    """Test automations that need Home Assistant are left alone."""
+    with pytest.raises(NotCompilable):
+        _compile(**config)
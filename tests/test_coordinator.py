@@ -0,0 +1,185 @@
+"""Test the openmotics coordinator."""
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from custom_components.openmotics.breaker import STATE_CLOSED, STATE_OPEN
+from custom_components.openmotics.coordinator import OpenMoticsDataUpdateCoordinator
+from custom_components.openmotics.exceptions import TimerNotSupported
+from custom_components.openmotics.profiler import PHASE_REFRESH
+from pyhaopenmotics import OpenMoticsConnectionError
+
+
+class _Coordinator(OpenMoticsDataUpdateCoordinator):
+    """Coordinator of a gateway that only has outputs."""
+
+    def __init__(self, hass, get_all):
+        super().__init__(hass, name="test")
+        self._omclient = SimpleNamespace(outputs=SimpleNamespace(get_all=get_all))
+
+
+async def test_failed_refresh_is_not_a_success(hass):
+    """Test a failing installation makes the refresh fail, without data."""
+    get_all = AsyncMock(side_effect=OpenMoticsConnectionError())
+    coordinator = _Coordinator(hass, get_all)
+
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert coordinator.data is None
+
+    await coordinator.async_refresh()
+    assert coordinator.breaker.state == STATE_OPEN
+    # While the breaker is open no request is sent, the refresh still fails
+    get_all.reset_mock()
+    await coordinator.async_refresh()
+    get_all.assert_not_awaited()
+    assert not coordinator.last_update_success
+
+
+async def test_outage_keeps_the_devices(hass):
+    """Test the devices of the last successful refresh are kept."""
+    outputs = [SimpleNamespace(idx=1, name="Lamp", status=None, location=None)]
+    get_all = AsyncMock(return_value=outputs)
+    coordinator = _Coordinator(hass, get_all)
+    # An enabled entity of the outputs
+    coordinator.async_use_collections(["outputs"])
+
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+
+    get_all.side_effect = OpenMoticsConnectionError()
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert coordinator.data["outputs"] is outputs
+
+
+async def test_turn_on_for_checks_timer_support(hass):
+    """Test timers are sent when the client has them, refused otherwise."""
+    sent = []
+
+    async def turn_on(output_id, value=None, timer=None):
+        sent.append((output_id, value, timer))
+        return {"success": True}
+
+    async def turn_on_without_timer(output_id, value=None):
+        raise AssertionError("not sent")
+
+    coordinator = _Coordinator(hass, AsyncMock())
+    coordinator._omclient.outputs.turn_on = turn_on
+    await coordinator.async_turn_on_for("outputs", 3, timedelta(minutes=2), 100)
+    assert sent == [(3, 100, 120)]
+
+    coordinator._omclient.outputs.turn_on = turn_on_without_timer
+    with pytest.raises(TimerNotSupported):
+        await coordinator.async_turn_on_for("outputs", 3, timedelta(minutes=2))
+
+
+async def test_failed_refresh_stops_the_profiler(hass):
+    """Test a failed refresh counts as a profiled run."""
+    coordinator = _Coordinator(hass, AsyncMock(side_effect=OpenMoticsConnectionError()))
+    coordinator.profiler.async_arm(PHASE_REFRESH, 1)
+
+    await coordinator.async_refresh()
+    assert coordinator.profiler.phase is None
+
+
+async def test_no_events_without_event_stream(hass):
+    """Test a coordinator without an event stream doesn't listen."""
+    coordinator = _Coordinator(hass, AsyncMock())
+    coordinator.async_start_events()
+    assert coordinator.events is None
+
+
+async def test_refresh_is_the_probe_without_one(hass):
+    """Test a half-open breaker lets the refresh through without a probe."""
+    outputs = [SimpleNamespace(idx=1, name="Lamp", status=None, location=None)]
+    get_all = AsyncMock(side_effect=OpenMoticsConnectionError())
+    coordinator = _Coordinator(hass, get_all)
+    coordinator.async_use_collections(["outputs"])
+    for _ in range(2):
+        await coordinator.async_refresh()
+    assert coordinator.breaker.state == STATE_OPEN
+
+    get_all.side_effect = None
+    get_all.return_value = outputs
+    with patch(
+        "custom_components.openmotics.breaker.time.monotonic",
+        return_value=time.monotonic() + 3600,
+    ):
+        await coordinator.async_refresh()
+    assert coordinator.last_update_success
+    assert coordinator.breaker.state == STATE_CLOSED
+
+
+async def test_hung_gateway_trips_the_breaker(hass):
+    """Test refreshes in which no collection answers in time are failures."""
+    outputs = [SimpleNamespace(idx=1, name="Lamp", status=None, location=None)]
+    coordinator = _Coordinator(hass, AsyncMock(return_value=outputs))
+    coordinator.async_use_collections(["outputs"])
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+
+    with patch.object(coordinator, "_async_fetch_in_time", return_value=None):
+        for _ in range(2):
+            await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert coordinator.breaker.state == STATE_OPEN
+    assert coordinator.data["outputs"] is outputs
+
+
+async def test_hung_gateway_is_not_healthy(hass):
+    """Test a refresh without answers doesn't mark the gateway healthy."""
+    outputs = [SimpleNamespace(idx=1, name="Lamp", status=None, location=None)]
+    coordinator = _Coordinator(hass, AsyncMock(return_value=outputs))
+    coordinator.async_use_collections(["outputs"])
+    await coordinator.async_refresh()
+    last_success = coordinator.health.last_success
+    coordinator.journal = MagicMock()
+
+    with patch.object(coordinator, "_async_fetch_in_time", return_value=None):
+        await coordinator.async_refresh()
+    assert coordinator.health.consecutive_failures == 1
+    assert coordinator.health.last_success == last_success
+    # The queued commands wait for the gateway to answer again
+    coordinator.journal.async_schedule_replay.assert_not_called()
+
+
+async def test_devices_of_the_last_refresh(hass):
+    """Test devices are looked up in the data of the last refresh."""
+    lamp = SimpleNamespace(idx=1, name="Lamp", status=None, location=None)
+    get_all = AsyncMock(return_value=[lamp])
+    coordinator = _Coordinator(hass, get_all)
+    coordinator.async_use_collections(["outputs"])
+    await coordinator.async_refresh()
+    assert coordinator.device("outputs", 1) is lamp
+
+    renamed = SimpleNamespace(idx=1, name="Desk", status=None, location=None)
+    get_all.return_value = [renamed]
+    await coordinator.async_refresh()
+    assert coordinator.device("outputs", 1) is renamed
+    assert coordinator.device("outputs", 2) is None
+
+
+async def test_unchanged_refresh_updates_the_diagnostics(hass):
+    """Test only the diagnostic entities hear about an unchanged refresh."""
+    outputs = [SimpleNamespace(idx=1, name="Lamp", status=None, location=None)]
+    coordinator = _Coordinator(hass, AsyncMock(return_value=outputs))
+    coordinator.async_use_collections(["outputs"])
+    await coordinator.async_refresh()
+
+    entities = MagicMock()
+    diagnostics = MagicMock()
+    remove_entities = coordinator.async_add_listener(entities)
+    remove_diagnostics = coordinator.async_add_diagnostic_listener(diagnostics)
+    await coordinator.async_refresh()
+    assert coordinator.unchanged_refreshes == 1
+    entities.assert_not_called()
+    diagnostics.assert_called_once()
+
+    remove_diagnostics()
+    await coordinator.async_refresh()
+    diagnostics.assert_called_once()
+    remove_entities()
@@ -0,0 +1,37 @@
+"""Test the adaptive deadlines of the openmotics collections."""
+from custom_components.openmotics.deadline import (
+    DEADLINE_CEILING,
+    DEADLINE_FLOOR,
+    MIN_SAMPLES,
+    CollectionDeadlines,
+)
+
+
+def test_deadline_follows_latency():
+    """Test the deadline is a multiple of the p99, between floor and ceiling."""
+    deadlines = CollectionDeadlines(factor=3)
+    # Nothing known yet, the fetch gets the longest deadline
+    assert deadlines.deadline("outputs") == DEADLINE_CEILING
+
+    for _ in range(MIN_SAMPLES):
+        deadlines.record("outputs", 0.1)
+        deadlines.record("thermostatunits", 1.5)
+    assert deadlines.deadline("outputs") == DEADLINE_FLOOR
+    assert deadlines.deadline("thermostatunits") == 4.5
+
+    deadlines.record("thermostatunits", 30)
+    assert deadlines.deadline("thermostatunits") == DEADLINE_CEILING
+
+
+def test_timeout_fails_only_its_collection():
+    """Test an overrun marks its collection failing until it is fetched again."""
+    deadlines = CollectionDeadlines()
+    deadlines.record("outputs", 0.1)
+    deadlines.record_timeout("thermostatunits")
+
+    assert deadlines.any_failing(["thermostatgroups", "thermostatunits"])
+    assert not deadlines.any_failing(["outputs"])
+    assert deadlines.as_dict()["thermostatunits"] == {"timeouts": 1, "failing": True}
+
+    deadlines.record("thermostatunits", 0.5)
+    assert not deadlines.any_failing(["thermostatunits"])
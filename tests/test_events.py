@@ -0,0 +1,190 @@
+"""Test the openmotics event stream against a stand-in websocket."""
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiohttp
+import msgpack
+from custom_components.openmotics.const import EVENT_INPUT
+from custom_components.openmotics.events import (
+    InputEventHandler,
+    OpenMoticsEventStream,
+)
+from pyhaopenmotics import OpenMoticsError
+
+URL = "wss://gateway/ws/events"
+
+
+def _input_change(input_id: int, status: bool) -> dict:
+    """Return an INPUT_CHANGE event like the gateway sends it."""
+    return {"type": "INPUT_CHANGE", "data": {"id": input_id, "status": status}}
+
+
+def _text(data) -> aiohttp.WSMessage:
+    """Return a json websocket message, like the cloud sends them."""
+    return aiohttp.WSMessage(aiohttp.WSMsgType.TEXT, json.dumps(data), None)
+
+
+class _WebSocket:
+    """Websocket that receives some messages, then closes."""
+
+    def __init__(self, messages: list[aiohttp.WSMessage]) -> None:
+        self._messages = messages
+        self.sent = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    async def send_json(self, data) -> None:
+        self.sent.append(data)
+
+    async def __aiter__(self):
+        for message in self._messages:
+            yield message
+
+
+class _Session:
+    """Session whose every connection receives the next batch of messages."""
+
+    def __init__(self, batches: list[list[aiohttp.WSMessage]]) -> None:
+        self._batches = iter(batches)
+        self.websockets = []
+
+    def ws_connect(self, url, **kwargs) -> _WebSocket:
+        websocket = _WebSocket(next(self._batches, []))
+        self.websockets.append(websocket)
+        return websocket
+
+
+async def _wait_for(events: list, count: int) -> None:
+    """Wait until some events were fired."""
+    async with asyncio.timeout(5):
+        while len(events) < count:
+            await asyncio.sleep(0.01)
+
+
+async def test_press_and_release_events(hass):
+    """Test input changes are fired as press and release events."""
+    session = _Session(
+        [[_text(_input_change(3, True)), _text(_input_change(3, False))]],
+    )
+    events = []
+    hass.bus.async_listen(EVENT_INPUT, events.append)
+
+    stream = OpenMoticsEventStream(
+        hass,
+        session,
+        URL,
+        InputEventHandler(hass, "test", 1),
+        subscription={"type": "ACTION"},
+    )
+    stream.async_start()
+    await _wait_for(events, 2)
+    await stream.async_stop()
+
+    assert session.websockets[0].sent == [{"type": "ACTION"}]
+    assert [event.data["type"] for event in events] == ["press", "release"]
+    assert events[0].data["input_id"] == 3
+    assert events[1].data["duration"] >= 0
+
+
+async def test_long_press_event(hass):
+    """Test an input held down fires a long press before the release."""
+    handler = InputEventHandler(hass, "test", 1)
+    events = []
+    hass.bus.async_listen(EVENT_INPUT, events.append)
+
+    with patch("custom_components.openmotics.events.LONG_PRESS_TIME", 0.05):
+        handler(_input_change(4, True))
+        await asyncio.sleep(0.1)
+        handler(_input_change(4, False))
+        await hass.async_block_till_done()
+
+    assert [event.data["type"] for event in events] == [
+        "press",
+        "long_press",
+        "release",
+    ]
+
+
+async def test_reconnect_after_disconnect(hass):
+    """Test the stream reconnects when the server drops the connection."""
+    session = _Session(
+        [[_text(_input_change(1, True))], [_text(_input_change(1, False))]],
+    )
+    events = []
+    hass.bus.async_listen(EVENT_INPUT, events.append)
+
+    with patch("custom_components.openmotics.events.RECONNECT_MIN_DELAY", 0.01):
+        stream = OpenMoticsEventStream(
+            hass,
+            session,
+            URL,
+            InputEventHandler(hass, "test", 1),
+            subscription={"type": "ACTION"},
+        )
+        stream.async_start()
+        await _wait_for(events, 2)
+        await stream.async_stop()
+
+    assert stream.reconnects >= 1
+    assert [event.data["type"] for event in events] == ["press", "release"]
+
+
+async def test_retry_without_token(hass):
+    """Test the stream retries when the token can't be fetched."""
+    headers = AsyncMock(side_effect=OpenMoticsError("gateway down"))
+    session = MagicMock()
+
+    with patch("custom_components.openmotics.events.RECONNECT_MIN_DELAY", 0.01):
+        stream = OpenMoticsEventStream(
+            hass,
+            session,
+            URL,
+            InputEventHandler(hass, "test", 1),
+            headers=headers,
+        )
+        stream.async_start()
+        async with asyncio.timeout(5):
+            while headers.await_count < 2:
+                await asyncio.sleep(0.01)
+        await stream.async_stop()
+
+    assert stream.reconnects >= 1
+    session.ws_connect.assert_not_called()
+
+
+async def test_invalid_frames_are_skipped(hass):
+    """Test frames that are no input changes don't end the stream."""
+    session = _Session(
+        [
+            [
+                _text([1, 2]),
+                aiohttp.WSMessage(aiohttp.WSMsgType.TEXT, "{", None),
+                _text({"type": "INPUT_CHANGE", "data": [5]}),
+                aiohttp.WSMessage(
+                    aiohttp.WSMsgType.BINARY,
+                    msgpack.packb(_input_change(2, True)),
+                    None,
+                ),
+                _text(_input_change(2, False)),
+            ],
+        ],
+    )
+    events = []
+    hass.bus.async_listen(EVENT_INPUT, events.append)
+
+    stream = OpenMoticsEventStream(
+        hass,
+        session,
+        URL,
+        InputEventHandler(hass, "test", 1),
+    )
+    stream.async_start()
+    await _wait_for(events, 2)
+    await stream.async_stop()
+
+    assert [event.data["input_id"] for event in events] == [2, 2]
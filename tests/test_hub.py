@@ -0,0 +1,65 @@
+"""Test the cloud hub shared by the installations of an account."""
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+from custom_components.openmotics.const import DOMAIN
+from custom_components.openmotics.hub import OpenMoticsCloudHub, RequestBudget
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+
+async def test_token_renewed_once_for_all_installations():
+    """Test installations asking for a token together share one renewal."""
+    hub = OpenMoticsCloudHub(MagicMock(), "client", "secret")
+    hub.implementation.async_refresh_token = AsyncMock(
+        return_value={"access_token": "new", "expires_at": time.time() + 3600},
+    )
+
+    tokens = await asyncio.gather(*(hub.async_access_token() for _ in range(5)))
+
+    assert tokens == ["new"] * 5
+    hub.implementation.async_refresh_token.assert_awaited_once()
+    assert hub.token_refreshes == 1
+
+
+async def test_entry_token_is_reused():
+    """Test a valid token of an entry is used without renewing it."""
+    hub = OpenMoticsCloudHub(MagicMock(), "client", "secret")
+    hub.implementation.async_refresh_token = AsyncMock()
+    token = {"access_token": "stored", "expires_at": time.time() + 3600}
+
+    hub.async_add_entry(MagicMock(entry_id="a", data={"token": token}))
+
+    assert await hub.async_access_token() == "stored"
+    hub.implementation.async_refresh_token.assert_not_awaited()
+
+
+async def test_renewed_token_is_stored(hass):
+    """Test a renewed token is stored on the entries of the account."""
+    entries = [
+        MockConfigEntry(domain=DOMAIN, data={"token": {"expires_at": 0}})
+        for _ in range(2)
+    ]
+    hub = OpenMoticsCloudHub(hass, "client", "secret")
+    for entry in entries:
+        entry.add_to_hass(hass)
+        hub.async_add_entry(entry)
+    token = {"access_token": "new", "expires_at": time.time() + 3600}
+    hub.implementation.async_refresh_token = AsyncMock(return_value=token)
+
+    await hub.async_ensure_token_valid()
+
+    assert [entry.data["token"] for entry in entries] == [token, token]
+
+
+async def test_request_budget():
+    """Test requests beyond the burst wait for the budget."""
+    budget = RequestBudget(rate=50, burst=2)
+    started = time.monotonic()
+
+    for _ in range(4):
+        await budget.async_acquire()
+
+    # Two requests came out of the burst, two had to wait 20 ms each
+    assert time.monotonic() - started >= 0.035
+    assert budget.throttled == 2
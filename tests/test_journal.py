@@ -0,0 +1,128 @@
+"""Test queueing openmotics commands while the installation is unreachable."""
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from custom_components.openmotics.journal import (
+    QUEUED_RESULT,
+    CommandJournal,
+    JournalClient,
+)
+from pyhaopenmotics import OpenMoticsConnectionError
+
+
+class _Batcher:
+    """Sends the commands right away."""
+
+    async def async_call(self, method, *args):
+        return await method(*args)
+
+
+def _client():
+    """Return a client with outputs and shutters."""
+    return SimpleNamespace(
+        outputs=SimpleNamespace(
+            turn_on=AsyncMock(side_effect=OpenMoticsConnectionError()),
+            turn_off=AsyncMock(side_effect=OpenMoticsConnectionError()),
+            toggle=AsyncMock(return_value={"success": True}),
+        ),
+        shutters=SimpleNamespace(
+            move_up=AsyncMock(),
+            move_down=AsyncMock(),
+        ),
+    )
+
+
+async def test_last_command_per_device_wins():
+    """Test only the last queued command of a device is replayed."""
+    offline = True
+    replayed = []
+    journal = CommandJournal(
+        MagicMock(),
+        "entry",
+        _Batcher(),
+        lambda: offline,
+        replayed=lambda *command: replayed.append(command),
+    )
+    client = _client()
+    journaled = JournalClient(journal, client)
+
+    # The breaker is open, nothing is sent
+    assert await journaled.shutters.move_up(3) == QUEUED_RESULT
+    await journaled.shutters.move_down(3)
+    await journaled.shutters.move_up(4)
+    client.shutters.move_up.assert_not_awaited()
+    assert len(journal) == 2
+
+    offline = False
+    done = AsyncMock()
+    await journal._async_replay(client, done)
+
+    client.shutters.move_up.assert_awaited_once_with(4)
+    client.shutters.move_down.assert_awaited_once_with(3)
+    done.assert_awaited_once()
+    assert len(journal) == 0
+    # The traces of the commands are acknowledged
+    assert sorted(replayed) == [(("shutters",), 3, True), (("shutters",), 4, True)]
+
+
+async def test_failed_and_expired_commands():
+    """Test unreachable commands are queued, expired ones are dropped."""
+    journal = CommandJournal(MagicMock(), "entry", _Batcher(), lambda: False)
+    client = _client()
+    journaled = JournalClient(journal, client)
+
+    assert await journaled.outputs.turn_on(1, 100) == QUEUED_RESULT
+    # Toggles are never queued
+    assert await journaled.outputs.toggle(2) == {"success": True}
+    assert len(journal) == 1
+
+    journal._expiry = -1
+    await journaled.outputs.turn_off(5)
+    await journal._async_replay(client, AsyncMock())
+
+    assert journal.as_dict()["expired"] == 1
+    # The gateway is still unreachable, the command stays queued
+    assert len(journal) == 1
+
+
+async def test_timers_count_from_the_command(hass):
+    """Test a queued timer is shortened by the time it waited."""
+    journal = CommandJournal(hass, "entry", _Batcher(), lambda: True)
+    client = _client()
+    journaled = JournalClient(journal, client)
+    await journaled.outputs.turn_on(1, 100, timer=120)
+    await journaled.outputs.turn_on(2, timer=30)
+
+    client.outputs.turn_on = AsyncMock(return_value={"success": True})
+    with patch(
+        "custom_components.openmotics.journal.time.time",
+        return_value=time.time() + 60,
+    ):
+        await journal._async_replay(client, AsyncMock())
+
+    # The timer of output 2 ran out while it was queued
+    client.outputs.turn_on.assert_awaited_once_with(1, 100, timer=60)
+    assert journal.as_dict()["expired"] == 1
+
+
+async def test_close_stops_the_replay(hass):
+    """Test closing the journal cancels a replay in progress."""
+    journal = CommandJournal(hass, "entry", _Batcher(), lambda: True)
+    client = _client()
+    await JournalClient(journal, client).outputs.turn_off(1)
+
+    sending = asyncio.Event()
+
+    async def turn_off(output_id):
+        sending.set()
+        await asyncio.Event().wait()
+
+    client.outputs.turn_off = turn_off
+    journal.async_schedule_replay(client, AsyncMock())
+    await sending.wait()
+    await journal.async_close()
+
+    assert journal._replay_task is None
+    assert len(journal) == 1
@@ -0,0 +1,43 @@
+"""Test the openmotics location index."""
+from types import SimpleNamespace
+
+from custom_components.openmotics.location import LocationIndex
+
+
+def _device(idx: int, floor_id: int | None, room_id: int | None) -> SimpleNamespace:
+    """Return a device with a location like pyhaopenmotics returns it."""
+    return SimpleNamespace(
+        idx=idx,
+        location=SimpleNamespace(floor_id=floor_id, room_id=room_id),
+    )
+
+
+def test_index_rooms_and_floors():
+    """Test devices are indexed by room and rooms by floor."""
+    index = LocationIndex()
+    index.update("outputs", [_device(1, 0, 10), _device(2, 0, 11), _device(3, 1, 12)])
+    index.update("shutters", [_device(7, 0, 10), _device(8, None, None)])
+    index.update_rooms([SimpleNamespace(idx=10, name="Kitchen")])
+
+    assert index.devices(10, "outputs") == [1]
+    assert index.devices(10, "shutters") == [7]
+    assert index.rooms_on_floor("0") == [10, 11]
+    assert index.location("outputs", 3) == (1, 12)
+    assert index.location("shutters", 8) == (None, None)
+    assert index.find_room("Kitchen") == 10
+    assert index.find_room("11") == 11
+    assert index.room_name(12) == "Room 12"
+
+
+def test_index_only_rebuilt_on_changes():
+    """Test a refresh with the same locations does not rebuild the index."""
+    index = LocationIndex()
+    assert index.update("outputs", [_device(1, 0, 10)])
+    rooms = index.rooms
+
+    assert not index.update("outputs", [_device(1, 0, 10)])
+    assert index.rooms is rooms
+
+    assert index.update("outputs", [_device(1, 0, 11)])
+    assert index.devices(11, "outputs") == [1]
+    assert index.devices(10, "outputs") == []
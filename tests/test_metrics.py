@@ -0,0 +1,58 @@
+"""Test measuring the requests to openmotics."""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from custom_components.openmotics.metrics import (
+    InstrumentedClient,
+    LatencyHistogram,
+    RequestMetrics,
+)
+
+
+def test_histogram_percentiles():
+    """Test the percentiles are within the precision of the buckets."""
+    histogram = LatencyHistogram()
+    for millis in range(1, 1001):
+        histogram.record(millis / 1000)
+
+    assert histogram.count == 1000
+    assert histogram.percentile(0.5) == pytest.approx(0.5, rel=1 / 16)
+    assert histogram.percentile(0.95) == pytest.approx(0.95, rel=1 / 16)
+    assert histogram.percentile(1.0) <= histogram.maximum == 1.0
+    assert LatencyHistogram().percentile(0.5) is None
+
+
+async def test_calls_are_measured_per_endpoint():
+    """Test the latency, errors and timeouts of every endpoint are counted."""
+    metrics = RequestMetrics()
+    client = SimpleNamespace(
+        installation_id=None,
+        outputs=SimpleNamespace(
+            get_all=AsyncMock(return_value=[]),
+            turn_on=AsyncMock(side_effect=asyncio.TimeoutError()),
+        ),
+        exec_action=AsyncMock(side_effect=ValueError()),
+    )
+    instrumented = InstrumentedClient(metrics, client, ("local",))
+
+    assert await instrumented.outputs.get_all() == []
+    with pytest.raises(asyncio.TimeoutError):
+        await instrumented.outputs.turn_on(1)
+    with pytest.raises(ValueError):
+        await instrumented.exec_action("get_version")
+    instrumented.installation_id = 3
+
+    assert client.installation_id == 3
+    assert metrics.latency.count == 3
+    assert metrics.errors == 1
+    assert metrics.timeouts == 1
+    endpoints = metrics.as_dict()["endpoints"]
+    assert set(endpoints) == {
+        "local.outputs.get_all",
+        "local.outputs.turn_on",
+        "local.exec_action",
+    }
+    assert endpoints["local.outputs.turn_on"]["timeouts"] == 1
@@ -0,0 +1,76 @@
+"""Test profiling openmotics refreshes on demand."""
+import asyncio
+import os
+import tempfile
+from unittest.mock import MagicMock
+
+from custom_components.openmotics.profiler import (
+    PHASE_REFRESH,
+    PHASE_SETUP,
+    OpenMoticsProfiler,
+    _write_profile,
+)
+
+
+def _busy():
+    return sum(index * index for index in range(10000))
+
+
+async def test_profiles_the_armed_runs():
+    """Test the profile is reported after the armed number of runs."""
+    hass = MagicMock(loop=asyncio.get_running_loop())
+    profiler = OpenMoticsProfiler(hass)
+    owner = object()
+
+    # Idle, nothing happens
+    profiler.async_start(PHASE_REFRESH, owner)
+    profiler.async_stop(PHASE_REFRESH, owner)
+    assert profiler.phase is None
+
+    # Arming again replaces the unfinished profile
+    replaced = profiler.async_arm(PHASE_REFRESH, 2)
+    report = profiler.async_arm(PHASE_REFRESH, 2)
+    assert replaced.cancelled()
+    profiler.async_start(PHASE_SETUP, owner)
+    for _ in range(2):
+        profiler.async_start(PHASE_REFRESH, owner)
+        # Another entry can't take over a run being profiled
+        profiler.async_start(PHASE_REFRESH, object())
+        _busy()
+        profiler.async_stop(PHASE_REFRESH, owner)
+
+    assert profiler.phase is None
+    hass.async_create_background_task.assert_called_once()
+    hass.async_create_background_task.call_args[0][0].close()
+    assert not report.done()
+
+
+async def test_report_returned(hass, tmp_path):
+    """Test the report resolves with the path and the hot spots."""
+    hass.config.config_dir = str(tmp_path)
+    profiler = OpenMoticsProfiler(hass)
+    owner = object()
+    report = profiler.async_arm(PHASE_SETUP, 1)
+    profiler.async_start(PHASE_SETUP, owner)
+    _busy()
+    profiler.async_stop(PHASE_SETUP, owner)
+
+    result = await report
+    assert os.path.dirname(result["path"]) == str(tmp_path)
+    assert result["hot_spots"]
+
+
+async def test_profile_written_with_hot_spots():
+    """Test the statistics are written and the hot spots returned."""
+    profiler = OpenMoticsProfiler(MagicMock(loop=asyncio.get_running_loop()))
+    profiler.async_arm(PHASE_SETUP, 1)
+    profile = profiler._profile
+    profiler.async_start(PHASE_SETUP, object())
+    _busy()
+    profile.disable()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "profile.pstats")
+        hot_spots = _write_profile(profile, path)
+        assert os.path.getsize(path) > 0
+    assert any("<genexpr>" in hot_spot for hot_spot in hot_spots)
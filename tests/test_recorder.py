@@ -0,0 +1,43 @@
+"""Test remembering the last requests to openmotics."""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from custom_components.openmotics.metrics import InstrumentedClient, RequestMetrics
+from custom_components.openmotics.recorder import (
+    CALLER,
+    CALLER_POLL,
+    FlightRecorder,
+)
+
+
+async def test_last_requests_are_remembered():
+    """Test the recorder keeps the last requests and what sent them."""
+    recorder = FlightRecorder(size=2)
+    client = SimpleNamespace(
+        outputs=SimpleNamespace(
+            get_all=AsyncMock(return_value=[]),
+            turn_on=AsyncMock(side_effect=asyncio.TimeoutError()),
+        ),
+    )
+    instrumented = InstrumentedClient(RequestMetrics(), client, recorder=recorder)
+
+    caller = CALLER.set(CALLER_POLL)
+    await instrumented.outputs.get_all()
+    await instrumented.outputs.get_all()
+    CALLER.reset(caller)
+    with pytest.raises(asyncio.TimeoutError):
+        await instrumented.outputs.turn_on(1)
+
+    dump = recorder.as_dict()
+    assert dump["recorded"] == 3
+    assert len(recorder) == 2
+    first, last = dump["requests"]
+    assert first["endpoint"] == "outputs.get_all"
+    assert first["caller"] == "poll"
+    assert first["status"] == "ok"
+    assert last["endpoint"] == "outputs.turn_on"
+    assert last["caller"] == "command"
+    assert last["status"] == "timeout"
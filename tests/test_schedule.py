@@ -0,0 +1,79 @@
+"""Test the openmotics thermostat schedules."""
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.openmotics.climate import _async_fetch_schedules
+from custom_components.openmotics.schedule import (
+    ThermostatSchedule,
+    ThermostatScheduleCache,
+)
+
+# 21 degrees from 7:00, 16 degrees from 22:00, every day
+SCHEDULE = {
+    str(weekday): {"0": 16.0, "25200": 21.0, "79200": 16.0} for weekday in range(7)
+}
+
+
+def test_setpoint_and_next_transition():
+    """Test the scheduled setpoint and the next transition."""
+    schedule = ThermostatSchedule.from_payload(SCHEDULE)
+    # Tuesday 12:00
+    moment = datetime(2024, 1, 9, 12, tzinfo=dt_util.UTC)
+
+    assert schedule.setpoint(moment) == 21.0
+    assert schedule.next_transition(moment) == (
+        datetime(2024, 1, 9, 22, tzinfo=dt_util.UTC),
+        16.0,
+    )
+    # Sunday night the next transition is on monday
+    assert schedule.next_transition(datetime(2024, 1, 14, 23, tzinfo=dt_util.UTC)) == (
+        datetime(2024, 1, 15, 0, tzinfo=dt_util.UTC),
+        16.0,
+    )
+
+
+def test_next_transition_across_dst():
+    """Test a transition after a DST change gets the offset of its day."""
+    timezone = dt_util.get_time_zone("Europe/Brussels")
+    schedule = ThermostatSchedule.from_payload({"0": {"25200": 21.0}})
+    # Saturday before the change to summer time, the next transition is on
+    # monday 7:00 CEST
+    moment = datetime(2024, 3, 30, 12, tzinfo=timezone)
+
+    transition, setpoint = schedule.next_transition(moment)
+    assert setpoint == 21.0
+    assert transition.isoformat() == "2024-04-01T07:00:00+02:00"
+    assert dt_util.as_utc(transition) == datetime(2024, 4, 1, 5, tzinfo=dt_util.UTC)
+
+
+def test_cache_parses_changes_only():
+    """Test the cache only reports a schedule that changed."""
+    cache = ThermostatScheduleCache()
+    assert cache.update(1, SCHEDULE)
+    assert not cache.update(1, dict(SCHEDULE))
+    assert 1 in cache
+    assert cache.get(1).setpoint(datetime(2024, 1, 9, 8)) == 21.0
+    assert cache.get(2) is None
+
+
+async def test_failed_schedule_fetch_is_skipped():
+    """Test a schedule that can't be fetched doesn't stop the others."""
+    get_schedule = AsyncMock(side_effect=[ValueError("bad payload"), SCHEDULE])
+    coordinator = SimpleNamespace(
+        omclient=SimpleNamespace(
+            thermostats=SimpleNamespace(
+                units=SimpleNamespace(get_schedule=get_schedule),
+            ),
+        ),
+        data={
+            "thermostatunits": [SimpleNamespace(idx=1), SimpleNamespace(idx=2)],
+        },
+        schedules=ThermostatScheduleCache(),
+    )
+
+    assert await _async_fetch_schedules(coordinator)
+    assert 1 not in coordinator.schedules
+    assert 2 in coordinator.schedules
@@ -0,0 +1,48 @@
+"""Test spreading the refreshes of the openmotics entries."""
+import asyncio
+import time
+
+from custom_components.openmotics.scheduler import (
+    UNREACHABLE_AFTER,
+    GatewayHealth,
+    RefreshScheduler,
+)
+
+
+async def test_refreshes_start_apart():
+    """Test refreshes requested together start spaced and few at a time."""
+    scheduler = RefreshScheduler(spacing=0.05, limit=2)
+    started = []
+    running = 0
+    most_running = 0
+
+    async def _refresh():
+        nonlocal running, most_running
+        async with scheduler.async_slot():
+            started.append(time.monotonic())
+            running += 1
+            most_running = max(most_running, running)
+            await asyncio.sleep(0.2)
+            running -= 1
+
+    await asyncio.gather(*(_refresh() for _ in range(4)))
+
+    assert most_running == 2
+    assert all(
+        later - earlier >= 0.04 for earlier, later in zip(started, started[1:])
+    )
+    assert scheduler.delayed == 3
+    assert scheduler.waiting == 0
+
+
+def test_gateway_health():
+    """Test a gateway is unreachable after failing a few times in a row."""
+    health = GatewayHealth()
+    for _ in range(UNREACHABLE_AFTER):
+        assert health.reachable
+        health.record_failure(TimeoutError())
+    assert not health.reachable
+
+    health.record_success()
+    assert health.reachable
+    assert health.as_dict()["failures"] == UNREACHABLE_AFTER
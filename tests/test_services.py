@@ -0,0 +1,115 @@
+"""Test the openmotics services."""
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from custom_components.openmotics.const import (
+    DOMAIN,
+    SERVICE_FLOOR_SET_SHUTTERS,
+    SERVICE_TURN_ON_FOR,
+)
+from custom_components.openmotics.light import OpenMoticsOutputLight
+from custom_components.openmotics.location import LocationIndex
+from custom_components.openmotics.services import async_setup_services
+from custom_components.openmotics.switch import OpenMoticsSwitch
+
+
+class _Batcher:
+    """Sends the commands right away."""
+
+    async def async_call(self, method, *args):
+        return await method(*args)
+
+
+def _coordinator():
+    """Return a coordinator with two shutters in a room on floor 0."""
+    locations = LocationIndex()
+    locations.update(
+        "shutters",
+        [
+            SimpleNamespace(idx=idx, location=SimpleNamespace(floor_id=0, room_id=10))
+            for idx in (7, 8)
+        ],
+    )
+    return SimpleNamespace(
+        locations=locations,
+        batcher=_Batcher(),
+        omclient=SimpleNamespace(
+            shutters=SimpleNamespace(
+                change_position=AsyncMock(),
+                move_up=AsyncMock(),
+                move_down=AsyncMock(),
+                stop=AsyncMock(),
+            ),
+        ),
+        async_refresh_collections=AsyncMock(),
+    )
+
+
+async def test_floor_position_uses_the_openmotics_scale(hass):
+    """Test position 0 (closed) is sent as 100, closed for OpenMotics."""
+    coordinator = _coordinator()
+    hass.data[DOMAIN] = {"entry": coordinator}
+    async_setup_services(hass)
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_FLOOR_SET_SHUTTERS,
+        {"floor": "0", "position": 0},
+        blocking=True,
+    )
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_FLOOR_SET_SHUTTERS,
+        {"floor": "0", "position": 70},
+        blocking=True,
+    )
+
+    change_position = coordinator.omclient.shutters.change_position
+    assert [call.args for call in change_position.await_args_list] == [
+        (7, 100),
+        (8, 100),
+        (7, 30),
+        (8, 30),
+    ]
+    coordinator.async_refresh_collections.assert_awaited_with("shutters")
+
+
+def _output(entity_class, idx):
+    """Return an output entity that records its timed turn-ons."""
+    entity = entity_class.__new__(entity_class)
+    entity._idx = idx
+    entity._async_turn_on_for = AsyncMock(return_value={"success": True})
+    entity._update_state_from_result = AsyncMock()
+    return entity
+
+
+async def test_turn_on_for_lights_and_switches(hass):
+    """Test one turn_on_for service reaches the lights and the switches."""
+    hass.data[DOMAIN] = {"entry": _coordinator()}
+    light = _output(OpenMoticsOutputLight, 1)
+    switch = _output(OpenMoticsSwitch, 2)
+    platforms = [
+        SimpleNamespace(domain="light", entities={"light.hall": light}),
+        SimpleNamespace(domain="switch", entities={"switch.pump": switch}),
+    ]
+    async_setup_services(hass)
+
+    with patch(
+        "custom_components.openmotics.services.entity_platform.async_get_platforms",
+        return_value=platforms,
+    ):
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_TURN_ON_FOR,
+            {
+                "entity_id": ["light.hall", "switch.pump"],
+                "duration": "00:02:00",
+                "brightness": 255,
+            },
+            blocking=True,
+        )
+
+    light._async_turn_on_for.assert_awaited_once_with(timedelta(minutes=2), 100)
+    # An outlet only goes on or off
+    switch._async_turn_on_for.assert_awaited_once_with(timedelta(minutes=2), 100)
@@ -0,0 +1,36 @@
+"""Test slicing the processing of large openmotics refreshes."""
+import asyncio
+import time
+
+from custom_components.openmotics.slicer import LoopSlicer
+
+
+async def test_long_processing_gives_the_loop_back():
+    """Test other tasks run while a long processing is sliced."""
+    slicer = LoopSlicer(budget=0.002)
+    ticks = 0
+
+    async def _other_task():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    other = asyncio.create_task(_other_task())
+    await asyncio.sleep(0)
+    slicer.reset()
+    slicer.begin()
+    for _ in range(20):
+        # Simulate processing a chunk of devices
+        started = time.monotonic()
+        while time.monotonic() - started < 0.001:
+            pass
+        await slicer.async_checkpoint()
+    slicer.end()
+    other.cancel()
+
+    assert slicer.yields >= 5
+    assert ticks >= slicer.yields
+    assert slicer.longest < 0.01
+    assert slicer.blocked >= 0.02
+    assert slicer.as_dict()["yields"] == slicer.yields
@@ -0,0 +1,147 @@
+"""Test the openmotics status store."""
+import tracemalloc
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any
+
+from custom_components.openmotics.coordinator import OpenMoticsDataUpdateCoordinator
+from custom_components.openmotics.store import OpenMoticsStatusStore
+
+DEVICE_COUNT = 10_000
+
+
+def _energysensors(count: int, offset: float = 0.0) -> list[SimpleNamespace]:
+    """Return a list of energy sensors like pyhaopenmotics returns them."""
+    return [
+        SimpleNamespace(
+            idx=idx,
+            local_id=idx,
+            name=f"Energy {idx}",
+            status=SimpleNamespace(
+                voltage=230.0 + offset,
+                frequency=50.0,
+                current=idx / 100,
+                power=idx + offset,
+            ),
+        )
+        for idx in range(count)
+    ]
+
+
+def test_view_reads_and_writes_status():
+    """Test the views read from and write to the store."""
+    store = OpenMoticsStatusStore()
+    store.update(
+        "shutters",
+        [SimpleNamespace(idx=7, status=SimpleNamespace(state="UP", position=None))],
+    )
+
+    view = store.view("shutters", 7)
+    assert view.state == "UP"
+    assert view.position is None
+
+    view.state = "GOING_DOWN"
+    view.position = 40
+    assert store.view("shutters", 7).state == "GOING_DOWN"
+    assert store.view("shutters", 7).position == 40
+
+
+def test_update_is_in_place():
+    """Test a refresh reuses the slots of known devices."""
+    store = OpenMoticsStatusStore()
+    store.update("energysensors", _energysensors(100))
+    view = store.view("energysensors", 42)
+    columns = store.collections["energysensors"].columns["power"]
+
+    store.update("energysensors", _energysensors(100, offset=1.0))
+
+    assert len(store.collections["energysensors"]) == 100
+    assert store.collections["energysensors"].columns["power"] is columns
+    assert view.power == 43.0
+
+
+def test_update_reports_changes():
+    """Test a refresh that brings nothing new is recognized."""
+    store = OpenMoticsStatusStore()
+    assert store.update("energysensors", _energysensors(10))
+    assert not store.update("energysensors", _energysensors(10))
+
+    sensors = _energysensors(10)
+    sensors[3].status.voltage = None
+    assert store.update("energysensors", sensors)
+    # Unknown stays unknown
+    assert not store.update("energysensors", sensors)
+    # A new device
+    assert store.update("energysensors", _energysensors(11))
+
+
+def test_as_dict():
+    """Test the diagnostics show the status of the known devices."""
+    store = OpenMoticsStatusStore()
+    store.update("energysensors", _energysensors(1))
+    assert store.as_dict() == {
+        "energysensors": {
+            0: {"voltage": 230.0, "frequency": 50.0, "current": 0.0, "power": 0.0},
+        },
+    }
+
+
+def _allocated(before: tracemalloc.Snapshot) -> int:
+    """Return the bytes allocated, and still held, since a snapshot."""
+    return sum(
+        stat.size_diff
+        for stat in tracemalloc.take_snapshot().compare_to(before, "filename")
+    )
+
+
+async def test_store_uses_less_memory_than_wrapped_devices(hass):
+    """Test the entities take less memory with the store.
+
+    Without the store, the energy entities wrapped their device in a
+    dataclass each and read the status from the device. The devices and
+    the unique ids of the entities are kept either way.
+    """
+
+    @dataclass
+    class WrappedDevice:
+        idx: Any
+        local_id: int
+        name: str
+        device: Any
+
+    coordinator = OpenMoticsDataUpdateCoordinator(hass, name="test")
+    device_classes = ("voltage", "frequency", "current", "power")
+
+    devices = _energysensors(DEVICE_COUNT)
+    unique_ids = [
+        f"energy-{device.idx}-{device_class}"
+        for device in devices
+        for device_class in device_classes
+    ]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    wrapped = [
+        WrappedDevice(unique_id, device.idx, device.name, device)
+        for unique_id, device in zip(
+            unique_ids,
+            (device for device in devices for _ in device_classes),
+        )
+    ]
+    without_store = _allocated(before)
+    del wrapped
+
+    before = tracemalloc.take_snapshot()
+    await coordinator._async_update_status("energysensors", devices)
+    views = [
+        coordinator.store.view("energysensors", device.idx)
+        for device in devices
+        for _ in device_classes
+    ]
+    with_store = _allocated(before)
+    tracemalloc.stop()
+
+    assert len(views) == len(unique_ids)
+    assert views[-1].power == DEVICE_COUNT - 1
+    # The models of the client are not changed
+    assert devices[0].status.power == 0
+    assert with_store < without_store
@@ -0,0 +1,106 @@
+"""Test tracing openmotics commands until a poll confirms them."""
+from types import SimpleNamespace
+
+from custom_components.openmotics.store import OpenMoticsStatusStore
+from custom_components.openmotics.tracing import CommandTracer
+
+
+def _output(idx, on):
+    """Return an output as fetched from the gateway."""
+    return SimpleNamespace(idx=idx, status=SimpleNamespace(on=on, value=100))
+
+
+def test_command_confirmed_by_poll():
+    """Test a command is confirmed once a poll reports its state."""
+    store = OpenMoticsStatusStore()
+    store.update("outputs", [_output(1, False), _output(2, False)])
+    tracer = CommandTracer(store)
+
+    trace = tracer.start("outputs", 1)
+    # The entity shows the new state once the gateway acknowledged it
+    store.view("outputs", 1).on = True
+    tracer.acknowledged(trace, "light")
+    assert len(tracer) == 1
+
+    # The gateway did not switch yet
+    store.update("outputs", [_output(1, False), _output(2, False)])
+    tracer.confirm("outputs")
+    assert len(tracer) == 1
+
+    store.update("outputs", [_output(1, True), _output(2, False)])
+    tracer.confirm("outputs")
+    assert len(tracer) == 0
+    light = tracer.as_dict()["platforms"]["light"]
+    assert light["acknowledged"]["count"] == 1
+    assert light["confirmed"]["count"] == 1
+    assert tracer.total.count == 1
+
+
+def test_unconfirmed_command_is_given_up():
+    """Test a command no poll confirms is counted and dropped."""
+    store = OpenMoticsStatusStore()
+    store.update("outputs", [_output(1, False)])
+    tracer = CommandTracer(store, timeout=-1)
+
+    trace = tracer.start("outputs", 1)
+    store.view("outputs", 1).on = True
+    tracer.acknowledged(trace, "switch")
+    store.update("outputs", [_output(1, False)])
+    tracer.confirm("outputs")
+
+    assert len(tracer) == 0
+    assert tracer.platforms["switch"].unconfirmed == 1
+    assert tracer.total.count == 0
+
+
+def _shutter(idx, state, position):
+    """Return a shutter as fetched from the gateway."""
+    return SimpleNamespace(
+        idx=idx,
+        status=SimpleNamespace(state=state, position=position, last_change=None),
+    )
+
+
+def test_moving_shutter_confirms():
+    """Test a shutter moving the right way confirms a position command."""
+    store = OpenMoticsStatusStore()
+    store.update("shutters", [_shutter(1, "UP", 0)])
+    tracer = CommandTracer(store)
+
+    trace = tracer.start("shutters", 1)
+    store.view("shutters", 1).position = 70
+    tracer.acknowledged(trace, "cover", alternatives=[{"state": "GOING_DOWN"}])
+
+    store.update("shutters", [_shutter(1, "UP", 0)])
+    tracer.confirm("shutters")
+    assert len(tracer) == 1
+
+    store.update("shutters", [_shutter(1, "GOING_DOWN", 20)])
+    tracer.confirm("shutters")
+    assert len(tracer) == 0
+    assert tracer.platforms["cover"].confirmed.count == 1
+
+
+def test_queued_command_acknowledged_when_sent():
+    """Test a queued command is acknowledged once the journal sends it."""
+    store = OpenMoticsStatusStore()
+    store.update("outputs", [_output(1, False), _output(2, False)])
+    tracer = CommandTracer(store)
+
+    for idx in (1, 2):
+        trace = tracer.start("outputs", idx)
+        store.view("outputs", idx).on = True
+        tracer.acknowledged(trace, "switch", queued=True)
+    assert len(tracer) == 0
+    assert tracer.as_dict()["queued"] == 2
+
+    tracer.replayed("outputs", 1, True)
+    tracer.replayed("outputs", 2, False)
+    switch = tracer.platforms["switch"]
+    assert switch.acknowledged.count == 1
+    assert switch.unconfirmed == 1
+    assert tracer.as_dict()["queued"] == 0
+
+    store.update("outputs", [_output(1, True), _output(2, False)])
+    tracer.confirm("outputs")
+    assert switch.confirmed.count == 1
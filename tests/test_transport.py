@@ -0,0 +1,148 @@
+"""Test routing requests over the local gateway or the cloud."""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from custom_components.openmotics.deadline import CollectionDeadlines
+from custom_components.openmotics.transport import (
+    CLOUD,
+    LOCAL,
+    HybridClient,
+    HybridTransport,
+)
+from pyhaopenmotics import OpenMoticsConnectionError, OpenMoticsError
+
+COLLECTIONS = {"outputs": "outputs", "thermostatunits": "thermostats.units"}
+
+
+def _transport() -> HybridTransport:
+    """Return a transport with outputs 10 and 11 being gateway outputs 0 and 1."""
+    cloud = SimpleNamespace(
+        installation_id=None,
+        outputs=SimpleNamespace(
+            turn_on=AsyncMock(return_value="cloud"),
+            get_all=AsyncMock(return_value=[]),
+        ),
+    )
+    local = SimpleNamespace(
+        outputs=SimpleNamespace(
+            turn_on=AsyncMock(return_value="local"),
+            get_all=AsyncMock(
+                return_value=[
+                    SimpleNamespace(idx=0, status="on"),
+                    SimpleNamespace(idx=1, status="off"),
+                    SimpleNamespace(idx=7, status="off"),
+                ],
+            ),
+        ),
+    )
+    local_ids = {"outputs": {10: 0, 11: 1}}
+    return HybridTransport(
+        cloud,
+        local,
+        lambda collection: local_ids.get(collection, {}),
+        COLLECTIONS,
+    )
+
+
+async def test_commands_go_over_the_gateway():
+    """Test commands are sent to the gateway with its own ids."""
+    transport = _transport()
+    client = HybridClient(transport)
+
+    assert await client.outputs.turn_on(11, 50) == "local"
+    transport.local.outputs.turn_on.assert_awaited_once_with(1, 50)
+    assert transport.stats[LOCAL].requests == 1
+    assert transport.stats[CLOUD].requests == 0
+
+    # The configuration comes from the cloud
+    await client.outputs.get_all()
+    transport.cloud.outputs.get_all.assert_awaited_once()
+
+    client.installation_id = 3
+    assert transport.cloud.installation_id == 3
+
+
+async def test_failover_to_the_cloud():
+    """Test the cloud is used while the gateway can't be reached."""
+    transport = _transport()
+    transport.local.outputs.turn_on.side_effect = OpenMoticsConnectionError()
+    client = HybridClient(transport)
+
+    assert await client.outputs.turn_on(10) == "cloud"
+    transport.cloud.outputs.turn_on.assert_awaited_once_with(10)
+    assert not transport.local_available
+    assert transport.stats[LOCAL].failures == 1
+
+    # The gateway is not tried again right away
+    assert await client.outputs.turn_on(10) == "cloud"
+    assert transport.local.outputs.turn_on.await_count == 1
+
+
+async def test_status_polled_from_the_gateway():
+    """Test the status polled from the gateway carries the cloud ids."""
+    transport = _transport()
+
+    devices = await transport.async_local_status("outputs")
+
+    assert [(device.idx, device.status) for device in devices] == [
+        (10, "on"),
+        (11, "off"),
+    ]
+    assert await transport.async_local_status("thermostatunits") is None
+
+
+async def test_status_poll_failure_raises():
+    """Test the coordinator learns the gateway is unreachable."""
+    transport = _transport()
+    transport.local.outputs.get_all.side_effect = OpenMoticsConnectionError()
+
+    with pytest.raises(OpenMoticsConnectionError):
+        await transport.async_local_status("outputs")
+    assert not transport.local_available
+
+
+async def test_refused_status_poll_fails_over():
+    """Test a gateway refusing the poll sends it to the cloud for a while."""
+    transport = _transport()
+    transport.local.outputs.get_all.side_effect = OpenMoticsError("Unauthorized")
+
+    with pytest.raises(OpenMoticsConnectionError):
+        await transport.async_local_status("outputs")
+    assert not transport.local_available
+    assert transport.stats[LOCAL].failures == 1
+
+
+async def test_hanging_status_poll_fails_over():
+    """Test a status poll overrunning its deadline fails over to the cloud."""
+    transport = _transport()
+    transport.local_deadlines = CollectionDeadlines(ceiling=0.01)
+
+    async def get_all():
+        await asyncio.sleep(1)
+
+    transport.local.outputs.get_all = get_all
+
+    with pytest.raises(asyncio.TimeoutError):
+        await transport.async_local_status("outputs")
+    assert not transport.local_available
+    assert transport.local_deadlines.timeouts["outputs"] == 1
+
+
+async def test_unsupported_arguments_go_over_the_cloud():
+    """Test a command the gateway client can't take is sent to the cloud."""
+    transport = _transport()
+    sent = []
+
+    async def turn_on(output_id, value=None):
+        sent.append(output_id)
+
+    transport.local.outputs.turn_on = turn_on
+    client = HybridClient(transport)
+
+    assert await client.outputs.turn_on(10, timer=60) == "cloud"
+    transport.cloud.outputs.turn_on.assert_awaited_once_with(10, timer=60)
+    assert not sent
+    # The gateway is still used for the other commands
+    assert transport.local_available